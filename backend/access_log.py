@@ -0,0 +1,162 @@
+"""
+Access event log for Vehicle Pass Registration System
+
+Every gate decision (verify, deduct, access) becomes an access event. Events
+are put on a bounded in-process queue and a background thread writes them
+with BatchWriteItem, so recording an event never adds a DynamoDB round trip
+to a gate request. If the queue is full the event is dropped and counted
+rather than slowing the gate down.
+"""
+from datetime import datetime
+from decimal import Decimal
+import atexit
+import logging
+import queue
+import threading
+import time
+import uuid
+
+from backend.database import ACCESS_GRANTED, ACCESS_NOT_REGISTERED, ACCESS_NO_PASSES
+
+logger = logging.getLogger(__name__)
+
+# What the gate asked for
+ACTION_VERIFY = 'verify'
+ACTION_DEDUCT = 'deduct'
+ACTION_ACCESS = 'access'
+
+UNKNOWN_GATE = 'unknown'
+
+
+def verify_outcome(vehicle):
+    """Classify a /api/verify decision the same way verify_result does"""
+    if not vehicle:
+        return ACCESS_NOT_REGISTERED
+    if vehicle.get('remaining_passes', 0) <= 0:
+        return ACCESS_NO_PASSES
+    return ACCESS_GRANTED
+
+
+def build_event(plate_number, gate_id, action, outcome, latency_seconds, vehicle=None,
+                replayed=False, retention_seconds=0):
+    """Build the stored access event item"""
+    occurred_at = datetime.utcnow().isoformat()
+    event = {
+        'plate_number': plate_number,
+        'event_id': f'{occurred_at}#{uuid.uuid4().hex[:8]}',
+        'occurred_at': occurred_at,
+        'day': occurred_at[:10],
+        'gate_id': gate_id or UNKNOWN_GATE,
+        'action': action,
+        'outcome': outcome,
+        'latency_ms': Decimal(str(round(latency_seconds * 1000, 3)))
+    }
+    if vehicle and vehicle.get('remaining_passes') is not None:
+        event['remaining_passes'] = vehicle['remaining_passes']
+    if replayed:
+        event['replayed'] = True
+    if retention_seconds:
+        event['expires_at'] = int(time.time() + retention_seconds)
+    return event
+
+
+class AccessEventBuffer:
+    """Bounded queue of access events flushed in batches by a background thread
+
+    A batch is written as soon as batch_size events are waiting, or after
+    flush_seconds otherwise. A max_size of 0 disables the log.
+    """
+
+    def __init__(self, db, max_size=10000, batch_size=25, flush_seconds=1.0):
+        """Initialize an empty buffer; call start() to begin flushing"""
+        self.db = db
+        self.max_size = max_size
+        self.batch_size = batch_size
+        self.flush_seconds = flush_seconds
+        self._queue = queue.Queue(maxsize=max(max_size, 1))
+        self._lock = threading.Lock()
+        self._thread = None
+
+        self.recorded = 0
+        self.dropped = 0
+        self.written = 0
+        self.failed = 0
+
+    def record(self, event):
+        """Queue an event without blocking; returns False if it was dropped"""
+        if self.max_size <= 0:
+            return False
+        try:
+            self._queue.put_nowait(event)
+        except queue.Full:
+            with self._lock:
+                self.dropped += 1
+            return False
+        with self._lock:
+            self.recorded += 1
+        return True
+
+    def start(self):
+        """Start the flush thread and flush what is left at interpreter exit"""
+        # A thread inherited across a fork is not running; start a new one
+        if self.max_size <= 0 or (self._thread is not None and self._thread.is_alive()):
+            return
+        self._thread = threading.Thread(target=self._run, name='access-log-flusher', daemon=True)
+        self._thread.start()
+        atexit.register(self.flush)
+
+    def flush(self):
+        """Write everything currently queued"""
+        while True:
+            batch = self._drain(self.batch_size)
+            if not batch:
+                return
+            self._write(batch)
+
+    def stats(self):
+        """Return buffer counters"""
+        with self._lock:
+            return {
+                'queued': self._queue.qsize(),
+                'max_size': self.max_size,
+                'recorded': self.recorded,
+                'dropped': self.dropped,
+                'written': self.written,
+                'failed': self.failed
+            }
+
+    def _run(self):
+        """Collect up to batch_size events or flush_seconds worth, then write them"""
+        while True:
+            batch = [self._queue.get()]
+            deadline = time.monotonic() + self.flush_seconds
+            while len(batch) < self.batch_size:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(self._queue.get(timeout=remaining))
+                except queue.Empty:
+                    break
+            self._write(batch)
+
+    def _drain(self, limit):
+        """Take up to limit queued events without waiting"""
+        batch = []
+        while len(batch) < limit:
+            try:
+                batch.append(self._queue.get_nowait())
+            except queue.Empty:
+                break
+        return batch
+
+    def _write(self, batch):
+        """Write one batch and update the counters"""
+        try:
+            self.db.batch_write_access_events(batch)
+            with self._lock:
+                self.written += len(batch)
+        except Exception as e:
+            logger.error(f"Error writing {len(batch)} access events: {str(e)}")
+            with self._lock:
+                self.failed += len(batch)
@@ -1,35 +1,447 @@
 """
 Flask Backend API for Vehicle Pass Registration System
 """
-from flask import Flask, request, jsonify
+from flask import Flask, Response, g, request, jsonify, stream_with_context
 from flask_cors import CORS
-from datetime import datetime
+import click
+from datetime import datetime, timedelta
+import csv
+import functools
+import io
+import itertools
 import sys
 import os
+import time
 
 # Add parent directory to path
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
 from config import config_by_name
-from backend.database import DynamoDBManager
-from backend.validators import validate_registration_data
+from backend.database import (
+    ACCESS_GRANTED, ACCESS_NO_PASSES, ACCESS_NOT_REGISTERED, ACCESS_ERROR, ACCESS_KEY_REUSED
+)
+from backend.access_log import (
+    AccessEventBuffer, build_event, verify_outcome, ACTION_VERIFY, ACTION_DEDUCT, ACTION_ACCESS
+)
+from backend.bulk_import import build_vehicle_record, parse_import_file, import_vehicles
+from backend.cache import VehicleCache
+from backend.json_provider import FastJSONProvider
+from backend.events import (
+    EventBroker, EVENT_REGISTERED, EVENT_PASS_DEDUCTED,
+    EVENT_PASSES_ADDED, EVENT_STATUS_CHANGED, EVENT_DELETED
+)
+from backend import compression, profiling
+from backend.metrics import REGISTRY, CONTENT_TYPE, RequestTimer, sample_lines
+from backend.plate_filter import PlateFilter, PLATE_FILTER_ATTRIBUTES
+from backend.plate_index import PlateIndex, PLATE_INDEX_ATTRIBUTES
+from backend.rate_limit import GateRateLimiter, GATE_HEADER, throttled_result
+from backend.rollups import (
+    RollupAggregator, gate_series, vehicle_series, bucket_range, fill_series, peak_hours, burn_down,
+    GRANULARITY_HOUR, GRANULARITY_DAY, MAX_BUCKETS, ALL_GATES, FIELD_ENTRIES, FIELD_DENIED,
+    FIELD_PASSES_USED
+)
+from backend.responses import (
+    normalize_plate, verify_result, access_result, deduct_result, deduct_once_result,
+    vehicle_result, replay_headers, PLATE_REQUIRED, VEHICLE_NOT_FOUND, DEDUCT_FAILED,
+    INVALID_IDEMPOTENCY_KEY, IDEMPOTENCY_HEADER
+)
+from backend.rebuild import ScanJob, start_rebuilder
+from backend.search import SearchIndex, SEARCH_ATTRIBUTES
+from backend.stats import FleetStats, count_changes, STATS_ATTRIBUTES
+from backend.storage import create_storage, STORAGE_DYNAMODB
+from backend.versioning import ChangeVersion, version_of
+from backend.validators import (
+    validate_registration_data, validate_idempotency_key, parse_vehicle_filters, parse_pass_range,
+    parse_page_limit, parse_time_range, VALID_STATUSES
+)
 
 # Initialize Flask app
 app = Flask(__name__)
 env = os.getenv('FLASK_ENV', 'development')
 app.config.from_object(config_by_name[env])
+app.json = FastJSONProvider(app)
+
+# Compress large responses (vehicle lists, stats)
+compression.init_app(app)
 
 # Enable CORS
-CORS(app, origins=app.config['CORS_ORIGINS'])
-
-# Initialize DynamoDB
-db = DynamoDBManager(
-    region=app.config['AWS_REGION'],
-    table_name=app.config['DYNAMODB_TABLE_NAME'],
-    aws_access_key_id=app.config['AWS_ACCESS_KEY_ID'],
-    aws_secret_access_key=app.config['AWS_SECRET_ACCESS_KEY']
+CORS(app, origins=app.config['CORS_ORIGINS'],
+     expose_headers=['ETag', 'Idempotent-Replayed', 'Retry-After', 'Server-Timing', 'X-Profile-File'])
+
+# Initialize storage (DynamoDB or SQLite, see STORAGE_BACKEND) behind a read-through vehicle cache
+db = VehicleCache(
+    create_storage(app.config),
+    max_size=app.config['VEHICLE_CACHE_MAX_SIZE'],
+    ttl_seconds=app.config['VEHICLE_CACHE_TTL_SECONDS']
 )
 
+# Opt-in per-request profiling (X-Profile header); stays off without a token
+if app.config['PROFILING_ENABLED']:
+    app.config['PROFILING_ENABLED'] = profiling.init_app(app)
+
+# Dashboard counters in storage, moved by the write paths below with the change version
+stats = FleetStats(db)
+
+# Plate, name and email search for the admin UI, kept current by the write paths
+search_index = SearchIndex()
+
+# Registered plates by misread key, for correcting gate OCR misreads
+plate_index = PlateIndex()
+
+# Bloom filter of registered plates, so gate reads of unregistered plates skip the database
+plate_filter = PlateFilter(false_positive_rate=app.config['PLATE_FILTER_FALSE_POSITIVE_RATE'])
+
+# Table-wide version behind the ETags of the read endpoints, kept in storage
+change_version = ChangeVersion(db)
+
+# The indexes and filter above only see this process's writes
+single_process = app.config['SERVER_WORKERS'] == 1
+
+# The filter must hold every registered plate, and a plate another worker
+# registers never reaches this one's filter, so it stays off with several
+plate_filter_enabled = app.config['PLATE_FILTER_ENABLED'] and single_process
+
+# Change feed for connected dashboards
+events = EventBroker(max_subscribers=app.config['SSE_MAX_CLIENTS'])
+
+# Gate decisions, written to the access events table in the background
+access_events = AccessEventBuffer(
+    db,
+    max_size=app.config['ACCESS_LOG_BUFFER_SIZE'],
+    flush_seconds=app.config['ACCESS_LOG_FLUSH_SECONDS']
+)
+
+# Hourly and daily throughput counters, flushed as coalesced atomic ADDs
+rollups = RollupAggregator(db, flush_seconds=app.config['ROLLUP_FLUSH_SECONDS'])
+
+# Per-gate read and write budgets under a per-IP budget, checked before any view runs
+limiter = GateRateLimiter(
+    read_per_minute=app.config['RATE_LIMIT_READ_PER_MINUTE'],
+    read_burst=app.config['RATE_LIMIT_READ_BURST'],
+    write_per_minute=app.config['RATE_LIMIT_WRITE_PER_MINUTE'],
+    write_burst=app.config['RATE_LIMIT_WRITE_BURST'],
+    ip_per_minute=app.config['RATE_LIMIT_IP_PER_MINUTE'],
+    ip_burst=app.config['RATE_LIMIT_IP_BURST']
+)
+
+# Process that start_worker last ran in
+_worker_pid = None
+
+
+def start_worker(forked=False):
+    """Start this process's connections and background threads
+
+    Nothing here runs at import, so a preloading server can import the app
+    once and fork its workers from it. forked=True first replaces the
+    storage connections inherited from the parent process. Calling it
+    again in the same process does nothing.
+    """
+    global _worker_pid
+    if _worker_pid == os.getpid():
+        return
+    _worker_pid = os.getpid()
+
+    if forked:
+        db.reconnect()
+    if app.config['PROFILING_ENABLED'] and app.config['STORAGE_BACKEND'] == STORAGE_DYNAMODB:
+        for client in db.db.boto_clients():
+            profiling.instrument_boto_client(client)
+    # Resolve credentials and open connections before the first gate request
+    if app.config['DYNAMODB_WARM_CONNECTIONS'] > 0:
+        db.warm_up(app.config['DYNAMODB_WARM_CONNECTIONS'])
+
+    # One scanner thread feeds every index that is due from a single table scan
+    scan_jobs = [
+        ScanJob('search index', search_index, SEARCH_ATTRIBUTES, app.config['SEARCH_REBUILD_INTERVAL_SECONDS'])
+    ]
+    if app.config['STATS_RECONCILE_INTERVAL_SECONDS'] > 0:
+        scan_jobs.append(ScanJob(
+            'stats reconcile', stats, STATS_ATTRIBUTES, app.config['STATS_RECONCILE_INTERVAL_SECONDS']
+        ))
+    if app.config['PLATE_MISREAD_CORRECTION']:
+        scan_jobs.append(ScanJob(
+            'plate index', plate_index, PLATE_INDEX_ATTRIBUTES, app.config['PLATE_INDEX_REBUILD_INTERVAL_SECONDS']
+        ))
+    if plate_filter_enabled:
+        scan_jobs.append(ScanJob(
+            'plate filter', plate_filter, PLATE_FILTER_ATTRIBUTES, app.config['PLATE_FILTER_REBUILD_INTERVAL_SECONDS']
+        ))
+    start_rebuilder(scan_jobs, db)
+    access_events.start()
+    rollups.start()
+
+
+def create_app():
+    """Return the app, ready to serve from the current process
+
+    The entry point for single-process servers (the development server,
+    uvicorn, the load generator). Gunicorn imports app directly and calls
+    start_worker from its post_fork hook instead; see gunicorn.conf.py.
+
+    This is not an application factory: the app, storage, indexes and
+    change feed are module globals, because the gunicorn master builds
+    them once before forking and backend.asgi serves the same objects
+    from its native routes. Calling it twice returns the same app.
+    """
+    start_worker()
+    return app
+
+
+def record_change(event_type, before, after, counted=False, fleet=None):
+    """Apply a successful vehicle write to the counters, indexes, version and change feed
+
+    Pass counted=True, with the bucket stats.add() returned as fleet, when
+    the caller already counted a batch of writes (and bumped the version)
+    in one add.
+    """
+    if not counted:
+        fleet = stats.apply(before, after)
+    search_index.apply(before, after)
+    plate_index.apply(before, after)
+    plate_filter.apply(before, after)
+    vehicle = after or before
+    events.publish(event_type, app.json.dumps({
+        'plate_number': vehicle.get('plate_number'),
+        'vehicle': after,
+        'stats': stats.snapshot(fleet) if fleet is not None else None,
+        'version': version_of(fleet)
+    }))
+
+
+def correct_misread(plate_number):
+    """The registered plate an unregistered gate read was misread from, or None"""
+    if not app.config['PLATE_MISREAD_CORRECTION']:
+        return None
+    corrected = plate_index.correct(plate_number)
+    if corrected:
+        app.logger.info(f"Plate read {plate_number} corrected to {corrected}")
+    return corrected
+
+
+def ruled_out(plate_number):
+    """True if the plate filter shows plate_number is not registered
+
+    The read of plate_number itself is then skipped. Misread correction
+    still runs, since it only looks in the in-memory plate index.
+    """
+    return plate_filter_enabled and plate_filter.definitely_missing(plate_number)
+
+
+def gate_vehicle(plate_number):
+    """Read the vehicle a gate asked for, correcting a misread plate
+
+    Returns (plate_number, vehicle) with the plate the vehicle is registered under.
+    """
+    if not ruled_out(plate_number):
+        vehicle = db.get_vehicle(plate_number)
+        if vehicle:
+            return plate_number, vehicle
+        plate_filter.record_false_positive()
+    corrected = correct_misread(plate_number)
+    if corrected:
+        return corrected, db.get_vehicle(corrected)
+    return plate_number, None
+
+
+def gate_access(plate_number):
+    """db.access_vehicle, correcting a misread plate; returns (plate_number, outcome, vehicle)"""
+    if not ruled_out(plate_number):
+        outcome, vehicle = db.access_vehicle(plate_number)
+        if outcome != ACCESS_NOT_REGISTERED:
+            return plate_number, outcome, vehicle
+        plate_filter.record_false_positive()
+    corrected = correct_misread(plate_number)
+    if corrected:
+        return (corrected, *db.access_vehicle(corrected))
+    return plate_number, ACCESS_NOT_REGISTERED, None
+
+
+def idempotent_access(plate_number, idempotency_key):
+    """Deduct a pass at most once per key, publishing the change only the first time
+
+    A plate the filter rules out is not read, and a misread plate is
+    corrected like gate_access does. The key is then
+    recorded under the corrected plate, so a retry with the same misread
+    gets ACCESS_KEY_REUSED for it and is corrected the same way, which
+    replays the original answer. Returns (plate_number, outcome, vehicle,
+    replayed).
+    """
+    outcome, vehicle, replayed = ACCESS_NOT_REGISTERED, None, False
+    if not ruled_out(plate_number):
+        outcome, vehicle, replayed = db.access_vehicle_once(plate_number, idempotency_key)
+        if outcome == ACCESS_NOT_REGISTERED:
+            plate_filter.record_false_positive()
+    if outcome in (ACCESS_NOT_REGISTERED, ACCESS_KEY_REUSED):
+        corrected = correct_misread(plate_number)
+        if corrected:
+            plate_number = corrected
+            outcome, vehicle, replayed = db.access_vehicle_once(plate_number, idempotency_key)
+    if outcome == ACCESS_GRANTED and not replayed:
+        record_change(
+            EVENT_PASS_DEDUCTED,
+            dict(vehicle, remaining_passes=vehicle['remaining_passes'] + 1),
+            vehicle
+        )
+    return plate_number, outcome, vehicle, replayed
+
+
+def log_access(action, plate_number, gate_id, started, outcome, vehicle=None, replayed=False):
+    """Queue an access event for a gate decision and count it in the rollups
+
+    started is the request's time.perf_counter() value.
+    """
+    event = build_event(
+        plate_number, gate_id, action, outcome, time.perf_counter() - started,
+        vehicle=vehicle, replayed=replayed,
+        retention_seconds=int(app.config['ACCESS_EVENTS_RETENTION_DAYS'] * 86400)
+    )
+    access_events.record(event)
+    rollups.record(event)
+
+
+def _log_gate_decision(action, plate_number, outcome, vehicle=None, replayed=False):
+    """log_access for the current Flask request"""
+    log_access(action, plate_number, request.headers.get(GATE_HEADER), g.request_timer.start,
+               outcome, vehicle=vehicle, replayed=replayed)
+
+
+def current_etag(full_path):
+    """ETag for a read endpoint at the current table version
+
+    None when the version cannot be read, so the request is served without one.
+    """
+    try:
+        return change_version.etag(full_path)
+    except Exception as e:
+        app.logger.error(f"Change version read error: {str(e)}")
+        return None
+
+
+def versioned(view):
+    """Give a read endpoint a strong ETag and answer unchanged polls with 304
+
+    The ETag comes from the change version in storage and the full request
+    path, and is computed before the view runs, so a 304 costs one key read
+    instead of the view's query.
+    """
+    @functools.wraps(view)
+    def wrapper(*args, **kwargs):
+        etag = current_etag(request.full_path)
+        if etag is None:
+            return view(*args, **kwargs)
+        if request.if_none_match.contains_weak(etag):
+            response = app.response_class(status=304)
+        else:
+            response = app.make_response(view(*args, **kwargs))
+            if response.status_code != 200:
+                return response
+        response.set_etag(etag)
+        response.headers['Cache-Control'] = 'no-cache'
+        return response
+    return wrapper
+
+
+@app.before_request
+def _start_request_timer():
+    """Start latency and in-flight tracking for this request"""
+    route = request.url_rule.rule if request.url_rule else 'unmatched'
+    g.request_timer = RequestTimer(request.method, route)
+
+
+@app.after_request
+def _finish_request_timer(response):
+    """Record latency and status code for this request"""
+    timer = g.pop('request_timer', None)
+    if timer:
+        timer.finish(response.status_code)
+    return response
+
+
+@app.teardown_request
+def _abandon_request_timer(error=None):
+    """Close out a request that never produced a response"""
+    timer = g.pop('request_timer', None)
+    if timer:
+        timer.finish(500)
+
+
+@app.before_request
+def _admit_request():
+    """Answer 429 when the calling gate has used up its budget"""
+    route = request.url_rule.rule if request.url_rule else 'unmatched'
+    retry_after = limiter.check(request.method, route, request.headers.get(GATE_HEADER), request.remote_addr)
+    if retry_after:
+        return throttled_result(retry_after)
+
+
+def _collect_app_metrics():
+    """Expose cache, dashboard and change feed counters at scrape time"""
+    cache = db.stats()
+    feed = events.stats()
+    try:
+        fleet = stats.snapshot()
+    except Exception as e:
+        app.logger.error(f"Fleet stats read error: {str(e)}")
+        fleet = None
+    limits = limiter.stats()
+    log = access_events.stats()
+    rollup = rollups.stats()
+    search = search_index.stats()
+    plates = plate_index.stats()
+    known = plate_filter.stats()
+    return (
+        sample_lines('vehicle_cache_lookups_total', 'Vehicle cache lookups by result', [
+            ({'result': 'hit'}, cache['hits']),
+            ({'result': 'miss'}, cache['misses']),
+            ({'result': 'coalesced'}, cache['coalesced'])
+        ], 'counter')
+        + sample_lines('vehicle_cache_evictions_total', 'Vehicle cache LRU evictions', [
+            ({}, cache['evictions'])
+        ], 'counter')
+        + sample_lines('vehicle_cache_entries', 'Vehicles currently cached', [({}, cache['size'])])
+        + sample_lines('event_stream_clients', 'Connected change feed clients', [({}, feed['subscribers'])])
+        + sample_lines('rate_limit_decisions_total', 'Rate limiter decisions by budget', [
+            ({'budget': budget, 'result': result}, counters[result])
+            for budget, counters in limits.items() for result in ('allowed', 'throttled')
+        ], 'counter')
+        + sample_lines('access_events_total', 'Access events by fate', [
+            ({'result': result}, log[result]) for result in ('recorded', 'dropped', 'written', 'failed')
+        ], 'counter')
+        + sample_lines('access_events_queued', 'Access events waiting to be written', [({}, log['queued'])])
+        + sample_lines('rollup_pending_counters', 'Rollup increments waiting to be flushed', [
+            ({}, rollup['pending'])
+        ])
+        + sample_lines('search_index_vehicles', 'Vehicles in the search index', [({}, search['vehicles'])])
+        + sample_lines('plate_index_plates', 'Registered plates in the misread index', [({}, plates['plates'])])
+        + sample_lines('plate_misreads_total', 'Unregistered gate reads matched to registered plates', [
+            ({'result': 'corrected'}, plates['corrected']),
+            ({'result': 'ambiguous'}, plates['ambiguous'])
+        ], 'counter')
+        + sample_lines('plate_filter_plates', 'Registered plates in the Bloom filter', [({}, known['plates'])])
+        + sample_lines('plate_filter_size_bytes', 'Bloom filter counter array size', [({}, known['size_bytes'])])
+        + sample_lines('plate_filter_estimated_false_positive_rate', 'False positive rate from the filter fill', [
+            ({}, known['estimated_false_positive_rate'])
+        ])
+        + sample_lines('plate_filter_checks_total', 'Gate plate lookups checked against the filter by result', [
+            ({'result': 'skipped_read'}, known['skipped_reads']),
+            ({'result': 'false_positive'}, known['false_positives']),
+            ({'result': 'registered'}, known['checks'] - known['skipped_reads'] - known['false_positives'])
+        ], 'counter')
+        + sample_lines('fleet_vehicles', 'Registered vehicles by pass bucket', [
+            ({'bucket': bucket}, fleet[bucket]) for bucket in ('active', 'low', 'empty')
+        ] if fleet else [])
+    )
+
+
+REGISTRY.register_collector(_collect_app_metrics)
+
+
+@app.route('/metrics', methods=['GET'])
+def metrics():
+    """Prometheus metrics for this process"""
+    return Response(REGISTRY.render(), mimetype=CONTENT_TYPE.split(';')[0],
+                    headers={'Content-Type': CONTENT_TYPE})
+
 
 @app.route('/health', methods=['GET'])
 def health_check():
@@ -40,6 +452,12 @@ def health_check():
     }), 200
 
 
+@app.route('/api/cache/stats', methods=['GET'])
+def cache_stats():
+    """Vehicle cache hit, miss and eviction counters"""
+    return jsonify({'data': db.stats()}), 200
+
+
 @app.route('/api/register', methods=['POST'])
 def register_vehicle():
     """Register a new vehicle with passes"""
@@ -63,20 +481,12 @@ def register_vehicle():
             }), 409
 
         # Prepare vehicle data
-        vehicle_data = {
-            'plate_number': plate_number,
-            'name': data['name'],
-            'car_type': data['car_type'],
-            'email': data['email'],
-            'phone_number': data['phone_number'],
-            'total_passes': int(data['passes']),
-            'remaining_passes': int(data['passes']),
-            'registered_at': datetime.utcnow().isoformat(),
-            'status': 'active'
-        }
+        vehicle_data = build_vehicle_record(data)
 
         # Save to DynamoDB
-        db.create_vehicle(vehicle_data)
+        if not db.create_vehicle(vehicle_data):
+            return jsonify({'error': 'Failed to register vehicle'}), 500
+        record_change(EVENT_REGISTERED, None, vehicle_data)
 
         return jsonify({
             'message': 'Vehicle registered successfully',
@@ -88,42 +498,61 @@ def register_vehicle():
         return jsonify({'error': 'Internal server error'}), 500
 
 
+@app.route('/api/register/bulk', methods=['POST'])
+def bulk_register_vehicles():
+    """Register many vehicles from an uploaded CSV/JSON file or a JSON body"""
+    try:
+        upload = request.files.get('file')
+        try:
+            if upload:
+                file_format = request.form.get('format') or os.path.splitext(upload.filename or '')[1].lstrip('.').lower()
+                rows = parse_import_file(upload.read(), file_format)
+            elif request.mimetype == 'text/csv':
+                rows = parse_import_file(request.get_data(), 'csv')
+            else:
+                rows = parse_import_file(request.get_data(), 'json')
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+
+        if not rows:
+            return jsonify({'error': 'No vehicles to import'}), 400
+        if len(rows) > app.config['BULK_IMPORT_MAX_ROWS']:
+            return jsonify({
+                'error': f"Too many rows. Maximum is {app.config['BULK_IMPORT_MAX_ROWS']}"
+            }), 400
+
+        report, created = import_vehicles(db, rows, workers=app.config['BULK_IMPORT_WORKERS'])
+        # One counter and version update for the whole batch
+        fleet = stats.add(count_changes((None, vehicle) for vehicle in created)) if created else None
+        for vehicle in created:
+            record_change(EVENT_REGISTERED, None, vehicle, counted=True, fleet=fleet)
+
+        return jsonify({
+            'message': 'Bulk import finished',
+            'data': report
+        }), 200
+
+    except Exception as e:
+        app.logger.error(f"Bulk registration error: {str(e)}")
+        return jsonify({'error': 'Internal server error'}), 500
+
+
 @app.route('/api/verify', methods=['POST'])
 def verify_vehicle():
     """Verify vehicle and check remaining passes (called by Raspberry Pi)"""
     try:
         data = request.get_json()
-        plate_number = data.get('plate_number', '').upper().replace(' ', '')
+        plate_number = normalize_plate(data.get('plate_number', ''))
 
         if not plate_number:
-            return jsonify({'error': 'Plate number is required'}), 400
+            return jsonify(PLATE_REQUIRED[0]), PLATE_REQUIRED[1]
 
         # Get vehicle from database
-        vehicle = db.get_vehicle(plate_number)
+        plate_number, vehicle = gate_vehicle(plate_number)
+        _log_gate_decision(ACTION_VERIFY, plate_number, verify_outcome(vehicle), vehicle)
 
-        if not vehicle:
-            return jsonify({
-                'authorized': False,
-                'message': 'Vehicle not registered'
-            }), 200
-
-        # Check if vehicle has remaining passes
-        if vehicle.get('remaining_passes', 0) <= 0:
-            return jsonify({
-                'authorized': False,
-                'message': 'No remaining passes',
-                'name': vehicle.get('name'),
-                'remaining_passes': 0
-            }), 200
-
-        # Vehicle authorized
-        return jsonify({
-            'authorized': True,
-            'message': 'Access granted',
-            'name': vehicle.get('name'),
-            'remaining_passes': vehicle.get('remaining_passes'),
-            'car_type': vehicle.get('car_type')
-        }), 200
+        body, status_code = verify_result(vehicle)
+        return jsonify(body), status_code
 
     except Exception as e:
         app.logger.error(f"Verification error: {str(e)}")
@@ -135,63 +564,515 @@ def deduct_pass():
     """Deduct a pass after successful entry (called by Raspberry Pi)"""
     try:
         data = request.get_json()
-        plate_number = data.get('plate_number', '').upper().replace(' ', '')
+        plate_number = normalize_plate(data.get('plate_number', ''))
 
         if not plate_number:
-            return jsonify({'error': 'Plate number is required'}), 400
+            return jsonify(PLATE_REQUIRED[0]), PLATE_REQUIRED[1]
+
+        # With an Idempotency-Key, a retried request gets the original answer
+        idempotency_key = request.headers.get(IDEMPOTENCY_HEADER)
+        if idempotency_key is not None:
+            if not validate_idempotency_key(idempotency_key):
+                return jsonify(INVALID_IDEMPOTENCY_KEY[0]), INVALID_IDEMPOTENCY_KEY[1]
+            plate_number, outcome, vehicle, replayed = idempotent_access(plate_number, idempotency_key)
+            _log_gate_decision(ACTION_DEDUCT, plate_number, outcome, vehicle, replayed)
+            body, status_code = deduct_once_result(outcome, vehicle)
+            return jsonify(body), status_code, replay_headers(replayed)
 
         # Get vehicle from database
-        vehicle = db.get_vehicle(plate_number)
+        plate_number, vehicle = gate_vehicle(plate_number)
 
         if not vehicle:
-            return jsonify({'error': 'Vehicle not found'}), 404
+            _log_gate_decision(ACTION_DEDUCT, plate_number, ACCESS_NOT_REGISTERED)
+            return jsonify(VEHICLE_NOT_FOUND[0]), VEHICLE_NOT_FOUND[1]
 
         # Deduct pass
         success = db.deduct_pass(plate_number)
 
         if success:
             updated_vehicle = db.get_vehicle(plate_number)
-            return jsonify({
-                'message': 'Pass deducted successfully',
-                'remaining_passes': updated_vehicle.get('remaining_passes')
-            }), 200
+            record_change(EVENT_PASS_DEDUCTED, vehicle, updated_vehicle)
+            _log_gate_decision(ACTION_DEDUCT, plate_number, ACCESS_GRANTED, updated_vehicle)
+            body, status_code = deduct_result(updated_vehicle)
+            return jsonify(body), status_code
         else:
-            return jsonify({'error': 'Failed to deduct pass'}), 500
+            outcome = ACCESS_NO_PASSES if vehicle.get('remaining_passes', 0) <= 0 else ACCESS_ERROR
+            _log_gate_decision(ACTION_DEDUCT, plate_number, outcome, vehicle)
+            return jsonify(DEDUCT_FAILED[0]), DEDUCT_FAILED[1]
 
     except Exception as e:
         app.logger.error(f"Pass deduction error: {str(e)}")
         return jsonify({'error': 'Internal server error'}), 500
 
 
+@app.route('/api/access', methods=['POST'])
+def access_vehicle():
+    """Verify a vehicle and deduct a pass in one step (called by Raspberry Pi)"""
+    try:
+        data = request.get_json()
+        plate_number = normalize_plate(data.get('plate_number', ''))
+
+        if not plate_number:
+            return jsonify(PLATE_REQUIRED[0]), PLATE_REQUIRED[1]
+
+        idempotency_key = request.headers.get(IDEMPOTENCY_HEADER)
+        if idempotency_key is not None:
+            if not validate_idempotency_key(idempotency_key):
+                return jsonify(INVALID_IDEMPOTENCY_KEY[0]), INVALID_IDEMPOTENCY_KEY[1]
+            plate_number, outcome, vehicle, replayed = idempotent_access(plate_number, idempotency_key)
+            _log_gate_decision(ACTION_ACCESS, plate_number, outcome, vehicle, replayed)
+            body, status_code = access_result(outcome, vehicle)
+            return jsonify(body), status_code, replay_headers(replayed)
+
+        # Single conditional write: checks registration and balance, then deducts
+        plate_number, outcome, vehicle = gate_access(plate_number)
+        _log_gate_decision(ACTION_ACCESS, plate_number, outcome, vehicle)
+
+        if outcome == ACCESS_GRANTED:
+            record_change(
+                EVENT_PASS_DEDUCTED,
+                dict(vehicle, remaining_passes=vehicle.get('remaining_passes', 0) + 1),
+                vehicle
+            )
+
+        body, status_code = access_result(outcome, vehicle)
+        return jsonify(body), status_code
+
+    except Exception as e:
+        app.logger.error(f"Access error: {str(e)}")
+        return jsonify({'error': 'Internal server error'}), 500
+
+
 @app.route('/api/vehicle/<plate_number>', methods=['GET'])
+@versioned
 def get_vehicle_info(plate_number):
     """Get vehicle information"""
     try:
+        vehicle = db.get_vehicle(normalize_plate(plate_number))
+
+        body, status_code = vehicle_result(vehicle)
+        return jsonify(body), status_code
+
+    except Exception as e:
+        app.logger.error(f"Get vehicle error: {str(e)}")
+        return jsonify({'error': 'Internal server error'}), 500
+
+
+def _access_events_page(plate_number=None, day=None):
+    """Shared query handling for the access event endpoints"""
+    limit, error = parse_page_limit(
+        request.args.get('limit'),
+        app.config['ACCESS_EVENTS_PAGE_SIZE'],
+        app.config['VEHICLES_MAX_PAGE_SIZE']
+    )
+    if error:
+        return jsonify({'error': error}), 400
+    since, until, error = parse_time_range(request.args)
+    if error:
+        return jsonify({'error': error}), 400
+
+    try:
+        entries, next_cursor = db.query_access_events(
+            plate_number=plate_number, day=day, limit=limit,
+            cursor=request.args.get('cursor'), since=since, until=until
+        )
+    except ValueError:
+        return jsonify({'error': 'Invalid cursor'}), 400
+
+    return jsonify({
+        'data': entries,
+        'count': len(entries),
+        'next_cursor': next_cursor
+    }), 200
+
+
+@app.route('/api/vehicle/<plate_number>/history', methods=['GET'])
+def get_vehicle_history(plate_number):
+    """Entry history (verify, deduct and access decisions) for a vehicle, newest first"""
+    try:
+        return _access_events_page(plate_number=normalize_plate(plate_number))
+    except Exception as e:
+        app.logger.error(f"Vehicle history error: {str(e)}")
+        return jsonify({'error': 'Internal server error'}), 500
+
+
+@app.route('/api/access-events', methods=['GET'])
+def list_access_events():
+    """Access events for every vehicle on one day, newest first"""
+    try:
+        day = request.args.get('day') or datetime.utcnow().date().isoformat()
+        try:
+            datetime.strptime(day, '%Y-%m-%d')
+        except ValueError:
+            return jsonify({'error': 'day must be YYYY-MM-DD'}), 400
+        return _access_events_page(day=day)
+    except Exception as e:
+        app.logger.error(f"Access events error: {str(e)}")
+        return jsonify({'error': 'Internal server error'}), 500
+
+
+def _analytics_buckets(granularity, default_days):
+    """Buckets covered by the since/until query arguments (default: the last default_days)"""
+    since, until, error = parse_time_range(request.args)
+    if error:
+        return None, error
+    end = datetime.fromisoformat(until) if until else datetime.utcnow()
+    start = datetime.fromisoformat(since) if since else end - timedelta(days=default_days)
+    if start > end:
+        return None, "since cannot be after until"
+    buckets = bucket_range(granularity, start, end)
+    if len(buckets) > MAX_BUCKETS[granularity]:
+        return None, f"Range too large; at most {MAX_BUCKETS[granularity]} {granularity} buckets"
+    return buckets, None
+
+
+@app.route('/api/analytics/throughput', methods=['GET'])
+def analytics_throughput():
+    """Entries and denials per hour or day, for one gate or all gates"""
+    try:
+        granularity = request.args.get('granularity', GRANULARITY_HOUR)
+        if granularity not in (GRANULARITY_HOUR, GRANULARITY_DAY):
+            return jsonify({'error': 'granularity must be hour or day'}), 400
+        gate_id = request.args.get('gate') or ALL_GATES
+        buckets, error = _analytics_buckets(granularity, 1 if granularity == GRANULARITY_HOUR else 30)
+        if error:
+            return jsonify({'error': error}), 400
+
+        items = db.query_rollups(gate_series(gate_id, granularity), buckets[0], buckets[-1])
+        rows = fill_series(items, buckets, (FIELD_ENTRIES, FIELD_DENIED))
+        return jsonify({'data': {
+            'gate': gate_id,
+            'granularity': granularity,
+            'series': rows,
+            'totals': {field: sum(row[field] for row in rows) for field in (FIELD_ENTRIES, FIELD_DENIED)}
+        }}), 200
+
+    except Exception as e:
+        app.logger.error(f"Throughput analytics error: {str(e)}")
+        return jsonify({'error': 'Internal server error'}), 500
+
+
+@app.route('/api/analytics/peak-hours', methods=['GET'])
+def analytics_peak_hours():
+    """Busiest hours and the average hour-of-day load for one gate or all gates"""
+    try:
+        gate_id = request.args.get('gate') or ALL_GATES
+        buckets, error = _analytics_buckets(GRANULARITY_HOUR, 7)
+        if error:
+            return jsonify({'error': error}), 400
+
+        items = db.query_rollups(gate_series(gate_id, GRANULARITY_HOUR), buckets[0], buckets[-1])
+        rows = fill_series(items, buckets, (FIELD_ENTRIES, FIELD_DENIED))
+        return jsonify({'data': dict(peak_hours(rows), gate=gate_id)}), 200
+
+    except Exception as e:
+        app.logger.error(f"Peak hours analytics error: {str(e)}")
+        return jsonify({'error': 'Internal server error'}), 500
+
+
+@app.route('/api/analytics/vehicle/<plate_number>/burn-down', methods=['GET'])
+def analytics_burn_down(plate_number):
+    """Passes used per day by a vehicle and how long its balance will last"""
+    try:
+        plate_number = normalize_plate(plate_number)
+        vehicle = db.get_vehicle(plate_number)
+        if not vehicle:
+            return jsonify(VEHICLE_NOT_FOUND[0]), VEHICLE_NOT_FOUND[1]
+        buckets, error = _analytics_buckets(GRANULARITY_DAY, 30)
+        if error:
+            return jsonify({'error': error}), 400
+
+        items = db.query_rollups(vehicle_series(plate_number), buckets[0], buckets[-1])
+        rows = fill_series(items, buckets, (FIELD_PASSES_USED,))
+        return jsonify({'data': dict(
+            burn_down(rows, vehicle.get('remaining_passes')),
+            plate_number=plate_number
+        )}), 200
+
+    except Exception as e:
+        app.logger.error(f"Burn-down analytics error: {str(e)}")
+        return jsonify({'error': 'Internal server error'}), 500
+
+
+@app.route('/api/vehicle/<plate_number>/status', methods=['PUT'])
+def update_vehicle_status(plate_number):
+    """Change a vehicle's status (active, suspended, inactive)"""
+    try:
+        data = request.get_json()
         plate_number = plate_number.upper().replace(' ', '')
+        status = data.get('status')
+
+        if status not in VALID_STATUSES:
+            return jsonify({
+                'error': f"Invalid status. Must be one of: {', '.join(VALID_STATUSES)}"
+            }), 400
+
         vehicle = db.get_vehicle(plate_number)
+        if not vehicle:
+            return jsonify({'error': 'Vehicle not found'}), 404
+
+        if not db.update_vehicle_status(plate_number, status):
+            return jsonify({'error': 'Failed to update status'}), 500
+
+        record_change(EVENT_STATUS_CHANGED, vehicle, dict(vehicle, status=status))
+        return jsonify({
+            'message': 'Status updated successfully',
+            'status': status
+        }), 200
+
+    except Exception as e:
+        app.logger.error(f"Update status error: {str(e)}")
+        return jsonify({'error': 'Internal server error'}), 500
+
 
+@app.route('/api/vehicle/<plate_number>', methods=['DELETE'])
+def delete_vehicle(plate_number):
+    """Delete a vehicle registration"""
+    try:
+        plate_number = plate_number.upper().replace(' ', '')
+
+        vehicle = db.get_vehicle(plate_number)
         if not vehicle:
             return jsonify({'error': 'Vehicle not found'}), 404
 
-        return jsonify({'data': vehicle}), 200
+        if not db.delete_vehicle(plate_number):
+            return jsonify({'error': 'Failed to delete vehicle'}), 500
+
+        record_change(EVENT_DELETED, vehicle, None)
+        return jsonify({'message': 'Vehicle deleted successfully'}), 200
 
     except Exception as e:
-        app.logger.error(f"Get vehicle error: {str(e)}")
+        app.logger.error(f"Delete vehicle error: {str(e)}")
         return jsonify({'error': 'Internal server error'}), 500
 
 
+@app.route('/api/stats', methods=['GET'])
+@versioned
+def get_stats():
+    """Dashboard counts, maintained incrementally instead of scanning"""
+    try:
+        return jsonify({'data': stats.snapshot()}), 200
+    except Exception as e:
+        app.logger.error(f"Get stats error: {str(e)}")
+        return jsonify({'error': 'Internal server error'}), 500
+
+
+@app.route('/api/events', methods=['GET'])
+def vehicle_events():
+    """The change feed is only streamed by the ASGI app (backend.asgi)
+
+    Each open stream would hold one of this server's request threads for as
+    long as the dashboard stays open, so it answers 503 and dashboards fall
+    back to polling.
+    """
+    return jsonify({'error': 'Change feed is served by the ASGI server (uvicorn backend.asgi:app)'}), 503
+
+
 @app.route('/api/vehicles', methods=['GET'])
+@versioned
 def list_vehicles():
-    """List all registered vehicles"""
+    """List registered vehicles one page at a time"""
+    try:
+        limit, error_message = parse_page_limit(
+            request.args.get('limit'),
+            app.config['VEHICLES_PAGE_SIZE'],
+            app.config['VEHICLES_MAX_PAGE_SIZE']
+        )
+        if error_message:
+            return jsonify({'error': error_message}), 400
+
+        filters, error_message = parse_vehicle_filters(request.args)
+        if error_message:
+            return jsonify({'error': error_message}), 400
+
+        try:
+            vehicles, next_cursor = db.list_vehicles_page(
+                limit=limit,
+                cursor=request.args.get('cursor'),
+                filters=filters
+            )
+        except ValueError:
+            return jsonify({'error': 'Invalid cursor'}), 400
+
+        return jsonify({
+            'data': vehicles,
+            'count': len(vehicles),
+            'next_cursor': next_cursor
+        }), 200
+
+    except Exception as e:
+        app.logger.error(f"List vehicles error: {str(e)}")
+        return jsonify({'error': 'Internal server error'}), 500
+
+
+# Longest accepted /api/search query
+SEARCH_MAX_QUERY_LENGTH = 64
+
+
+@app.route('/api/search', methods=['GET'])
+def search_vehicles():
+    """Find vehicles by part of a plate, name or email, best matches first
+
+    Answered from the in-memory search index without a database call.
+    """
     try:
-        vehicles = db.list_all_vehicles()
+        query = (request.args.get('q') or '').strip()
+        if not query:
+            return jsonify({'error': 'Query parameter q is required'}), 400
+        if len(query) > SEARCH_MAX_QUERY_LENGTH:
+            return jsonify({'error': f"q must be at most {SEARCH_MAX_QUERY_LENGTH} characters"}), 400
+
+        limit, error_message = parse_page_limit(
+            request.args.get('limit'),
+            app.config['SEARCH_RESULTS_LIMIT'],
+            app.config['SEARCH_MAX_RESULTS_LIMIT']
+        )
+        if error_message:
+            return jsonify({'error': error_message}), 400
+
+        if not search_index.ready:
+            return jsonify({'error': 'Search index is still loading'}), 503, {'Retry-After': '1'}
+
+        matches = search_index.search(query, limit=limit)
+        return jsonify({
+            'data': matches,
+            'count': len(matches)
+        }), 200
+
+    except Exception as e:
+        app.logger.error(f"Search error: {str(e)}")
+        return jsonify({'error': 'Internal server error'}), 500
+
+
+@app.route('/api/vehicles/by-status/<status>', methods=['GET'])
+@versioned
+def list_vehicles_by_status(status):
+    """List vehicles with one status, fewest remaining passes first
+
+    An index query: its cost follows the number of vehicles returned, not
+    the size of the fleet. min_passes and max_passes narrow the range.
+    """
+    try:
+        if status not in VALID_STATUSES:
+            return jsonify({'error': f"Invalid status. Must be one of: {', '.join(VALID_STATUSES)}"}), 400
+
+        limit, error_message = parse_page_limit(
+            request.args.get('limit'),
+            app.config['VEHICLES_PAGE_SIZE'],
+            app.config['VEHICLES_MAX_PAGE_SIZE']
+        )
+        if error_message:
+            return jsonify({'error': error_message}), 400
+
+        pass_range, error_message = parse_pass_range(request.args)
+        if error_message:
+            return jsonify({'error': error_message}), 400
+
+        try:
+            vehicles, next_cursor = db.query_vehicles_by_status(
+                status,
+                limit=limit,
+                cursor=request.args.get('cursor'),
+                **pass_range
+            )
+        except ValueError:
+            return jsonify({'error': 'Invalid cursor'}), 400
+
+        return jsonify({
+            'data': vehicles,
+            'count': len(vehicles),
+            'next_cursor': next_cursor
+        }), 200
+
+    except Exception as e:
+        app.logger.error(f"List vehicles by status error: {str(e)}")
+        return jsonify({'error': 'Internal server error'}), 500
+
+
+@app.route('/api/vehicles/by-email/<email>', methods=['GET'])
+@versioned
+def list_vehicles_by_email(email):
+    """List every vehicle registered with an email (exact match)"""
+    try:
+        vehicles = db.query_vehicles_by_email(email.strip())
         return jsonify({
             'data': vehicles,
             'count': len(vehicles)
         }), 200
 
     except Exception as e:
-        app.logger.error(f"List vehicles error: {str(e)}")
+        app.logger.error(f"List vehicles by email error: {str(e)}")
+        return jsonify({'error': 'Internal server error'}), 500
+
+
+# Column order for CSV exports
+EXPORT_FIELDS = [
+    'plate_number', 'name', 'car_type', 'email', 'phone_number',
+    'total_passes', 'remaining_passes', 'status', 'registered_at'
+]
+
+
+def _ndjson_lines(vehicles):
+    """Yield one JSON document per line"""
+    for vehicle in vehicles:
+        yield app.json.dumps(vehicle) + '\n'
+
+
+def _csv_lines(vehicles):
+    """Yield a CSV header and then one encoded row at a time"""
+    buffer = io.StringIO()
+    writer = csv.DictWriter(buffer, fieldnames=EXPORT_FIELDS, extrasaction='ignore')
+    writer.writeheader()
+    for vehicle in vehicles:
+        writer.writerow(vehicle)
+        yield buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+    yield buffer.getvalue()
+
+
+def _logged_stream(lines):
+    """Log a scan failure after headers are sent instead of raising it"""
+    try:
+        yield from lines
+    except Exception as e:
+        app.logger.error(f"Export stream error: {str(e)}")
+
+
+@app.route('/api/vehicles/export', methods=['GET'])
+def export_vehicles():
+    """Stream vehicles as NDJSON or CSV straight from the scan pages"""
+    try:
+        export_format = request.args.get('format', 'ndjson')
+        if export_format not in ('ndjson', 'csv'):
+            return jsonify({'error': 'format must be ndjson or csv'}), 400
+
+        filters, error_message = parse_vehicle_filters(request.args)
+        if error_message:
+            return jsonify({'error': error_message}), 400
+
+        # Read the first page before answering so a scan failure is still a 500
+        vehicles = db.iter_vehicles(filters=filters)
+        first = next(vehicles, None)
+        if first is not None:
+            vehicles = itertools.chain([first], vehicles)
+
+        if export_format == 'csv':
+            lines, mimetype = _csv_lines(vehicles), 'text/csv'
+        else:
+            lines, mimetype = _ndjson_lines(vehicles), 'application/x-ndjson'
+
+        return Response(
+            stream_with_context(_logged_stream(lines)),
+            mimetype=mimetype,
+            headers={
+                'Content-Disposition': f'attachment; filename=vehicles.{export_format}',
+                'X-Accel-Buffering': 'no'
+            }
+        )
+
+    except Exception as e:
+        app.logger.error(f"Export vehicles error: {str(e)}")
         return jsonify({'error': 'Internal server error'}), 500
 
 
@@ -214,6 +1095,7 @@ def add_passes():
 
         if success:
             updated_vehicle = db.get_vehicle(plate_number)
+            record_change(EVENT_PASSES_ADDED, vehicle, updated_vehicle)
             return jsonify({
                 'message': 'Passes added successfully',
                 'remaining_passes': updated_vehicle.get('remaining_passes')
@@ -226,12 +1108,23 @@ def add_passes():
         return jsonify({'error': 'Internal server error'}), 500
 
 
+@app.cli.command('init-db')
+def init_db_command():
+    """Create the storage tables if they don't exist
+
+    Run once per deploy, before the workers start:
+        flask --app backend.app init-db
+    """
+    if not db.create_tables():
+        raise click.ClickException('Could not create every table; see the log above')
+    click.echo(f"{app.config['STORAGE_BACKEND']} storage is ready")
+
+
 if __name__ == '__main__':
-    # Create DynamoDB table if it doesn't exist
-    db.create_table()
+    # Single-process development server; tables are checked on every start
+    db.create_tables()
 
-    # Run Flask app
-    app.run(
+    create_app().run(
         host=app.config['HOST'],
         port=app.config['PORT'],
         debug=app.config['DEBUG']
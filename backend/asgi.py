@@ -0,0 +1,287 @@
+"""
+ASGI (asyncio) serving mode for Vehicle Pass Registration System
+
+The gate-facing routes and the change feed run natively on the event loop
+with AsyncDynamoDBManager. Every other route falls through to the Flask app,
+which runs on a thread pool, so both modes share the same cache, counters
+and change feed, and answer with the same response shapes. The gate
+decisions themselves (plate filter, misread correction, idempotent
+deduction) are the Flask app's helpers, run on the database thread pool.
+
+Usage:
+    uvicorn backend.asgi:app --host 0.0.0.0 --port 5000
+    python -m backend.asgi
+"""
+from datetime import datetime
+import contextlib
+import functools
+import sys
+import os
+
+# Add parent directory to path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from a2wsgi import WSGIMiddleware
+from starlette.applications import Starlette
+from starlette.middleware import Middleware
+from starlette.middleware.cors import CORSMiddleware
+from starlette.responses import Response, StreamingResponse
+from starlette.routing import Mount, Route
+
+from backend.app import (
+    app as flask_app, db, events, limiter, record_change, current_etag, log_access, start_worker,
+    gate_vehicle, gate_access, idempotent_access
+)
+from backend.access_log import verify_outcome, ACTION_VERIFY, ACTION_DEDUCT, ACTION_ACCESS
+from backend.async_database import AsyncDynamoDBManager
+from backend.database import ACCESS_GRANTED, ACCESS_NO_PASSES, ACCESS_NOT_REGISTERED, ACCESS_ERROR
+from backend.metrics import RequestTimer
+from backend.rate_limit import GATE_HEADER, throttled_result
+from backend.events import BrokerFull, HEARTBEAT_FRAME, EVENT_PASS_DEDUCTED
+from backend.responses import (
+    normalize_plate, verify_result, access_result, deduct_result, deduct_once_result,
+    vehicle_result, replay_headers, PLATE_REQUIRED, VEHICLE_NOT_FOUND, INTERNAL_ERROR,
+    DEDUCT_FAILED, INVALID_IDEMPOTENCY_KEY, IDEMPOTENCY_HEADER
+)
+from backend.validators import validate_idempotency_key
+
+logger = flask_app.logger
+
+async_db = AsyncDynamoDBManager(db, max_concurrency=flask_app.config['ASYNC_DB_MAX_CONCURRENCY'])
+
+
+def json_response(result, headers=None):
+    """Encode a (body, status_code) tuple with the Flask app's JSON provider"""
+    body, status_code = result
+    return Response(
+        flask_app.json.dumps(body),
+        status_code=status_code,
+        media_type='application/json',
+        headers=headers
+    )
+
+
+def native_route(route):
+    """Apply the gate rate limits and record metrics under a Flask-style route name"""
+    def decorator(handler):
+        @functools.wraps(handler)
+        async def wrapper(request):
+            timer = RequestTimer(request.method, route)
+            request.state.started = timer.start
+            status_code = 500
+            try:
+                client = request.client.host if request.client else None
+                retry_after = limiter.check(request.method, route, request.headers.get(GATE_HEADER), client)
+                if retry_after:
+                    body, code, headers = throttled_result(retry_after)
+                    response = json_response((body, code), headers=headers)
+                else:
+                    response = await handler(request)
+                status_code = response.status_code
+                return response
+            finally:
+                timer.finish(status_code)
+        return wrapper
+    return decorator
+
+
+async def _plate_from_body(request):
+    """Read and normalize the plate number from a JSON request body"""
+    data = await request.json()
+    return normalize_plate(data.get('plate_number', ''))
+
+
+def _log_gate_decision(request, action, plate_number, outcome, vehicle=None, replayed=False):
+    """log_access for a native request"""
+    log_access(action, plate_number, request.headers.get(GATE_HEADER), request.state.started,
+               outcome, vehicle=vehicle, replayed=replayed)
+
+
+@native_route('/health')
+async def health_check(request):
+    """Health check endpoint"""
+    return json_response(({
+        'status': 'healthy',
+        'timestamp': datetime.utcnow().isoformat()
+    }, 200))
+
+
+@native_route('/api/verify')
+async def verify_vehicle(request):
+    """Verify vehicle and check remaining passes (called by Raspberry Pi)"""
+    try:
+        plate_number = await _plate_from_body(request)
+        if not plate_number:
+            return json_response(PLATE_REQUIRED)
+
+        plate_number, vehicle = await async_db.call(gate_vehicle, plate_number)
+        _log_gate_decision(request, ACTION_VERIFY, plate_number, verify_outcome(vehicle), vehicle)
+        return json_response(verify_result(vehicle))
+
+    except Exception as e:
+        logger.error(f"Verification error: {str(e)}")
+        return json_response(INTERNAL_ERROR)
+
+
+@native_route('/api/access')
+async def access_vehicle(request):
+    """Verify a vehicle and deduct a pass in one step (called by Raspberry Pi)"""
+    try:
+        plate_number = await _plate_from_body(request)
+        if not plate_number:
+            return json_response(PLATE_REQUIRED)
+
+        idempotency_key = request.headers.get(IDEMPOTENCY_HEADER)
+        if idempotency_key is not None:
+            if not validate_idempotency_key(idempotency_key):
+                return json_response(INVALID_IDEMPOTENCY_KEY)
+            plate_number, outcome, vehicle, replayed = await async_db.call(
+                idempotent_access, plate_number, idempotency_key
+            )
+            _log_gate_decision(request, ACTION_ACCESS, plate_number, outcome, vehicle, replayed)
+            return json_response(access_result(outcome, vehicle), headers=replay_headers(replayed))
+
+        plate_number, outcome, vehicle = await async_db.call(gate_access, plate_number)
+        _log_gate_decision(request, ACTION_ACCESS, plate_number, outcome, vehicle)
+
+        if outcome == ACCESS_GRANTED:
+            await async_db.call(
+                record_change,
+                EVENT_PASS_DEDUCTED,
+                dict(vehicle, remaining_passes=vehicle.get('remaining_passes', 0) + 1),
+                vehicle
+            )
+
+        return json_response(access_result(outcome, vehicle))
+
+    except Exception as e:
+        logger.error(f"Access error: {str(e)}")
+        return json_response(INTERNAL_ERROR)
+
+
+@native_route('/api/deduct-pass')
+async def deduct_pass(request):
+    """Deduct a pass after successful entry (called by Raspberry Pi)"""
+    try:
+        plate_number = await _plate_from_body(request)
+        if not plate_number:
+            return json_response(PLATE_REQUIRED)
+
+        idempotency_key = request.headers.get(IDEMPOTENCY_HEADER)
+        if idempotency_key is not None:
+            if not validate_idempotency_key(idempotency_key):
+                return json_response(INVALID_IDEMPOTENCY_KEY)
+            plate_number, outcome, vehicle, replayed = await async_db.call(
+                idempotent_access, plate_number, idempotency_key
+            )
+            _log_gate_decision(request, ACTION_DEDUCT, plate_number, outcome, vehicle, replayed)
+            return json_response(deduct_once_result(outcome, vehicle), headers=replay_headers(replayed))
+
+        plate_number, vehicle = await async_db.call(gate_vehicle, plate_number)
+        if not vehicle:
+            _log_gate_decision(request, ACTION_DEDUCT, plate_number, ACCESS_NOT_REGISTERED)
+            return json_response(VEHICLE_NOT_FOUND)
+
+        if not await async_db.deduct_pass(plate_number):
+            outcome = ACCESS_NO_PASSES if vehicle.get('remaining_passes', 0) <= 0 else ACCESS_ERROR
+            _log_gate_decision(request, ACTION_DEDUCT, plate_number, outcome, vehicle)
+            return json_response(DEDUCT_FAILED)
+
+        updated_vehicle = await async_db.get_vehicle(plate_number)
+        await async_db.call(record_change, EVENT_PASS_DEDUCTED, vehicle, updated_vehicle)
+        _log_gate_decision(request, ACTION_DEDUCT, plate_number, ACCESS_GRANTED, updated_vehicle)
+        return json_response(deduct_result(updated_vehicle))
+
+    except Exception as e:
+        logger.error(f"Pass deduction error: {str(e)}")
+        return json_response(INTERNAL_ERROR)
+
+
+@native_route('/api/vehicle/<plate_number>')
+async def get_vehicle_info(request):
+    """Get vehicle information, with the same ETag handling as the Flask route"""
+    try:
+        # Flask's request.full_path always carries the '?'
+        etag = await async_db.call(current_etag, f"{request.url.path}?{request.url.query}")
+        headers = {'ETag': f'"{etag}"', 'Cache-Control': 'no-cache'} if etag else None
+        if_none_match = request.headers.get('if-none-match', '')
+        # Weak comparison, as the Flask app does for compressed responses
+        tags = [tag.strip().removeprefix('W/') for tag in if_none_match.split(',')]
+        if etag and (f'"{etag}"' in tags or if_none_match.strip() == '*'):
+            return Response(status_code=304, headers=headers)
+
+        vehicle = await async_db.get_vehicle(normalize_plate(request.path_params['plate_number']))
+        result = vehicle_result(vehicle)
+        return json_response(result, headers=headers if result[1] == 200 else None)
+
+    except Exception as e:
+        logger.error(f"Get vehicle error: {str(e)}")
+        return json_response(INTERNAL_ERROR)
+
+
+@native_route('/api/events')
+async def vehicle_events(request):
+    """Server-Sent Events stream of vehicle changes, without a thread per client"""
+    try:
+        subscription = events.subscribe(request.headers.get('last-event-id'))
+    except BrokerFull:
+        return json_response(({'error': 'Too many event stream clients'}, 503))
+
+    heartbeat = flask_app.config['SSE_HEARTBEAT_SECONDS']
+
+    async def stream():
+        try:
+            yield 'retry: 3000\n\n'
+            while not subscription.overflowed:
+                frame = await subscription.next_frame(heartbeat)
+                yield frame if frame is not None else HEARTBEAT_FRAME
+        finally:
+            events.unsubscribe(subscription)
+
+    return StreamingResponse(
+        stream(),
+        media_type='text/event-stream',
+        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+    )
+
+
+@contextlib.asynccontextmanager
+async def lifespan(app):
+    """Start this process's background work; release the database thread pool on shutdown"""
+    start_worker()
+    yield
+    async_db.shutdown()
+
+
+app = Starlette(
+    routes=[
+        Route('/health', health_check, methods=['GET']),
+        Route('/api/verify', verify_vehicle, methods=['POST']),
+        Route('/api/access', access_vehicle, methods=['POST']),
+        Route('/api/deduct-pass', deduct_pass, methods=['POST']),
+        Route('/api/vehicle/{plate_number}', get_vehicle_info, methods=['GET']),
+        Route('/api/events', vehicle_events, methods=['GET']),
+        # Everything else is served by the Flask app on a thread pool
+        Mount('/', app=WSGIMiddleware(flask_app))
+    ],
+    middleware=[
+        Middleware(
+            CORSMiddleware,
+            allow_origins=flask_app.config['CORS_ORIGINS'],
+            allow_methods=['*'],
+            allow_headers=['*'],
+            expose_headers=['ETag', 'Idempotent-Replayed', 'Retry-After', 'Server-Timing', 'X-Profile-File']
+        )
+    ],
+    lifespan=lifespan
+)
+
+
+if __name__ == '__main__':
+    import uvicorn
+
+    uvicorn.run(
+        app,
+        host=flask_app.config['HOST'],
+        port=flask_app.config['PORT']
+    )
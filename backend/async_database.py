@@ -0,0 +1,78 @@
+"""
+Async DynamoDB access for the ASGI serving mode
+"""
+from concurrent.futures import ThreadPoolExecutor
+import asyncio
+import functools
+
+
+class AsyncDynamoDBManager:
+    """Awaitable versions of the DynamoDBManager operations
+
+    boto3 is blocking, so every call runs on a dedicated thread pool sized
+    for the number of DynamoDB requests we want in flight at once. The event
+    loop itself never blocks, so one process can hold thousands of open gate
+    connections while max_concurrency calls are outstanding. The wrapped
+    manager (usually the VehicleCache) is shared with the Flask app.
+    """
+
+    def __init__(self, db, max_concurrency=64):
+        """Initialize around a sync database manager"""
+        self.db = db
+        self.max_concurrency = max_concurrency
+        self._executor = ThreadPoolExecutor(
+            max_workers=max_concurrency,
+            thread_name_prefix='async-db'
+        )
+
+    async def _run(self, method, *args, **kwargs):
+        """Run a sync manager method on the database thread pool"""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(
+            self._executor,
+            functools.partial(method, *args, **kwargs)
+        )
+
+    async def get_vehicle(self, plate_number):
+        """Get vehicle by plate number"""
+        return await self._run(self.db.get_vehicle, plate_number)
+
+    async def create_vehicle(self, vehicle_data):
+        """Create a new vehicle registration"""
+        return await self._run(self.db.create_vehicle, vehicle_data)
+
+    async def access_vehicle(self, plate_number):
+        """Authorize an entry and deduct one pass in a single conditional write"""
+        return await self._run(self.db.access_vehicle, plate_number)
+
+    async def access_vehicle_once(self, plate_number, idempotency_key):
+        """Authorize an entry and deduct one pass at most once per idempotency key"""
+        return await self._run(self.db.access_vehicle_once, plate_number, idempotency_key)
+
+    async def deduct_pass(self, plate_number):
+        """Deduct one pass from vehicle"""
+        return await self._run(self.db.deduct_pass, plate_number)
+
+    async def add_passes(self, plate_number, passes_to_add):
+        """Add passes to vehicle"""
+        return await self._run(self.db.add_passes, plate_number, passes_to_add)
+
+    async def update_vehicle_status(self, plate_number, status):
+        """Update vehicle status (active, suspended, etc.)"""
+        return await self._run(self.db.update_vehicle_status, plate_number, status)
+
+    async def delete_vehicle(self, plate_number):
+        """Delete a vehicle registration"""
+        return await self._run(self.db.delete_vehicle, plate_number)
+
+    async def list_vehicles_page(self, limit=100, cursor=None, filters=None):
+        """List one page of vehicles, optionally filtered"""
+        return await self._run(self.db.list_vehicles_page, limit, cursor, filters)
+
+    async def call(self, function, *args, **kwargs):
+        """Run any other blocking function that reaches storage on the database thread pool"""
+        return await self._run(function, *args, **kwargs)
+
+    def shutdown(self):
+        """Stop the database thread pool"""
+        self._executor.shutdown(wait=False)
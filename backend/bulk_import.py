@@ -0,0 +1,193 @@
+"""
+Bulk vehicle registration for Vehicle Pass Registration System
+
+Usage:
+    python -m backend.bulk_import vehicles.csv [--workers 4]
+"""
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+import argparse
+import csv
+import io
+import json
+import logging
+import os
+import sys
+
+# Add parent directory to path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from config import config_by_name
+from backend.database import TRANSACT_WRITE_MAX_ITEMS
+from backend.stats import FleetStats, count_changes
+from backend.storage import create_storage, STORAGE_MEMORY
+from backend.validators import validate_registration_data
+
+logger = logging.getLogger(__name__)
+
+# Row outcomes in an import report
+ROW_ACCEPTED = 'accepted'
+ROW_DUPLICATE = 'duplicate'
+ROW_INVALID = 'invalid'
+ROW_FAILED = 'failed'
+
+
+def build_vehicle_record(data, registered_at=None):
+    """Build the stored vehicle item from validated registration data"""
+    return {
+        'plate_number': data['plate_number'].upper().replace(' ', ''),
+        'name': data['name'],
+        'car_type': data['car_type'],
+        'email': data['email'],
+        'phone_number': data['phone_number'],
+        'total_passes': int(data['passes']),
+        'remaining_passes': int(data['passes']),
+        'registered_at': registered_at or datetime.utcnow().isoformat(),
+        'status': 'active'
+    }
+
+
+def parse_import_file(content, file_format):
+    """Parse CSV or JSON import content into a list of row dicts
+
+    JSON may be a list of rows or an object with a "vehicles" list.
+    Raises ValueError when the content cannot be parsed.
+    """
+    if isinstance(content, bytes):
+        content = content.decode('utf-8-sig')
+
+    if file_format == 'csv':
+        reader = csv.DictReader(io.StringIO(content))
+        if not reader.fieldnames:
+            raise ValueError("CSV file has no header row")
+        return [{k.strip(): (v or '').strip() for k, v in row.items() if k} for row in reader]
+
+    if file_format == 'json':
+        try:
+            data = json.loads(content)
+        except json.JSONDecodeError as e:
+            raise ValueError(f"Invalid JSON: {e.msg}") from e
+        if isinstance(data, dict):
+            data = data.get('vehicles')
+        if not isinstance(data, list) or not all(isinstance(row, dict) for row in data):
+            raise ValueError("JSON must be a list of vehicles or {\"vehicles\": [...]}")
+        return data
+
+    raise ValueError("File format must be csv or json")
+
+
+def import_vehicles(db, rows, workers=4):
+    """Validate, de-duplicate and batch-write registration rows
+
+    Returns (report, created) where report has per-outcome counts plus one
+    entry per row, and created lists the vehicle items that were written.
+    """
+    registered_at = datetime.utcnow().isoformat()
+    results = [None] * len(rows)
+    candidates = {}  # plate_number -> (row index, vehicle record)
+
+    # Validate every row and catch duplicates inside the file itself
+    for index, row in enumerate(rows):
+        try:
+            is_valid, error_message = validate_registration_data(row)
+        except (TypeError, AttributeError):
+            is_valid, error_message = False, "Invalid field types"
+        if not is_valid:
+            results[index] = _row_result(index, str(row.get('plate_number') or ''), ROW_INVALID, error_message)
+            continue
+
+        vehicle = build_vehicle_record(row, registered_at)
+        plate_number = vehicle['plate_number']
+        if plate_number in candidates:
+            first_row = candidates[plate_number][0] + 1
+            results[index] = _row_result(
+                index, plate_number, ROW_DUPLICATE, f"Duplicate of row {first_row} in this file"
+            )
+            continue
+        candidates[plate_number] = (index, vehicle)
+
+    # Drop plates that are already registered, checked 100 keys per request
+    existing = db.get_existing_plates(candidates.keys()) if candidates else set()
+    for plate_number in existing:
+        index, _ = candidates.pop(plate_number)
+        results[index] = _row_result(index, plate_number, ROW_DUPLICATE, 'Vehicle already registered')
+
+    # Write the rest in chunks across worker threads. The writes only create
+    # plates, so one registered since the check above is reported, not overwritten
+    pending = list(candidates.values())
+    chunks = [pending[i:i + TRANSACT_WRITE_MAX_ITEMS] for i in range(0, len(pending), TRANSACT_WRITE_MAX_ITEMS)]
+    created = []
+
+    def write_chunk(chunk):
+        try:
+            return chunk, db.batch_create_vehicles([vehicle for _, vehicle in chunk]), None
+        except Exception as e:
+            logger.error(f"Bulk import chunk error: {str(e)}")
+            return chunk, set(), 'Failed to write vehicle'
+
+    with ThreadPoolExecutor(max_workers=max(1, workers)) as executor:
+        for chunk, skipped, error_message in executor.map(write_chunk, chunks):
+            for index, vehicle in chunk:
+                if error_message:
+                    results[index] = _row_result(index, vehicle['plate_number'], ROW_FAILED, error_message)
+                elif vehicle['plate_number'] in skipped:
+                    results[index] = _row_result(
+                        index, vehicle['plate_number'], ROW_DUPLICATE, 'Vehicle already registered'
+                    )
+                else:
+                    results[index] = _row_result(index, vehicle['plate_number'], ROW_ACCEPTED)
+                    created.append(vehicle)
+
+    report = {outcome: 0 for outcome in (ROW_ACCEPTED, ROW_DUPLICATE, ROW_INVALID, ROW_FAILED)}
+    for result in results:
+        report[result['status']] += 1
+    report['total'] = len(rows)
+    report['rows'] = results
+    return report, created
+
+
+def _row_result(index, plate_number, status, error=None):
+    """Build one row entry of an import report (rows are numbered from 1)"""
+    result = {'row': index + 1, 'plate_number': plate_number, 'status': status}
+    if error:
+        result['error'] = error
+    return result
+
+
+def main(argv=None):
+    """Import a CSV or JSON file of vehicles from the command line"""
+    parser = argparse.ArgumentParser(description='Bulk register vehicles from a CSV or JSON file')
+    parser.add_argument('file', help='Path to a .csv or .json file')
+    parser.add_argument('--format', choices=['csv', 'json'], help='Override format detected from the extension')
+    parser.add_argument('--workers', type=int, default=None, help='Parallel batch-write workers')
+    parser.add_argument('--report', help='Write the full per-row report to this JSON file')
+    args = parser.parse_args(argv)
+
+    config = config_by_name[os.getenv('FLASK_ENV', 'development')]
+    file_format = args.format or os.path.splitext(args.file)[1].lstrip('.').lower()
+    with open(args.file, 'rb') as f:
+        rows = parse_import_file(f.read(), file_format)
+
+    settings = {key: getattr(config, key) for key in dir(config) if key.isupper()}
+    if settings['STORAGE_BACKEND'] == STORAGE_MEMORY:
+        parser.error('STORAGE_BACKEND=memory keeps nothing once the import exits; use dynamodb or sqlite')
+    db = create_storage(settings)
+    report, created = import_vehicles(db, rows, workers=args.workers or config.BULK_IMPORT_WORKERS)
+    if created:
+        # Count the new vehicles and move the version the running servers' ETags use
+        FleetStats(db).add(count_changes((None, vehicle) for vehicle in created))
+
+    if args.report:
+        with open(args.report, 'w') as f:
+            json.dump(report, f, indent=2)
+
+    print(f"Rows: {report['total']}  accepted: {report[ROW_ACCEPTED]}  duplicate: {report[ROW_DUPLICATE]}  "
+          f"invalid: {report[ROW_INVALID]}  failed: {report[ROW_FAILED]}")
+    for result in report['rows']:
+        if result['status'] != ROW_ACCEPTED:
+            print(f"  row {result['row']}: {result['status']} - {result.get('error')}")
+    return 0 if report[ROW_FAILED] == 0 else 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
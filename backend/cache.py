@@ -0,0 +1,220 @@
+"""
+Read-through vehicle cache for Vehicle Pass Registration System
+"""
+from collections import OrderedDict
+import threading
+import time
+import logging
+
+from backend.database import ACCESS_GRANTED, ACCESS_NO_PASSES
+
+logger = logging.getLogger(__name__)
+
+
+class _Flight:
+    """A DynamoDB read in progress that other callers can wait on"""
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+        self.invalidated = False
+
+
+class VehicleCache:
+    """Bounded TTL + LRU cache that wraps a DynamoDBManager
+
+    get_vehicle is served from memory while an entry is fresh. Concurrent misses
+    on the same plate share one DynamoDB read. Every write goes through to the
+    database and then drops or refreshes the cached entry. Any other attribute
+    is forwarded to the wrapped manager unchanged.
+    """
+
+    def __init__(self, db, max_size=1000, ttl_seconds=30):
+        """Initialize cache around a database manager"""
+        self.db = db
+        self.max_size = max_size
+        self.ttl_seconds = ttl_seconds
+
+        self._entries = OrderedDict()  # plate_number -> (expires_at, vehicle)
+        self._inflight = {}            # plate_number -> _Flight
+        self._lock = threading.Lock()
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.coalesced = 0
+
+    def __getattr__(self, name):
+        """Forward everything the cache does not handle to the database"""
+        return getattr(self.db, name)
+
+    def get_vehicle(self, plate_number):
+        """Get vehicle by plate number, reading through to DynamoDB on a miss"""
+        with self._lock:
+            entry = self._entries.get(plate_number)
+            if entry is not None:
+                expires_at, vehicle = entry
+                if expires_at > time.monotonic():
+                    self._entries.move_to_end(plate_number)
+                    self.hits += 1
+                    return dict(vehicle)
+                del self._entries[plate_number]
+                self.expirations += 1
+
+            self.misses += 1
+            flight = self._inflight.get(plate_number)
+            leader = flight is None
+            if leader:
+                flight = _Flight()
+                self._inflight[plate_number] = flight
+            else:
+                self.coalesced += 1
+
+        if not leader:
+            # Another request is already reading this plate
+            flight.done.wait()
+            # A failed read is not a missing vehicle: fail the same way the leader did
+            if flight.error is not None:
+                raise flight.error
+            return dict(flight.result) if flight.result else None
+
+        try:
+            flight.result = self.db.get_vehicle(plate_number)
+        except BaseException as e:
+            flight.error = e
+            raise
+        finally:
+            with self._lock:
+                if self._inflight.get(plate_number) is flight:
+                    del self._inflight[plate_number]
+                # A write that landed during the read makes the result unsafe to keep
+                if flight.result and not flight.invalidated:
+                    self._store(plate_number, flight.result)
+            flight.done.set()
+
+        return dict(flight.result) if flight.result else None
+
+    def create_vehicle(self, vehicle_data):
+        """Create a new vehicle registration and cache the written item"""
+        success = self.db.create_vehicle(vehicle_data)
+        self.invalidate(vehicle_data['plate_number'])
+        if success:
+            self._put(vehicle_data['plate_number'], dict(vehicle_data))
+        return success
+
+    def batch_create_vehicles(self, vehicles):
+        """Write many new vehicles and drop any cached entries for them"""
+        try:
+            return self.db.batch_create_vehicles(vehicles)
+        finally:
+            for vehicle in vehicles:
+                self.invalidate(vehicle['plate_number'])
+
+    def access_vehicle(self, plate_number):
+        """Authorize an entry and refresh the cache from the returned item"""
+        outcome, vehicle = self.db.access_vehicle(plate_number)
+        self.invalidate(plate_number)
+        if outcome in (ACCESS_GRANTED, ACCESS_NO_PASSES) and vehicle:
+            self._put(plate_number, vehicle)
+        return outcome, vehicle
+
+    def access_vehicle_once(self, plate_number, idempotency_key):
+        """Idempotent access, using a fresh cached entry as a hint for the expected balance
+
+        The storage layer only uses the hint to condition the decrement and
+        never denies an entry on it, so a stale cached balance cannot turn
+        away a vehicle whose passes were topped up by another process.
+        """
+        outcome, vehicle, replayed = self.db.access_vehicle_once(
+            plate_number, idempotency_key, vehicle=self._peek(plate_number)
+        )
+        self.invalidate(plate_number)
+        if outcome == ACCESS_GRANTED and not replayed:
+            self._put(plate_number, vehicle)
+        return outcome, vehicle, replayed
+
+    def deduct_pass(self, plate_number):
+        """Deduct one pass from vehicle"""
+        try:
+            return self.db.deduct_pass(plate_number)
+        finally:
+            self.invalidate(plate_number)
+
+    def add_passes(self, plate_number, passes_to_add):
+        """Add passes to vehicle"""
+        try:
+            return self.db.add_passes(plate_number, passes_to_add)
+        finally:
+            self.invalidate(plate_number)
+
+    def update_vehicle_status(self, plate_number, status):
+        """Update vehicle status (active, suspended, etc.)"""
+        try:
+            return self.db.update_vehicle_status(plate_number, status)
+        finally:
+            self.invalidate(plate_number)
+
+    def delete_vehicle(self, plate_number):
+        """Delete a vehicle registration"""
+        try:
+            return self.db.delete_vehicle(plate_number)
+        finally:
+            self.invalidate(plate_number)
+
+    def invalidate(self, plate_number):
+        """Drop a cached entry and any read of it that is still in flight"""
+        with self._lock:
+            self._entries.pop(plate_number, None)
+            flight = self._inflight.pop(plate_number, None)
+            if flight is not None:
+                flight.invalidated = True
+
+    def clear(self):
+        """Drop all cached entries"""
+        with self._lock:
+            self._entries.clear()
+            for flight in self._inflight.values():
+                flight.invalidated = True
+            self._inflight.clear()
+
+    def stats(self):
+        """Return cache counters for sizing and monitoring"""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'size': len(self._entries),
+                'max_size': self.max_size,
+                'ttl_seconds': self.ttl_seconds,
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'expirations': self.expirations,
+                'coalesced': self.coalesced,
+                'inflight': len(self._inflight),
+                'hit_ratio': round(self.hits / lookups, 4) if lookups else 0.0
+            }
+
+    def _peek(self, plate_number):
+        """Return a copy of a fresh cached entry without touching the counters"""
+        with self._lock:
+            entry = self._entries.get(plate_number)
+            if entry is None or entry[0] <= time.monotonic():
+                return None
+            return dict(entry[1])
+
+    def _put(self, plate_number, vehicle):
+        """Store an entry under the lock"""
+        with self._lock:
+            self._store(plate_number, vehicle)
+
+    def _store(self, plate_number, vehicle):
+        """Store an entry and evict least recently used ones; caller holds the lock"""
+        if self.max_size <= 0:
+            return
+        self._entries[plate_number] = (time.monotonic() + self.ttl_seconds, vehicle)
+        self._entries.move_to_end(plate_number)
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+            self.evictions += 1
@@ -0,0 +1,73 @@
+"""
+Response compression for Vehicle Pass Registration System
+
+Large JSON and CSV bodies (the vehicle list, stats, exports of a few pages)
+are compressed with brotli or gzip, whichever the client prefers and we
+support. Small responses, such as the gate verify/access answers, are sent
+as-is because compressing them costs more than it saves.
+"""
+import gzip
+import logging
+
+try:
+    import brotli
+    BROTLI_AVAILABLE = True
+except ImportError:
+    BROTLI_AVAILABLE = False
+    logging.warning("brotli not available, responses will only be gzip-compressed")
+
+COMPRESSIBLE_MIMETYPES = {'application/json', 'application/x-ndjson', 'text/csv', 'text/plain', 'text/html'}
+
+
+def choose_encoding(accept_encodings):
+    """Pick the best supported encoding from a parsed Accept-Encoding header"""
+    if BROTLI_AVAILABLE and accept_encodings['br'] > 0:
+        if accept_encodings['br'] >= accept_encodings['gzip']:
+            return 'br'
+    if accept_encodings['gzip'] > 0:
+        return 'gzip'
+    return None
+
+
+def compress(data, encoding, gzip_level=6, brotli_quality=4):
+    """Compress bytes with the given content coding"""
+    if encoding == 'br':
+        return brotli.compress(data, quality=brotli_quality)
+    return gzip.compress(data, compresslevel=gzip_level, mtime=0)
+
+
+def init_app(app):
+    """Compress eligible responses above COMPRESSION_MIN_BYTES"""
+    from flask import request
+
+    min_bytes = app.config['COMPRESSION_MIN_BYTES']
+    gzip_level = app.config['COMPRESSION_GZIP_LEVEL']
+    brotli_quality = app.config['COMPRESSION_BROTLI_QUALITY']
+
+    @app.after_request
+    def _compress_response(response):
+        if min_bytes <= 0:
+            return response
+        if (response.status_code != 200 or response.direct_passthrough or response.is_streamed
+                or 'Content-Encoding' in response.headers
+                or response.mimetype not in COMPRESSIBLE_MIMETYPES):
+            return response
+
+        response.vary.add('Accept-Encoding')
+        if response.content_length is not None and response.content_length < min_bytes:
+            return response
+        encoding = choose_encoding(request.accept_encodings)
+        if encoding is None:
+            return response
+
+        data = response.get_data()
+        if len(data) < min_bytes:
+            return response
+        response.set_data(compress(data, encoding, gzip_level, brotli_quality))
+        response.headers['Content-Encoding'] = encoding
+        # The compressed body is a different representation of the same
+        # content, so its ETag can only be weak (as nginx does)
+        etag, weak = response.get_etag()
+        if etag and not weak:
+            response.set_etag(etag, weak=True)
+        return response
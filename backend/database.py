@@ -3,42 +3,287 @@ DynamoDB Manager for Vehicle Pass Registration System
 """
 import boto3
 from boto3.dynamodb.conditions import Key, Attr
-from botocore.exceptions import ClientError
+from boto3.dynamodb.types import TypeDeserializer, TypeSerializer
+from botocore.config import Config as BotoConfig
+from botocore.exceptions import BotoCoreError, ClientError
+from concurrent.futures import ThreadPoolExecutor
+from decimal import Decimal
+import base64
+import binascii
+import functools
+import json
 import logging
+import time
+
+from backend.metrics import DB_RETRIES, DB_THROTTLES, timed_operation
+from backend.storage import VehicleStorage
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# Outcomes of an atomic access check (see DynamoDBManager.access_vehicle)
+ACCESS_GRANTED = 'granted'
+ACCESS_NOT_REGISTERED = 'not_registered'
+ACCESS_NO_PASSES = 'no_passes'
+ACCESS_ERROR = 'error'
+# The idempotency key was already used for a different plate
+ACCESS_KEY_REUSED = 'key_reused'
+
+# Conditional transaction attempts before giving up on a contended vehicle
+IDEMPOTENT_WRITE_ATTEMPTS = 3
+
+# Global secondary index on the access events table for per-day queries
+ACCESS_EVENTS_DAY_INDEX = 'day-index'
+
+# Global secondary indexes on the vehicles table: vehicles by status in
+# remaining-pass order, and vehicles by email
+VEHICLE_STATUS_INDEX = 'status-passes-index'
+VEHICLE_EMAIL_INDEX = 'email-index'
+
+VEHICLE_INDEX_ATTRIBUTES = [
+    {'AttributeName': 'status', 'AttributeType': 'S'},
+    {'AttributeName': 'remaining_passes', 'AttributeType': 'N'},
+    {'AttributeName': 'email', 'AttributeType': 'S'}
+]
+
+VEHICLE_INDEXES = [
+    {
+        'IndexName': VEHICLE_STATUS_INDEX,
+        'KeySchema': [
+            {'AttributeName': 'status', 'KeyType': 'HASH'},
+            {'AttributeName': 'remaining_passes', 'KeyType': 'RANGE'}
+        ],
+        'Projection': {'ProjectionType': 'ALL'}
+    },
+    {
+        'IndexName': VEHICLE_EMAIL_INDEX,
+        'KeySchema': [{'AttributeName': 'email', 'KeyType': 'HASH'}],
+        'Projection': {'ProjectionType': 'ALL'}
+    }
+]
+
+# Vehicle fields kept with an idempotency key to answer replays
+IDEMPOTENT_RESULT_FIELDS = ('plate_number', 'name', 'car_type', 'remaining_passes')
+
+# Upper bound on scan calls spent filling one page of a filtered listing
+MAX_SCAN_CALLS_PER_PAGE = 10
+
+# DynamoDB per-request limits for batch operations
+BATCH_GET_MAX_KEYS = 100
+TRANSACT_WRITE_MAX_ITEMS = 100
+
+# Error codes DynamoDB answers with when it throttles a request
+THROTTLING_ERROR_CODES = {'ProvisionedThroughputExceededException', 'ThrottlingException', 'RequestLimitExceeded'}
+
+# Labels of the two boto3 clients in retry and throttle metrics
+CLIENT_ADMIN = 'admin'
+CLIENT_GATE = 'gate'
+
+# Key read by warm_up; it never exists, so the read is as cheap as possible
+WARM_UP_KEY = '__warm_up__'
+
+_deserializer = TypeDeserializer()
+_serializer = TypeSerializer()
+
+
+def encode_cursor(last_evaluated_key):
+    """Turn a DynamoDB LastEvaluatedKey into an opaque URL-safe token"""
+    if not last_evaluated_key:
+        return None
+    wire = {k: _serializer.serialize(v) for k, v in last_evaluated_key.items()}
+    raw = json.dumps(wire, separators=(',', ':'), sort_keys=True).encode('utf-8')
+    return base64.urlsafe_b64encode(raw).decode('ascii').rstrip('=')
+
+
+def decode_cursor(token):
+    """Turn a token from encode_cursor back into an ExclusiveStartKey"""
+    try:
+        padded = token + '=' * (-len(token) % 4)
+        wire = json.loads(base64.urlsafe_b64decode(padded.encode('ascii')))
+        if not isinstance(wire, dict) or not wire:
+            raise ValueError("Invalid cursor")
+        return {k: _deserializer.deserialize(v) for k, v in wire.items()}
+    except (binascii.Error, UnicodeError, TypeError, AttributeError, KeyError, ValueError) as e:
+        raise ValueError("Invalid cursor") from e
+
+
+def decode_start_key(token, key_types, **expected):
+    """decode_cursor for one table or index: exactly key_types' attributes, of those types
+
+    expected pins attributes to the values the current query is for, so a
+    cursor from another partition is refused too. Raises ValueError, which
+    the routes answer with 400, instead of letting DynamoDB reject the key.
+    """
+    start_key = decode_cursor(token)
+    if set(start_key) != set(key_types):
+        raise ValueError("Invalid cursor")
+    for name, expected_type in key_types.items():
+        if not isinstance(start_key[name], expected_type) or isinstance(start_key[name], bool):
+            raise ValueError("Invalid cursor")
+    if any(start_key[name] != value for name, value in expected.items()):
+        raise ValueError("Invalid cursor")
+    return start_key
+
 
-class DynamoDBManager:
+def build_client_config(max_pool_connections, retry_mode, max_attempts, connect_timeout, read_timeout):
+    """botocore client settings for one DynamoDB client"""
+    return BotoConfig(
+        max_pool_connections=max_pool_connections,
+        connect_timeout=connect_timeout,
+        read_timeout=read_timeout,
+        retries={'mode': retry_mode, 'max_attempts': max_attempts}
+    )
+
+
+def _count_throttle(client_name, response=None, operation=None, **kwargs):
+    """needs-retry hook: count attempts DynamoDB rejected as throttled"""
+    if response is not None and response[1].get('Error', {}).get('Code') in THROTTLING_ERROR_CODES:
+        DB_THROTTLES.labels(operation.name, client_name).inc()
+
+
+def _count_retries(client_name, parsed=None, model=None, **kwargs):
+    """after-call hook: count the retries a call needed before its final answer"""
+    retries = (parsed or {}).get('ResponseMetadata', {}).get('RetryAttempts', 0)
+    if retries:
+        DB_RETRIES.labels(model.name, client_name).inc(retries)
+
+
+def build_vehicle_filter(filters):
+    """Build a scan FilterExpression from status, car_type and pass range filters"""
+    if not filters:
+        return None
+
+    conditions = []
+    if filters.get('status'):
+        conditions.append(Attr('status').eq(filters['status']))
+    if filters.get('car_type'):
+        conditions.append(Attr('car_type').eq(filters['car_type']))
+    if filters.get('min_passes') is not None:
+        conditions.append(Attr('remaining_passes').gte(filters['min_passes']))
+    if filters.get('max_passes') is not None:
+        conditions.append(Attr('remaining_passes').lte(filters['max_passes']))
+
+    if not conditions:
+        return None
+    expression = conditions[0]
+    for condition in conditions[1:]:
+        expression = expression & condition
+    return expression
+
+
+class DynamoDBManager(VehicleStorage):
     """Manages DynamoDB operations for vehicle registration"""
 
-    def __init__(self, region, table_name, aws_access_key_id=None, aws_secret_access_key=None):
-        """Initialize DynamoDB connection"""
+    def __init__(self, region, table_name, aws_access_key_id=None, aws_secret_access_key=None,
+                 idempotency_table_name=None, idempotency_ttl_seconds=86400,
+                 access_events_table_name=None, rollups_table_name=None, endpoint_url=None,
+                 max_pool_connections=10, retry_mode='adaptive', max_attempts=5,
+                 connect_timeout=2.0, read_timeout=10.0,
+                 gate_max_attempts=2, gate_connect_timeout=0.25, gate_read_timeout=0.5):
+        """Initialize DynamoDB connections
+
+        Two clients share the credentials: the admin client (dashboard,
+        imports, table setup) and the gate client (verify, deduct, access).
+        The gate client has short timeouts and few attempts, so a stalled
+        call fails while the gate's own retry can still help. Each client
+        keeps up to max_pool_connections connections; match it to the
+        number of threads that call DynamoDB at once.
+        """
         self.table_name = table_name
         self.region = region
+        self.idempotency_table_name = idempotency_table_name
+        self.idempotency_ttl_seconds = idempotency_ttl_seconds
+        self.access_events_table_name = access_events_table_name
+        self.rollups_table_name = rollups_table_name
 
-        # Initialize boto3 client
+        # Without explicit keys, use IAM role or environment credentials
+        credentials = {}
         if aws_access_key_id and aws_secret_access_key:
-            self.dynamodb = boto3.resource(
-                'dynamodb',
-                region_name=region,
-                aws_access_key_id=aws_access_key_id,
-                aws_secret_access_key=aws_secret_access_key
-            )
-        else:
-            # Use IAM role or environment credentials
-            self.dynamodb = boto3.resource('dynamodb', region_name=region)
+            credentials = {'aws_access_key_id': aws_access_key_id, 'aws_secret_access_key': aws_secret_access_key}
+        # The session caches credentials and the loaded service model, so
+        # clients built from it after a fork start without that work
+        self.session = boto3.session.Session(region_name=region, **credentials)
+        self.endpoint_url = endpoint_url  # DynamoDB Local when set
+        self.admin_config = build_client_config(
+            max_pool_connections, retry_mode, max_attempts, connect_timeout, read_timeout
+        )
+        self.gate_config = build_client_config(
+            max_pool_connections, retry_mode, gate_max_attempts, gate_connect_timeout, gate_read_timeout
+        )
+        self.reconnect()
+
+    def reconnect(self):
+        """Build the admin and gate clients and their tables from the session
+
+        Called on startup and again in every worker after a fork, so no
+        process uses a connection pool that another process has touched.
+        """
+        self.dynamodb = self.session.resource('dynamodb', endpoint_url=self.endpoint_url, config=self.admin_config)
+        self.gate_dynamodb = self.session.resource('dynamodb', endpoint_url=self.endpoint_url, config=self.gate_config)
+        for name, resource in ((CLIENT_ADMIN, self.dynamodb), (CLIENT_GATE, self.gate_dynamodb)):
+            events = resource.meta.client.meta.events
+            events.register('needs-retry.dynamodb', functools.partial(_count_throttle, name))
+            events.register('after-call.dynamodb', functools.partial(_count_retries, name))
+
+        self.table = self.dynamodb.Table(self.table_name)
+        self.gate_table = self.gate_dynamodb.Table(self.table_name)
+        self.idempotency_table = None
+        self.gate_idempotency_table = None
+        if self.idempotency_table_name:
+            self.idempotency_table = self.dynamodb.Table(self.idempotency_table_name)
+            self.gate_idempotency_table = self.gate_dynamodb.Table(self.idempotency_table_name)
+        self.access_events_table = (
+            self.dynamodb.Table(self.access_events_table_name) if self.access_events_table_name else None
+        )
+        self.rollups_table = self.dynamodb.Table(self.rollups_table_name) if self.rollups_table_name else None
+
+    def boto_clients(self):
+        """The low-level clients behind the admin and gate resources"""
+        return [self.dynamodb.meta.client, self.gate_dynamodb.meta.client]
+
+    def warm_up(self, connections=4):
+        """Resolve credentials and open connections before traffic arrives
+
+        Makes connections concurrent reads of a key that never exists on
+        each client, so each pool starts with that many TLS sessions.
+        Failures are logged, not raised. Returns the number of reads that
+        succeeded.
+        """
+        calls = [client for client in self.boto_clients() for _ in range(connections)]
+
+        def read(client):
+            try:
+                # Resource clients serialize plain values, as the Table calls do
+                client.get_item(TableName=self.table_name, Key={'plate_number': WARM_UP_KEY})
+                return True
+            except (BotoCoreError, ClientError) as e:
+                logger.warning(f"DynamoDB warm-up call failed: {str(e)}")
+                return False
 
-        self.table = self.dynamodb.Table(table_name)
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=len(calls) or 1) as pool:
+            succeeded = sum(pool.map(read, calls))
+        logger.info(f"Warmed {succeeded}/{len(calls)} DynamoDB connections in {time.perf_counter() - started:.2f}s")
+        return succeeded
 
+    def create_tables(self):
+        """Create the vehicle, idempotency, access event and rollup tables"""
+        results = [
+            self.create_table(),
+            self.create_idempotency_table(),
+            self.create_access_events_table(),
+            self.create_rollups_table()
+        ]
+        return all(results)
+
+    @timed_operation
     def create_table(self):
-        """Create DynamoDB table if it doesn't exist"""
+        """Create DynamoDB table if it doesn't exist, and add any missing indexes"""
         try:
             # Check if table exists
             self.table.load()
             logger.info(f"Table {self.table_name} already exists")
-            return True
+            return self.create_missing_indexes()
         except ClientError as e:
             if e.response['Error']['Code'] == 'ResourceNotFoundException':
                 # Create table
@@ -56,7 +301,8 @@ class DynamoDBManager:
                                 'AttributeName': 'plate_number',
                                 'AttributeType': 'S'
                             }
-                        ],
+                        ] + VEHICLE_INDEX_ATTRIBUTES,
+                        GlobalSecondaryIndexes=VEHICLE_INDEXES,
                         BillingMode='PAY_PER_REQUEST'  # On-demand pricing
                     )
 
@@ -73,6 +319,154 @@ class DynamoDBManager:
                 logger.error(f"Error checking table: {str(e)}")
                 return False
 
+    def create_missing_indexes(self):
+        """Add the vehicle indexes a table created before them lacks
+
+        DynamoDB builds one new index per UpdateTable call and backfills it
+        from the existing items; queries on it fail until it is ACTIVE.
+        If DynamoDB refuses a second index while the first is still
+        building, run this again once that one is done.
+        """
+        existing = {index['IndexName'] for index in self.table.global_secondary_indexes or []}
+        for index in VEHICLE_INDEXES:
+            if index['IndexName'] in existing:
+                continue
+            try:
+                self.dynamodb.meta.client.update_table(
+                    TableName=self.table_name,
+                    AttributeDefinitions=VEHICLE_INDEX_ATTRIBUTES,
+                    GlobalSecondaryIndexUpdates=[{'Create': index}]
+                )
+                self.dynamodb.meta.client.get_waiter('table_exists').wait(TableName=self.table_name)
+                logger.info(f"Index {index['IndexName']} on {self.table_name} is being built")
+            except ClientError as e:
+                logger.error(f"Error adding index {index['IndexName']}: {str(e)}")
+                return False
+        return True
+
+    @timed_operation
+    def create_idempotency_table(self):
+        """Create the idempotency key table (with TTL expiry) if it doesn't exist"""
+        if self.idempotency_table is None:
+            return True
+        try:
+            self.idempotency_table.load()
+            logger.info(f"Table {self.idempotency_table_name} already exists")
+            return True
+        except ClientError as e:
+            if e.response['Error']['Code'] != 'ResourceNotFoundException':
+                logger.error(f"Error checking table: {str(e)}")
+                return False
+
+        try:
+            table = self.dynamodb.create_table(
+                TableName=self.idempotency_table_name,
+                KeySchema=[{'AttributeName': 'idempotency_key', 'KeyType': 'HASH'}],
+                AttributeDefinitions=[{'AttributeName': 'idempotency_key', 'AttributeType': 'S'}],
+                BillingMode='PAY_PER_REQUEST'
+            )
+            table.meta.client.get_waiter('table_exists').wait(TableName=self.idempotency_table_name)
+            # DynamoDB deletes keys in the background once expires_at has passed
+            table.meta.client.update_time_to_live(
+                TableName=self.idempotency_table_name,
+                TimeToLiveSpecification={'Enabled': True, 'AttributeName': 'expires_at'}
+            )
+            logger.info(f"Table {self.idempotency_table_name} created successfully")
+            return True
+        except Exception as create_error:
+            logger.error(f"Error creating table: {str(create_error)}")
+            return False
+
+    @timed_operation
+    def create_access_events_table(self):
+        """Create the access events table if it doesn't exist
+
+        Events are keyed by plate_number + event_id (an ISO timestamp with a
+        random suffix), so a vehicle's history is one Query in time order.
+        The day-index GSI answers the same for one calendar day.
+        """
+        if self.access_events_table is None:
+            return True
+        try:
+            self.access_events_table.load()
+            logger.info(f"Table {self.access_events_table_name} already exists")
+            return True
+        except ClientError as e:
+            if e.response['Error']['Code'] != 'ResourceNotFoundException':
+                logger.error(f"Error checking table: {str(e)}")
+                return False
+
+        try:
+            table = self.dynamodb.create_table(
+                TableName=self.access_events_table_name,
+                KeySchema=[
+                    {'AttributeName': 'plate_number', 'KeyType': 'HASH'},
+                    {'AttributeName': 'event_id', 'KeyType': 'RANGE'}
+                ],
+                AttributeDefinitions=[
+                    {'AttributeName': 'plate_number', 'AttributeType': 'S'},
+                    {'AttributeName': 'event_id', 'AttributeType': 'S'},
+                    {'AttributeName': 'day', 'AttributeType': 'S'}
+                ],
+                GlobalSecondaryIndexes=[
+                    {
+                        'IndexName': ACCESS_EVENTS_DAY_INDEX,
+                        'KeySchema': [
+                            {'AttributeName': 'day', 'KeyType': 'HASH'},
+                            {'AttributeName': 'event_id', 'KeyType': 'RANGE'}
+                        ],
+                        'Projection': {'ProjectionType': 'ALL'}
+                    }
+                ],
+                BillingMode='PAY_PER_REQUEST'
+            )
+            table.meta.client.get_waiter('table_exists').wait(TableName=self.access_events_table_name)
+            # Events with an expires_at are deleted once the retention period has passed
+            table.meta.client.update_time_to_live(
+                TableName=self.access_events_table_name,
+                TimeToLiveSpecification={'Enabled': True, 'AttributeName': 'expires_at'}
+            )
+            logger.info(f"Table {self.access_events_table_name} created successfully")
+            return True
+        except Exception as create_error:
+            logger.error(f"Error creating table: {str(create_error)}")
+            return False
+
+    @timed_operation
+    def create_rollups_table(self):
+        """Create the rollups table (series + bucket counters) if it doesn't exist"""
+        if self.rollups_table is None:
+            return True
+        try:
+            self.rollups_table.load()
+            logger.info(f"Table {self.rollups_table_name} already exists")
+            return True
+        except ClientError as e:
+            if e.response['Error']['Code'] != 'ResourceNotFoundException':
+                logger.error(f"Error checking table: {str(e)}")
+                return False
+
+        try:
+            table = self.dynamodb.create_table(
+                TableName=self.rollups_table_name,
+                KeySchema=[
+                    {'AttributeName': 'series', 'KeyType': 'HASH'},
+                    {'AttributeName': 'bucket', 'KeyType': 'RANGE'}
+                ],
+                AttributeDefinitions=[
+                    {'AttributeName': 'series', 'AttributeType': 'S'},
+                    {'AttributeName': 'bucket', 'AttributeType': 'S'}
+                ],
+                BillingMode='PAY_PER_REQUEST'
+            )
+            table.meta.client.get_waiter('table_exists').wait(TableName=self.rollups_table_name)
+            logger.info(f"Table {self.rollups_table_name} created successfully")
+            return True
+        except Exception as create_error:
+            logger.error(f"Error creating table: {str(create_error)}")
+            return False
+
+    @timed_operation
     def create_vehicle(self, vehicle_data):
         """Create a new vehicle registration"""
         try:
@@ -89,10 +483,11 @@ class DynamoDBManager:
                 logger.error(f"Error creating vehicle: {str(e)}")
             return False
 
+    @timed_operation
     def get_vehicle(self, plate_number):
         """Get vehicle by plate number"""
         try:
-            response = self.table.get_item(
+            response = self.gate_table.get_item(
                 Key={'plate_number': plate_number}
             )
             return response.get('Item', None)
@@ -100,10 +495,11 @@ class DynamoDBManager:
             logger.error(f"Error getting vehicle: {str(e)}")
             return None
 
+    @timed_operation
     def deduct_pass(self, plate_number):
         """Deduct one pass from vehicle"""
         try:
-            response = self.table.update_item(
+            response = self.gate_table.update_item(
                 Key={'plate_number': plate_number},
                 UpdateExpression='SET remaining_passes = remaining_passes - :decrement',
                 ConditionExpression='remaining_passes > :zero',
@@ -122,6 +518,147 @@ class DynamoDBManager:
                 logger.error(f"Error deducting pass: {str(e)}")
             return False
 
+    @timed_operation
+    def access_vehicle(self, plate_number):
+        """Authorize an entry and deduct one pass in a single conditional write
+
+        Returns a tuple of (outcome, vehicle). On success the vehicle holds the
+        updated item; when the vehicle has no passes left it holds the item as
+        it was, so callers never need a separate read.
+        """
+        try:
+            response = self.gate_table.update_item(
+                Key={'plate_number': plate_number},
+                UpdateExpression='SET remaining_passes = remaining_passes - :decrement',
+                ConditionExpression='attribute_exists(plate_number) AND remaining_passes > :zero',
+                ExpressionAttributeValues={
+                    ':decrement': 1,
+                    ':zero': 0
+                },
+                ReturnValues='ALL_NEW',
+                ReturnValuesOnConditionCheckFailure='ALL_OLD'
+            )
+            logger.info(f"Access granted and pass deducted for vehicle {plate_number}")
+            return ACCESS_GRANTED, response['Attributes']
+        except ClientError as e:
+            if e.response['Error']['Code'] == 'ConditionalCheckFailedException':
+                # The old item comes back in wire format; no item means no registration
+                old_item = e.response.get('Item')
+                if not old_item:
+                    return ACCESS_NOT_REGISTERED, None
+                vehicle = {k: _deserializer.deserialize(v) for k, v in old_item.items()}
+                logger.warning(f"No remaining passes for vehicle {plate_number}")
+                return ACCESS_NO_PASSES, vehicle
+            logger.error(f"Error processing access: {str(e)}")
+            return ACCESS_ERROR, None
+
+    @timed_operation
+    def access_vehicle_once(self, plate_number, idempotency_key, vehicle=None):
+        """Authorize an entry and deduct one pass at most once per idempotency key
+
+        The key is written to the idempotency table in the same transaction as
+        the decrement, together with the result, so a retried request gets the
+        original answer and the balance is never touched twice. The decrement
+        is conditioned on the balance it was computed from; pass the vehicle
+        when it is already known (e.g. cached) to skip the initial read. It is
+        only a hint for that condition: a stale balance costs a retry, using
+        the item the failed condition returns, and a hint with no passes left
+        is re-read rather than trusted to deny the entry.
+
+        Returns a tuple of (outcome, vehicle, replayed).
+        """
+        try:
+            return self._access_vehicle_once(plate_number, idempotency_key, vehicle)
+        except ClientError as e:
+            logger.error(f"Error processing access: {str(e)}")
+            return ACCESS_ERROR, None, False
+
+    def _access_vehicle_once(self, plate_number, idempotency_key, vehicle):
+        """Conditional transaction loop behind access_vehicle_once"""
+        if vehicle is not None and vehicle.get('remaining_passes', 0) <= 0:
+            vehicle = None
+        for _ in range(IDEMPOTENT_WRITE_ATTEMPTS):
+            if vehicle is None:
+                vehicle = self.gate_table.get_item(Key={'plate_number': plate_number}, ConsistentRead=True).get('Item')
+            if not vehicle or vehicle.get('remaining_passes', 0) <= 0:
+                # A replay of the entry that used the last pass must still succeed
+                replay = self._replay_idempotency_key(plate_number, idempotency_key)
+                if replay is not None:
+                    return replay
+                if not vehicle:
+                    return ACCESS_NOT_REGISTERED, None, False
+                logger.warning(f"No remaining passes for vehicle {plate_number}")
+                return ACCESS_NO_PASSES, vehicle, False
+
+            remaining = vehicle['remaining_passes'] - 1
+            updated = dict(vehicle, remaining_passes=remaining)
+            now = int(time.time())
+            try:
+                self.gate_dynamodb.meta.client.transact_write_items(TransactItems=[
+                    {
+                        'Put': {
+                            'TableName': self.idempotency_table_name,
+                            'Item': {
+                                'idempotency_key': idempotency_key,
+                                'plate_number': plate_number,
+                                'outcome': ACCESS_GRANTED,
+                                'vehicle': {k: updated.get(k) for k in IDEMPOTENT_RESULT_FIELDS},
+                                'created_at': now,
+                                'expires_at': now + self.idempotency_ttl_seconds
+                            },
+                            'ConditionExpression': 'attribute_not_exists(idempotency_key)'
+                        }
+                    },
+                    {
+                        'Update': {
+                            'TableName': self.table_name,
+                            'Key': {'plate_number': plate_number},
+                            'UpdateExpression': 'SET remaining_passes = :remaining',
+                            'ConditionExpression': 'remaining_passes = :expected',
+                            'ExpressionAttributeValues': {
+                                ':remaining': remaining,
+                                ':expected': vehicle['remaining_passes']
+                            },
+                            'ReturnValuesOnConditionCheckFailure': 'ALL_OLD'
+                        }
+                    }
+                ])
+                logger.info(f"Access granted and pass deducted for vehicle {plate_number}")
+                return ACCESS_GRANTED, updated, False
+            except ClientError as e:
+                if e.response['Error']['Code'] != 'TransactionCanceledException':
+                    raise
+                key_reason, vehicle_reason = e.response.get('CancellationReasons', [{}, {}])
+                if key_reason.get('Code') == 'ConditionalCheckFailed':
+                    replay = self._replay_idempotency_key(plate_number, idempotency_key)
+                    return replay or (ACCESS_ERROR, None, False)
+                if vehicle_reason.get('Code') == 'ConditionalCheckFailed':
+                    # The balance moved (or the vehicle is gone): retry from the current item
+                    old_item = vehicle_reason.get('Item') or {}
+                    vehicle = {k: _deserializer.deserialize(v) for k, v in old_item.items()}
+                else:
+                    # Conflicting transaction in flight; re-read and retry
+                    vehicle = None
+
+        logger.error(f"Gave up processing access for vehicle {plate_number} after {IDEMPOTENT_WRITE_ATTEMPTS} attempts")
+        return ACCESS_ERROR, None, False
+
+    def _replay_idempotency_key(self, plate_number, idempotency_key):
+        """Return the recorded (outcome, vehicle, True) for a used key, or None"""
+        response = self.gate_idempotency_table.get_item(
+            Key={'idempotency_key': idempotency_key},
+            ConsistentRead=True
+        )
+        record = response.get('Item')
+        if not record:
+            return None
+        if record['plate_number'] != plate_number:
+            logger.warning(f"Idempotency key reused for vehicle {plate_number}")
+            return ACCESS_KEY_REUSED, None, True
+        logger.info(f"Replayed idempotent access for vehicle {plate_number}")
+        return record['outcome'], record['vehicle'], True
+
+    @timed_operation
     def add_passes(self, plate_number, passes_to_add):
         """Add passes to vehicle"""
         try:
@@ -139,24 +676,296 @@ class DynamoDBManager:
             logger.error(f"Error adding passes: {str(e)}")
             return False
 
+    @timed_operation
     def list_all_vehicles(self):
         """List all vehicles"""
         try:
-            response = self.table.scan()
-            vehicles = response.get('Items', [])
+            return list(self.iter_vehicles())
+        except ClientError as e:
+            logger.error(f"Error listing vehicles: {str(e)}")
+            return []
 
-            # Handle pagination
-            while 'LastEvaluatedKey' in response:
-                response = self.table.scan(
-                    ExclusiveStartKey=response['LastEvaluatedKey']
-                )
+    def iter_vehicles(self, filters=None, attributes=None):
+        """Yield every vehicle, one scan page at a time
+
+        Only one page is held in memory. attributes limits the item fields
+        read. Unlike list_all_vehicles, errors are raised to the caller.
+        """
+        scan_kwargs = {}
+        filter_expression = build_vehicle_filter(filters)
+        if filter_expression is not None:
+            scan_kwargs['FilterExpression'] = filter_expression
+        if attributes:
+            scan_kwargs['ProjectionExpression'] = ', '.join(f'#a{i}' for i in range(len(attributes)))
+            scan_kwargs['ExpressionAttributeNames'] = {f'#a{i}': name for i, name in enumerate(attributes)}
+
+        while True:
+            response = self.table.scan(**scan_kwargs)
+            yield from response.get('Items', [])
+
+            if 'LastEvaluatedKey' not in response:
+                break
+            scan_kwargs['ExclusiveStartKey'] = response['LastEvaluatedKey']
+
+    @timed_operation
+    def list_vehicles_page(self, limit=100, cursor=None, filters=None):
+        """List one page of vehicles, optionally filtered
+
+        Returns a tuple of (vehicles, next_cursor). next_cursor is None once the
+        table is exhausted. A filtered page can hold fewer than limit vehicles
+        while next_cursor is still set; callers should keep following it.
+        Raises ValueError for a cursor that was not produced by this method.
+        """
+        start_key = decode_start_key(cursor, {'plate_number': str}) if cursor else None
+        scan_kwargs = {}
+        filter_expression = build_vehicle_filter(filters)
+        if filter_expression is not None:
+            scan_kwargs['FilterExpression'] = filter_expression
+
+        vehicles = []
+        try:
+            for _ in range(MAX_SCAN_CALLS_PER_PAGE):
+                # Never evaluate more items than the page still has room for,
+                # so the continuation key never skips a matching item
+                scan_kwargs['Limit'] = limit - len(vehicles)
+                if start_key:
+                    scan_kwargs['ExclusiveStartKey'] = start_key
+                response = self.table.scan(**scan_kwargs)
                 vehicles.extend(response.get('Items', []))
+                start_key = response.get('LastEvaluatedKey')
 
-            return vehicles
+                if not start_key or len(vehicles) >= limit:
+                    break
+
+            return vehicles, encode_cursor(start_key)
         except ClientError as e:
-            logger.error(f"Error listing vehicles: {str(e)}")
-            return []
+            logger.error(f"Error listing vehicles page: {str(e)}")
+            raise
+
+    @timed_operation
+    def query_vehicles_by_status(self, status, min_passes=None, max_passes=None, limit=100, cursor=None):
+        """List vehicles with one status, fewest remaining passes first
+
+        A Query on the status-passes-index GSI, so it reads only the
+        vehicles it returns. Index reads are eventually consistent and may
+        trail a write by a moment. Returns a tuple of (vehicles,
+        next_cursor). Raises ValueError for a cursor that was not produced
+        for this status.
+        """
+        condition = Key('status').eq(status)
+        if min_passes is not None and max_passes is not None:
+            condition = condition & Key('remaining_passes').between(min_passes, max_passes)
+        elif min_passes is not None:
+            condition = condition & Key('remaining_passes').gte(min_passes)
+        elif max_passes is not None:
+            condition = condition & Key('remaining_passes').lte(max_passes)
+
+        query_kwargs = {'IndexName': VEHICLE_STATUS_INDEX, 'KeyConditionExpression': condition, 'Limit': limit}
+        if cursor:
+            query_kwargs['ExclusiveStartKey'] = decode_start_key(
+                cursor, {'status': str, 'remaining_passes': Decimal, 'plate_number': str}, status=status
+            )
+
+        try:
+            response = self.table.query(**query_kwargs)
+            return response.get('Items', []), encode_cursor(response.get('LastEvaluatedKey'))
+        except ClientError as e:
+            logger.error(f"Error querying vehicles by status: {str(e)}")
+            raise
+
+    @timed_operation
+    def query_vehicles_by_email(self, email):
+        """List every vehicle registered with an email (exact match), in plate order
+
+        A Query on the email-index GSI; eventually consistent like
+        query_vehicles_by_status.
+        """
+        vehicles = []
+        query_kwargs = {'IndexName': VEHICLE_EMAIL_INDEX, 'KeyConditionExpression': Key('email').eq(email)}
+        try:
+            while True:
+                response = self.table.query(**query_kwargs)
+                vehicles.extend(response.get('Items', []))
+                if 'LastEvaluatedKey' not in response:
+                    break
+                query_kwargs['ExclusiveStartKey'] = response['LastEvaluatedKey']
+        except ClientError as e:
+            logger.error(f"Error querying vehicles by email: {str(e)}")
+            raise
+        return sorted(vehicles, key=lambda vehicle: vehicle['plate_number'])
+
+    @timed_operation
+    def get_existing_plates(self, plate_numbers):
+        """Return the subset of plate numbers that are already registered
+
+        Uses BatchGetItem with a key-only projection, 100 keys per request.
+        """
+        existing = set()
+        plate_numbers = list(plate_numbers)
+        for start in range(0, len(plate_numbers), BATCH_GET_MAX_KEYS):
+            request_items = {
+                self.table_name: {
+                    'Keys': [{'plate_number': p} for p in plate_numbers[start:start + BATCH_GET_MAX_KEYS]],
+                    'ProjectionExpression': 'plate_number'
+                }
+            }
+            attempt = 0
+            while request_items:
+                response = self.dynamodb.batch_get_item(RequestItems=request_items)
+                for item in response.get('Responses', {}).get(self.table_name, []):
+                    existing.add(item['plate_number'])
+
+                # Retry throttled keys with exponential backoff
+                request_items = response.get('UnprocessedKeys') or {}
+                if request_items:
+                    attempt += 1
+                    time.sleep(min(0.05 * (2 ** attempt), 2))
+        return existing
+
+    @timed_operation
+    def batch_create_vehicles(self, vehicles):
+        """Write many new vehicles, skipping plates already registered
+
+        BatchWriteItem cannot carry a condition and would overwrite a plate
+        registered after the caller's get_existing_plates check, so vehicles
+        are written with TransactWriteItems, 100 per request, each put
+        conditioned on the plate not existing. One failed condition cancels
+        the whole request; the plates that collided are set aside and the
+        rest resent. Returns the set of plate numbers that were skipped.
+        """
+        vehicles = list(vehicles)
+        existing = set()
+        for start in range(0, len(vehicles), TRANSACT_WRITE_MAX_ITEMS):
+            pending = vehicles[start:start + TRANSACT_WRITE_MAX_ITEMS]
+            attempt = 0
+            while pending:
+                try:
+                    self.dynamodb.meta.client.transact_write_items(TransactItems=[
+                        {
+                            'Put': {
+                                'TableName': self.table_name,
+                                'Item': vehicle,
+                                'ConditionExpression': 'attribute_not_exists(plate_number)'
+                            }
+                        }
+                        for vehicle in pending
+                    ])
+                    break
+                except ClientError as e:
+                    if e.response['Error']['Code'] != 'TransactionCanceledException':
+                        raise
+                    reasons = e.response.get('CancellationReasons') or []
+                    collided = {i for i, reason in enumerate(reasons) if reason.get('Code') == 'ConditionalCheckFailed'}
+                    if collided:
+                        existing.update(pending[i]['plate_number'] for i in collided)
+                        pending = [vehicle for i, vehicle in enumerate(pending) if i not in collided]
+                        continue
+                    # Conflicting transaction or throttled item; back off and resend
+                    attempt += 1
+                    if attempt >= IDEMPOTENT_WRITE_ATTEMPTS:
+                        raise
+                    time.sleep(min(0.05 * (2 ** attempt), 2))
+        logger.info(f"Batch created {len(vehicles) - len(existing)} vehicles")
+        return existing
+
+    @timed_operation
+    def batch_write_access_events(self, events):
+        """Write access events with BatchWriteItem (25 per request, unprocessed items resent)"""
+        with self.access_events_table.batch_writer() as batch:
+            for event in events:
+                batch.put_item(Item=event)
+        return True
+
+    @timed_operation
+    def query_access_events(self, plate_number=None, day=None, limit=50, cursor=None, since=None, until=None):
+        """Query access events for one vehicle or one day, newest first
+
+        Exactly one of plate_number and day must be given. since and until are
+        ISO timestamps bounding event_id. Returns a tuple of (events,
+        next_cursor). Raises ValueError for a cursor that was not produced here.
+        """
+        if day is not None:
+            condition = Key('day').eq(day)
+            query_kwargs = {'IndexName': ACCESS_EVENTS_DAY_INDEX}
+        else:
+            condition = Key('plate_number').eq(plate_number)
+            query_kwargs = {}
+
+        # event_id starts with the timestamp; '~' sorts after the '#suffix'
+        if since and until:
+            condition = condition & Key('event_id').between(since, until + '~')
+        elif since:
+            condition = condition & Key('event_id').gte(since)
+        elif until:
+            condition = condition & Key('event_id').lte(until + '~')
+
+        query_kwargs.update(KeyConditionExpression=condition, ScanIndexForward=False, Limit=limit)
+        if cursor:
+            if day is not None:
+                start_key = decode_start_key(cursor, {'day': str, 'event_id': str, 'plate_number': str}, day=day)
+            else:
+                start_key = decode_start_key(cursor, {'plate_number': str, 'event_id': str}, plate_number=plate_number)
+            query_kwargs['ExclusiveStartKey'] = start_key
+
+        try:
+            response = self.access_events_table.query(**query_kwargs)
+            return response.get('Items', []), encode_cursor(response.get('LastEvaluatedKey'))
+        except ClientError as e:
+            logger.error(f"Error querying access events: {str(e)}")
+            raise
+
+    @timed_operation
+    def add_rollup_counts(self, series, bucket, counts, expected=None):
+        """Atomically add counts ({field: amount}) to one rollup bucket
+
+        With expected ({field: value}) the add is conditional on the bucket
+        holding those values. Returns the bucket after the add, or None if
+        the condition failed or the write failed.
+        """
+        names = {f'#f{i}': field for i, field in enumerate(counts)}
+        values = {f':v{i}': amount for i, amount in enumerate(counts.values())}
+        update_kwargs = {}
+        if expected:
+            names.update({f'#e{i}': field for i, field in enumerate(expected)})
+            values.update({f':e{i}': value for i, value in enumerate(expected.values())})
+            update_kwargs['ConditionExpression'] = ' AND '.join(f'#e{i} = :e{i}' for i in range(len(expected)))
+        try:
+            response = self.rollups_table.update_item(
+                Key={'series': series, 'bucket': bucket},
+                UpdateExpression='ADD ' + ', '.join(f'#f{i} :v{i}' for i in range(len(counts))),
+                ExpressionAttributeNames=names,
+                ExpressionAttributeValues=values,
+                ReturnValues='ALL_NEW',
+                **update_kwargs
+            )
+            return response['Attributes']
+        except ClientError as e:
+            if e.response['Error']['Code'] == 'ConditionalCheckFailedException':
+                return None
+            logger.error(f"Error updating rollup {series} {bucket}: {str(e)}")
+            return None
+
+    @timed_operation
+    def get_rollup(self, series, bucket):
+        """Return one rollup bucket with a strongly consistent GetItem, or None"""
+        response = self.rollups_table.get_item(Key={'series': series, 'bucket': bucket}, ConsistentRead=True)
+        return response.get('Item')
+
+    @timed_operation
+    def query_rollups(self, series, first_bucket, last_bucket):
+        """Return every stored bucket of a series between two bucket keys, oldest first"""
+        items = []
+        query_kwargs = {
+            'KeyConditionExpression': Key('series').eq(series) & Key('bucket').between(first_bucket, last_bucket)
+        }
+        while True:
+            response = self.rollups_table.query(**query_kwargs)
+            items.extend(response.get('Items', []))
+            if 'LastEvaluatedKey' not in response:
+                return items
+            query_kwargs['ExclusiveStartKey'] = response['LastEvaluatedKey']
 
+    @timed_operation
     def update_vehicle_status(self, plate_number, status):
         """Update vehicle status (active, suspended, etc.)"""
         try:
@@ -177,6 +986,7 @@ class DynamoDBManager:
             logger.error(f"Error updating status: {str(e)}")
             return False
 
+    @timed_operation
     def delete_vehicle(self, plate_number):
         """Delete a vehicle registration"""
         try:
@@ -0,0 +1,174 @@
+"""
+Vehicle change events for Vehicle Pass Registration System
+"""
+from collections import deque
+import asyncio
+import threading
+import uuid
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Event types published by the write paths
+EVENT_REGISTERED = 'registered'
+EVENT_PASS_DEDUCTED = 'pass_deducted'
+EVENT_PASSES_ADDED = 'passes_added'
+EVENT_STATUS_CHANGED = 'status_changed'
+EVENT_DELETED = 'deleted'
+
+# Sent when a client cannot be caught up from history and must reload
+EVENT_RESYNC = 'resync'
+
+# SSE comment line that keeps idle connections and proxies alive
+HEARTBEAT_FRAME = ': keep-alive\n\n'
+
+
+class BrokerFull(Exception):
+    """Raised when the subscriber limit has been reached"""
+
+
+def format_sse(event_id, event_type, data):
+    """Encode one Server-Sent Events frame"""
+    lines = [f'id: {event_id}', f'event: {event_type}']
+    lines.extend(f'data: {line}' for line in data.splitlines() or [''])
+    return '\n'.join(lines) + '\n\n'
+
+
+class AsyncSubscription:
+    """One connected client's bounded queue of encoded frames, consumed from asyncio
+
+    The change feed is only streamed by the ASGI app. Frames may be published
+    from any thread; they are handed to the loop
+    with call_soon_threadsafe, so waiting for events costs no thread.
+    Must be created from inside the running loop.
+    """
+
+    def __init__(self, max_queue):
+        """Initialize an empty queue bound to the running loop"""
+        self._loop = asyncio.get_running_loop()
+        self._queue = asyncio.Queue()
+        self._max_queue = max_queue
+        self._size = 0
+        self._lock = threading.Lock()
+        self.overflowed = False
+
+    def deliver(self, frame):
+        """Queue a frame without blocking; a full queue marks the client as lagging"""
+        with self._lock:
+            if self._size >= self._max_queue:
+                self.overflowed = True
+                return False
+            self._size += 1
+        try:
+            self._loop.call_soon_threadsafe(self._queue.put_nowait, frame)
+            return True
+        except RuntimeError:
+            # Loop already closed
+            self.overflowed = True
+            return False
+
+    async def next_frame(self, timeout):
+        """Wait for the next frame, or return None after timeout"""
+        try:
+            frame = await asyncio.wait_for(self._queue.get(), timeout)
+        except asyncio.TimeoutError:
+            return None
+        with self._lock:
+            self._size -= 1
+        return frame
+
+
+class EventBroker:
+    """Fans vehicle change events out to subscribers
+
+    Each event is encoded once at publish time and handed to every
+    subscriber's bounded queue, so one slow client never blocks a write
+    path or other clients. A client that falls behind is dropped and, on
+    reconnect, replayed from a short history using its Last-Event-ID.
+    """
+
+    def __init__(self, max_subscribers=500, max_queue=100, history_size=1000):
+        """Initialize broker limits"""
+        self.max_subscribers = max_subscribers
+        self.max_queue = max_queue
+        self.epoch = uuid.uuid4().hex[:8]
+
+        self._lock = threading.Lock()
+        self._subscribers = set()
+        self._history = deque(maxlen=history_size)  # (sequence, frame)
+        self._sequence = 0
+
+        self.published = 0
+        self.dropped_subscribers = 0
+
+    def publish(self, event_type, data):
+        """Publish an event whose data is an already serialized JSON string"""
+        with self._lock:
+            self._sequence += 1
+            frame = format_sse(f'{self.epoch}-{self._sequence}', event_type, data)
+            self._history.append((self._sequence, frame))
+            self.published += 1
+            subscribers = list(self._subscribers)
+
+        for subscription in subscribers:
+            if not subscription.deliver(frame):
+                self._drop(subscription)
+
+    def subscribe(self, last_event_id=None):
+        """Register a client and queue any history it missed
+
+        Call from inside the running event loop that will consume the frames.
+        Raises BrokerFull when max_subscribers clients are already connected.
+        """
+        subscription = AsyncSubscription(self.max_queue)
+        with self._lock:
+            if len(self._subscribers) >= self.max_subscribers:
+                raise BrokerFull()
+
+            if last_event_id:
+                missed = self._missed_frames(last_event_id)
+                # Too far behind to replay into one queue: start over instead
+                if missed is None or len(missed) >= self.max_queue:
+                    subscription.deliver(format_sse(
+                        f'{self.epoch}-{self._sequence}', EVENT_RESYNC, '{}'
+                    ))
+                else:
+                    for frame in missed:
+                        subscription.deliver(frame)
+
+            self._subscribers.add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription):
+        """Remove a client"""
+        with self._lock:
+            self._subscribers.discard(subscription)
+
+    def _drop(self, subscription):
+        """Disconnect a client that fell behind"""
+        with self._lock:
+            if subscription in self._subscribers:
+                self._subscribers.discard(subscription)
+                self.dropped_subscribers += 1
+
+    def stats(self):
+        """Return broker counters"""
+        with self._lock:
+            return {
+                'subscribers': len(self._subscribers),
+                'max_subscribers': self.max_subscribers,
+                'published': self.published,
+                'dropped_subscribers': self.dropped_subscribers
+            }
+
+    def _missed_frames(self, last_event_id):
+        """Frames after last_event_id, or None if they are no longer in history"""
+        epoch, _, sequence = last_event_id.partition('-')
+        if epoch != self.epoch or not sequence.isdigit():
+            return None
+        sequence = int(sequence)
+        if sequence == self._sequence:
+            return []
+        if not self._history or sequence < self._history[0][0] - 1 or sequence > self._sequence:
+            return None
+        return [frame for seq, frame in self._history if seq > sequence]
@@ -0,0 +1,66 @@
+"""
+JSON encoding for Vehicle Pass Registration System
+
+DynamoDB returns every number as a Decimal, which Flask's default provider
+writes out as a string ("remaining_passes": "7"). FastJSONProvider writes
+whole Decimals as ints and the rest as floats, and uses orjson when it is
+installed, falling back to the standard library otherwise.
+"""
+from decimal import Decimal
+import json
+import logging
+
+from flask.json.provider import DefaultJSONProvider
+
+try:
+    import orjson
+    ORJSON_AVAILABLE = True
+except ImportError:
+    ORJSON_AVAILABLE = False
+    logging.warning("orjson not available, using the standard json module")
+
+
+def _default(obj):
+    """Encode the types orjson and json do not handle themselves"""
+    if isinstance(obj, Decimal):
+        return int(obj) if obj == obj.to_integral_value() else float(obj)
+    if isinstance(obj, set):
+        return sorted(obj)
+    return DefaultJSONProvider.default(obj)
+
+
+class FastJSONProvider(DefaultJSONProvider):
+    """Flask JSON provider with native Decimal support
+
+    Keys are written in insertion order rather than sorted; ETags come from
+    the change version, not the body, so key order has no effect on caching.
+    """
+
+    sort_keys = False
+
+    def dumps(self, obj, **kwargs):
+        """Serialize obj to a JSON string"""
+        if ORJSON_AVAILABLE and set(kwargs) <= {'indent'} and kwargs.get('indent') in (None, 2):
+            option = orjson.OPT_NON_STR_KEYS
+            if kwargs.get('indent'):
+                option |= orjson.OPT_INDENT_2
+            return orjson.dumps(obj, default=_default, option=option).decode()
+        kwargs.setdefault('default', _default)
+        kwargs.setdefault('ensure_ascii', self.ensure_ascii)
+        kwargs.setdefault('sort_keys', self.sort_keys)
+        return json.dumps(obj, **kwargs)
+
+    def loads(self, s, **kwargs):
+        """Deserialize a JSON string or bytes"""
+        if ORJSON_AVAILABLE and not kwargs:
+            return orjson.loads(s)
+        return json.loads(s, **kwargs)
+
+    def response(self, *args, **kwargs):
+        """Build a JSON response, pretty-printed only in debug mode"""
+        obj = self._prepare_response_obj(args, kwargs)
+        if self.compact is False or (self.compact is None and self._app.debug):
+            body = self.dumps(obj, indent=2)
+        else:
+            body = self.dumps(obj)
+        return self._app.response_class(f'{body}\n', mimetype=self.mimetype)
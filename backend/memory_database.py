@@ -0,0 +1,332 @@
+"""
+In-memory storage for Vehicle Pass Registration System
+
+Holds everything in process memory behind one lock, with the semantics of
+DynamoDBManager: the same return values, the same conditional decrement,
+the same cursor format. Meant for tests, load tests and demos that must
+run without AWS; all data is lost when the process exits.
+"""
+from decimal import Decimal
+import bisect
+import threading
+import time
+
+from backend.database import (
+    ACCESS_GRANTED, ACCESS_NOT_REGISTERED, ACCESS_NO_PASSES, ACCESS_KEY_REUSED,
+    IDEMPOTENT_RESULT_FIELDS, encode_cursor, decode_cursor
+)
+from backend.metrics import timed_operation
+from backend.storage import VehicleStorage
+
+
+def matches_filters(vehicle, filters):
+    """Whether a vehicle passes status, car_type and pass range filters"""
+    if not filters:
+        return True
+    if filters.get('status') and vehicle.get('status') != filters['status']:
+        return False
+    if filters.get('car_type') and vehicle.get('car_type') != filters['car_type']:
+        return False
+    remaining = vehicle.get('remaining_passes', 0)
+    if filters.get('min_passes') is not None and remaining < filters['min_passes']:
+        return False
+    if filters.get('max_passes') is not None and remaining > filters['max_passes']:
+        return False
+    return True
+
+
+class MemoryManager(VehicleStorage):
+    """Manages in-memory storage for vehicle registration
+
+    Every operation holds a single lock, so each is atomic with respect to
+    the others. Items are copied on the way in and out; callers can never
+    change stored data by mutating a returned dict.
+    """
+
+    def __init__(self, idempotency_ttl_seconds=86400):
+        """Initialize empty storage"""
+        self.idempotency_ttl_seconds = idempotency_ttl_seconds
+        self._lock = threading.Lock()
+        self._vehicles = {}           # plate_number -> vehicle
+        self._plates = []             # sorted plate numbers, for pagination
+        self._idempotency_keys = {}   # idempotency_key -> record
+        self._events = {}             # (plate_number, event_id) -> event
+        self._rollups = {}            # (series, bucket) -> {field: count}
+
+    def create_tables(self):
+        """Nothing to create; storage exists as soon as the manager does"""
+        return True
+
+    def _put(self, vehicle):
+        """Store a copy of a vehicle, keeping the plate index sorted (lock held)"""
+        plate_number = vehicle['plate_number']
+        if plate_number not in self._vehicles:
+            bisect.insort(self._plates, plate_number)
+        self._vehicles[plate_number] = dict(vehicle)
+
+    @timed_operation
+    def create_vehicle(self, vehicle_data):
+        """Create a new vehicle registration"""
+        with self._lock:
+            if vehicle_data['plate_number'] in self._vehicles:
+                return False
+            self._put(vehicle_data)
+        return True
+
+    @timed_operation
+    def get_vehicle(self, plate_number):
+        """Get vehicle by plate number"""
+        with self._lock:
+            vehicle = self._vehicles.get(plate_number)
+            return dict(vehicle) if vehicle else None
+
+    @timed_operation
+    def deduct_pass(self, plate_number):
+        """Deduct one pass from vehicle"""
+        with self._lock:
+            vehicle = self._vehicles.get(plate_number)
+            if not vehicle or vehicle.get('remaining_passes', 0) <= 0:
+                return False
+            vehicle['remaining_passes'] -= 1
+        return True
+
+    @timed_operation
+    def access_vehicle(self, plate_number):
+        """Authorize an entry and deduct one pass atomically
+
+        Returns a tuple of (outcome, vehicle) like DynamoDBManager.access_vehicle.
+        """
+        with self._lock:
+            vehicle = self._vehicles.get(plate_number)
+            if not vehicle:
+                return ACCESS_NOT_REGISTERED, None
+            if vehicle.get('remaining_passes', 0) <= 0:
+                return ACCESS_NO_PASSES, dict(vehicle)
+            vehicle['remaining_passes'] -= 1
+            return ACCESS_GRANTED, dict(vehicle)
+
+    @timed_operation
+    def access_vehicle_once(self, plate_number, idempotency_key, vehicle=None):
+        """Authorize an entry and deduct one pass at most once per idempotency key
+
+        vehicle is accepted for interface compatibility and ignored. Returns a
+        tuple of (outcome, vehicle, replayed).
+        """
+        now = time.time()
+        with self._lock:
+            record = self._idempotency_keys.get(idempotency_key)
+            if record is not None and record['expires_at'] > now:
+                if record['plate_number'] != plate_number:
+                    return ACCESS_KEY_REUSED, None, True
+                return record['outcome'], dict(record['vehicle']), True
+
+            current = self._vehicles.get(plate_number)
+            if not current:
+                return ACCESS_NOT_REGISTERED, None, False
+            if current.get('remaining_passes', 0) <= 0:
+                return ACCESS_NO_PASSES, dict(current), False
+
+            current['remaining_passes'] -= 1
+            self._idempotency_keys[idempotency_key] = {
+                'plate_number': plate_number,
+                'outcome': ACCESS_GRANTED,
+                'vehicle': {k: current.get(k) for k in IDEMPOTENT_RESULT_FIELDS},
+                'expires_at': now + self.idempotency_ttl_seconds
+            }
+            return ACCESS_GRANTED, dict(current), False
+
+    @timed_operation
+    def add_passes(self, plate_number, passes_to_add):
+        """Add passes to vehicle"""
+        with self._lock:
+            vehicle = self._vehicles.get(plate_number)
+            if not vehicle:
+                return False
+            vehicle['remaining_passes'] = vehicle.get('remaining_passes', 0) + passes_to_add
+            vehicle['total_passes'] = vehicle.get('total_passes', 0) + passes_to_add
+        return True
+
+    @timed_operation
+    def update_vehicle_status(self, plate_number, status):
+        """Update vehicle status (active, suspended, etc.)"""
+        with self._lock:
+            vehicle = self._vehicles.get(plate_number)
+            if vehicle:
+                vehicle['status'] = status
+        return True
+
+    @timed_operation
+    def delete_vehicle(self, plate_number):
+        """Delete a vehicle registration"""
+        with self._lock:
+            if self._vehicles.pop(plate_number, None) is not None:
+                del self._plates[bisect.bisect_left(self._plates, plate_number)]
+        return True
+
+    def iter_vehicles(self, filters=None, attributes=None):
+        """Yield every vehicle in plate order from a snapshot taken up front"""
+        with self._lock:
+            vehicles = [dict(self._vehicles[p]) for p in self._plates]
+        for vehicle in vehicles:
+            if not matches_filters(vehicle, filters):
+                continue
+            if attributes:
+                vehicle = {k: vehicle[k] for k in attributes if k in vehicle}
+            yield vehicle
+
+    @timed_operation
+    def list_vehicles_page(self, limit=100, cursor=None, filters=None):
+        """List one page of vehicles in plate order, optionally filtered
+
+        Returns a tuple of (vehicles, next_cursor); next_cursor is None on the
+        last page. Raises ValueError for a cursor that was not produced here.
+        """
+        start = 0
+        if cursor:
+            start_key = decode_cursor(cursor)
+            if not isinstance(start_key.get('plate_number'), str):
+                raise ValueError("Invalid cursor")
+
+        vehicles = []
+        with self._lock:
+            if cursor:
+                start = bisect.bisect_right(self._plates, start_key['plate_number'])
+            for index in range(start, len(self._plates)):
+                vehicle = self._vehicles[self._plates[index]]
+                if not matches_filters(vehicle, filters):
+                    continue
+                if len(vehicles) == limit:
+                    return vehicles, encode_cursor({'plate_number': vehicles[-1]['plate_number']})
+                vehicles.append(dict(vehicle))
+        return vehicles, None
+
+    @timed_operation
+    def query_vehicles_by_status(self, status, min_passes=None, max_passes=None, limit=100, cursor=None):
+        """List vehicles with one status, fewest remaining passes first, then by plate
+
+        Scans every stored vehicle, which is fine at test sizes. Returns a
+        tuple of (vehicles, next_cursor). Raises ValueError for a cursor that
+        was not produced for this status.
+        """
+        after = None
+        if cursor:
+            start_key = decode_cursor(cursor)
+            if (start_key.get('status') != status or not isinstance(start_key.get('plate_number'), str)
+                    or not isinstance(start_key.get('remaining_passes'), Decimal)):
+                raise ValueError("Invalid cursor")
+            after = (start_key['remaining_passes'], start_key['plate_number'])
+
+        filters = {'status': status, 'min_passes': min_passes, 'max_passes': max_passes}
+        with self._lock:
+            candidates = sorted(
+                (vehicle.get('remaining_passes', 0), plate_number)
+                for plate_number, vehicle in self._vehicles.items()
+                if matches_filters(vehicle, filters)
+            )
+            if after is not None:
+                candidates = candidates[bisect.bisect_right(candidates, after):]
+            vehicles = [dict(self._vehicles[plate_number]) for _, plate_number in candidates[:limit]]
+
+        next_cursor = None
+        if len(candidates) > limit:
+            last = vehicles[-1]
+            next_cursor = encode_cursor({
+                'status': status, 'remaining_passes': last['remaining_passes'], 'plate_number': last['plate_number']
+            })
+        return vehicles, next_cursor
+
+    @timed_operation
+    def query_vehicles_by_email(self, email):
+        """List every vehicle registered with an email (exact match), in plate order"""
+        with self._lock:
+            return [dict(self._vehicles[p]) for p in self._plates if self._vehicles[p].get('email') == email]
+
+    @timed_operation
+    def get_existing_plates(self, plate_numbers):
+        """Return the subset of plate numbers that are already registered"""
+        with self._lock:
+            return {p for p in plate_numbers if p in self._vehicles}
+
+    @timed_operation
+    def batch_create_vehicles(self, vehicles):
+        """Store many new vehicles, skipping plates already registered
+
+        Returns the set of plate numbers that were skipped.
+        """
+        existing = set()
+        with self._lock:
+            for vehicle in vehicles:
+                if vehicle['plate_number'] in self._vehicles:
+                    existing.add(vehicle['plate_number'])
+                else:
+                    self._put(vehicle)
+        return existing
+
+    @timed_operation
+    def batch_write_access_events(self, events):
+        """Store access events"""
+        with self._lock:
+            for event in events:
+                self._events[(event['plate_number'], event['event_id'])] = dict(event)
+        return True
+
+    @timed_operation
+    def query_access_events(self, plate_number=None, day=None, limit=50, cursor=None, since=None, until=None):
+        """Query access events for one vehicle or one day, newest first
+
+        Exactly one of plate_number and day must be given. Scans every stored
+        event, which is fine at test sizes. Returns a tuple of (events,
+        next_cursor). Raises ValueError for a cursor that was not produced here.
+        """
+        start_key = None
+        if cursor:
+            start_key = decode_cursor(cursor)
+            if not isinstance(start_key.get('event_id'), str) or not isinstance(start_key.get('plate_number'), str):
+                raise ValueError("Invalid cursor")
+            start_key = (start_key['event_id'], start_key['plate_number'])
+
+        now = time.time()
+        with self._lock:
+            candidates = [
+                event for event in self._events.values()
+                if (event['day'] == day if day is not None else event['plate_number'] == plate_number)
+                # event_id starts with the timestamp; '~' sorts after the '#suffix'
+                and (not since or event['event_id'] >= since)
+                and (not until or event['event_id'] <= until + '~')
+                and (event.get('expires_at') is None or event['expires_at'] > now)
+                and (start_key is None or (event['event_id'], event['plate_number']) < start_key)
+            ]
+            candidates.sort(key=lambda event: (event['event_id'], event['plate_number']), reverse=True)
+            events = [dict(event) for event in candidates[:limit]]
+
+        next_cursor = None
+        if len(candidates) > limit:
+            last = events[-1]
+            next_cursor = encode_cursor({'plate_number': last['plate_number'], 'event_id': last['event_id']})
+        return events, next_cursor
+
+    @timed_operation
+    def add_rollup_counts(self, series, bucket, counts, expected=None):
+        """Atomically add counts ({field: amount}) to one rollup bucket; returns the bucket after the add
+
+        With expected ({field: value}) nothing is added, and None returned,
+        unless the bucket holds those values.
+        """
+        with self._lock:
+            current = self._rollups.get((series, bucket), {})
+            if expected and any(current.get(field) != value for field, value in expected.items()):
+                return None
+            item = self._rollups.setdefault((series, bucket), {})
+            for field, amount in counts.items():
+                item[field] = item.get(field, 0) + amount
+            return dict(item, series=series, bucket=bucket)
+
+    @timed_operation
+    def query_rollups(self, series, first_bucket, last_bucket):
+        """Return every stored bucket of a series between two bucket keys, oldest first"""
+        with self._lock:
+            return [
+                dict(counts, series=series, bucket=bucket)
+                for (item_series, bucket), counts in sorted(self._rollups.items())
+                if item_series == series and first_bucket <= bucket <= last_bucket
+            ]
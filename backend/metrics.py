@@ -0,0 +1,276 @@
+"""
+Prometheus metrics for Vehicle Pass Registration System
+
+A small dependency-free registry that renders the Prometheus text format.
+Metrics are per process; scrape every worker or aggregate in Prometheus.
+"""
+from bisect import bisect_left
+import functools
+import threading
+import time
+
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+# Latency buckets in seconds, tuned for sub-second API calls
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.2, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+def _escape(value):
+    """Escape a label value"""
+    return str(value).replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+
+def _format_labels(labelnames, labelvalues, extra=None):
+    """Render a {name="value",...} label set"""
+    pairs = list(zip(labelnames, labelvalues))
+    if extra:
+        pairs.append(extra)
+    if not pairs:
+        return ''
+    return '{' + ','.join(f'{name}="{_escape(value)}"' for name, value in pairs) + '}'
+
+
+def _format_value(value):
+    """Render a sample value"""
+    if value == float('inf'):
+        return '+Inf'
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+class _Metric:
+    """Base class for a labelled metric family"""
+
+    metric_type = None
+
+    def __init__(self, name, documentation, labelnames=()):
+        """Initialize an empty family"""
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+        self._children = {}
+
+    def labels(self, *labelvalues, **labelkwargs):
+        """Return the child for one label combination"""
+        if labelkwargs:
+            labelvalues = tuple(labelkwargs[name] for name in self.labelnames)
+        key = tuple(str(value) for value in labelvalues)
+        child = self._children.get(key)
+        if child is None:
+            with self._lock:
+                child = self._children.setdefault(key, self._new_child())
+        return child
+
+    def render(self):
+        """Render HELP, TYPE and samples"""
+        lines = [
+            f'# HELP {self.name} {self.documentation}',
+            f'# TYPE {self.name} {self.metric_type}'
+        ]
+        with self._lock:
+            children = sorted(self._children.items())
+        for labelvalues, child in children:
+            lines.extend(self._render_child(labelvalues, child))
+        return lines
+
+
+class _Value:
+    """A single float guarded by a lock"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.value = 0.0
+
+    def inc(self, amount=1):
+        with self._lock:
+            self.value += amount
+
+    def dec(self, amount=1):
+        with self._lock:
+            self.value -= amount
+
+    def set(self, value):
+        with self._lock:
+            self.value = value
+
+
+class Counter(_Metric):
+    """Monotonically increasing count"""
+
+    metric_type = 'counter'
+
+    def _new_child(self):
+        return _Value()
+
+    def _render_child(self, labelvalues, child):
+        return [f'{self.name}{_format_labels(self.labelnames, labelvalues)} {_format_value(child.value)}']
+
+
+class Gauge(Counter):
+    """Value that can go up and down"""
+
+    metric_type = 'gauge'
+
+
+class _HistogramValue:
+    """Bucket counts, sum and count for one label combination"""
+
+    def __init__(self, buckets):
+        self._lock = threading.Lock()
+        self.buckets = buckets
+        self.counts = [0] * len(buckets)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            if index < len(self.counts):
+                self.counts[index] += 1
+            self.sum += value
+            self.count += 1
+
+    def snapshot(self):
+        with self._lock:
+            return list(self.counts), self.sum, self.count
+
+
+class Histogram(_Metric):
+    """Distribution of observations in cumulative buckets"""
+
+    metric_type = 'histogram'
+
+    def __init__(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        """Initialize with sorted bucket upper bounds"""
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+
+    def _new_child(self):
+        return _HistogramValue(self.buckets)
+
+    def _render_child(self, labelvalues, child):
+        counts, total, count = child.snapshot()
+        lines = []
+        cumulative = 0
+        for bound, bucket_count in zip(self.buckets, counts):
+            cumulative += bucket_count
+            labels = _format_labels(self.labelnames, labelvalues, ('le', _format_value(bound)))
+            lines.append(f'{self.name}_bucket{labels} {cumulative}')
+        labels = _format_labels(self.labelnames, labelvalues, ('le', '+Inf'))
+        lines.append(f'{self.name}_bucket{labels} {count}')
+        labels = _format_labels(self.labelnames, labelvalues)
+        lines.append(f'{self.name}_sum{labels} {_format_value(total)}')
+        lines.append(f'{self.name}_count{labels} {count}')
+        return lines
+
+
+class MetricsRegistry:
+    """Collection of metric families and callback collectors"""
+
+    def __init__(self):
+        """Initialize an empty registry"""
+        self._metrics = []
+        self._collectors = []
+
+    def register(self, metric):
+        """Add a metric family and return it"""
+        self._metrics.append(metric)
+        return metric
+
+    def register_collector(self, collector):
+        """Add a callable that returns extra exposition lines at scrape time"""
+        self._collectors.append(collector)
+
+    def render(self):
+        """Render every metric in the Prometheus text format"""
+        lines = []
+        for metric in self._metrics:
+            lines.extend(metric.render())
+        for collector in self._collectors:
+            lines.extend(collector())
+        return '\n'.join(lines) + '\n'
+
+
+REGISTRY = MetricsRegistry()
+
+HTTP_REQUEST_DURATION = REGISTRY.register(Histogram(
+    'http_request_duration_seconds',
+    'HTTP request latency by route',
+    ['method', 'route']
+))
+HTTP_REQUESTS = REGISTRY.register(Counter(
+    'http_requests_total',
+    'HTTP requests by route and status code',
+    ['method', 'route', 'status']
+))
+HTTP_REQUESTS_IN_FLIGHT = REGISTRY.register(Gauge(
+    'http_requests_in_flight',
+    'HTTP requests currently being served',
+    ['route']
+))
+DB_OPERATION_DURATION = REGISTRY.register(Histogram(
+    'dynamodb_operation_duration_seconds',
+    'Storage backend method latency',
+    ['operation']
+))
+DB_OPERATION_ERRORS = REGISTRY.register(Counter(
+    'dynamodb_operation_errors_total',
+    'Storage backend methods that raised',
+    ['operation']
+))
+DB_RETRIES = REGISTRY.register(Counter(
+    'dynamodb_retries_total',
+    'DynamoDB API call attempts that were retried',
+    ['api', 'client']
+))
+DB_THROTTLES = REGISTRY.register(Counter(
+    'dynamodb_throttled_requests_total',
+    'DynamoDB API call attempts rejected as throttled',
+    ['api', 'client']
+))
+
+
+def timed_operation(method):
+    """Record a storage backend method's latency and raised errors"""
+    operation = method.__name__
+    duration = DB_OPERATION_DURATION.labels(operation)
+    errors = DB_OPERATION_ERRORS.labels(operation)
+
+    @functools.wraps(method)
+    def wrapper(*args, **kwargs):
+        start = time.perf_counter()
+        try:
+            return method(*args, **kwargs)
+        except Exception:
+            errors.inc()
+            raise
+        finally:
+            duration.observe(time.perf_counter() - start)
+    return wrapper
+
+
+def sample_lines(name, documentation, samples, metric_type='gauge'):
+    """Render (labels dict, value) samples for a collector"""
+    lines = [f'# HELP {name} {documentation}', f'# TYPE {name} {metric_type}']
+    for labels, value in samples:
+        lines.append(f'{name}{_format_labels(labels.keys(), labels.values())} {_format_value(value)}')
+    return lines
+
+
+class RequestTimer:
+    """Tracks one HTTP request from start to finish"""
+
+    def __init__(self, method, route):
+        """Start timing and count the request as in flight"""
+        self.method = method
+        self.route = route
+        self.start = time.perf_counter()
+        HTTP_REQUESTS_IN_FLIGHT.labels(route).inc()
+
+    def finish(self, status_code):
+        """Stop timing and record the outcome"""
+        HTTP_REQUESTS_IN_FLIGHT.labels(self.route).dec()
+        HTTP_REQUEST_DURATION.labels(self.method, self.route).observe(time.perf_counter() - self.start)
+        HTTP_REQUESTS.labels(self.method, self.route, status_code).inc()
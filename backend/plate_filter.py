@@ -0,0 +1,188 @@
+"""
+Registered plate filter for Vehicle Pass Registration System
+
+Many gate reads are for vehicles that were never registered, and each one
+still costs a database read to find that out. PlateFilter holds a counting
+Bloom filter of the registered plates: when it rules a plate out, the gate
+is answered "not registered" without a read. A plate it lets through may
+still be unregistered (a false positive), which only costs the read that
+every request used to make.
+"""
+import hashlib
+import math
+import threading
+
+from backend.rebuild import ScanRebuilt
+
+# Attributes a rebuild scan needs to read
+PLATE_FILTER_ATTRIBUTES = ['plate_number']
+
+# A rebuild sizes the filter for this many times the plates it found, so
+# registrations until the next rebuild do not push the false positive rate up
+CAPACITY_HEADROOM = 2
+MIN_CAPACITY = 1024
+
+# Counters stop here; a saturated counter is never decremented again
+_COUNTER_MAX = 255
+
+
+class CountingBloomFilter:
+    """Bloom filter with a byte counter per slot, so items can be removed
+
+    Not thread-safe; PlateFilter serializes access.
+    """
+
+    def __init__(self, capacity, false_positive_rate):
+        """Size the filter to hold capacity items at the given false positive rate"""
+        capacity = max(1, capacity)
+        self.size = max(8, math.ceil(-capacity * math.log(false_positive_rate) / math.log(2) ** 2))
+        self.hashes = max(1, round(self.size / capacity * math.log(2)))
+        self.capacity = capacity
+        self.items = 0
+        self._counters = bytearray(self.size)
+        self._occupied = 0
+
+    def _slots(self, item):
+        """The hashes slots of an item, by double hashing one 128-bit digest"""
+        digest = hashlib.blake2b(item.encode(), digest_size=16).digest()
+        first = int.from_bytes(digest[:8], 'little')
+        step = int.from_bytes(digest[8:], 'little') | 1
+        return [(first + i * step) % self.size for i in range(self.hashes)]
+
+    def add(self, item):
+        """Count one more copy of item"""
+        counters = self._counters
+        for slot in self._slots(item):
+            if counters[slot] == 0:
+                self._occupied += 1
+            if counters[slot] < _COUNTER_MAX:
+                counters[slot] += 1
+        self.items += 1
+
+    def remove(self, item):
+        """Uncount one copy of item; removing an item never added can hide others"""
+        counters = self._counters
+        for slot in self._slots(item):
+            if 0 < counters[slot] < _COUNTER_MAX:
+                counters[slot] -= 1
+                if counters[slot] == 0:
+                    self._occupied -= 1
+        self.items -= 1
+
+    def __contains__(self, item):
+        """False only if item was never added"""
+        counters = self._counters
+        return all(counters[slot] for slot in self._slots(item))
+
+    def false_positive_rate(self):
+        """Chance that an item never added is reported present, from the current fill"""
+        return (self._occupied / self.size) ** self.hashes
+
+
+class PlateFilter(ScanRebuilt):
+    """Counting Bloom filter of every registered plate
+
+    apply() adds and removes plates on every create and delete, so the
+    filter is only complete while every registration goes through this
+    process. rebuild() replaces it from a full scan, replaying writes applied
+    while the scan ran, to size it for the current fleet and to drop
+    counts a failed write left behind. Until the first rebuild every plate
+    may be registered.
+    """
+
+    def __init__(self, false_positive_rate=0.01):
+        """Initialize an empty filter for the target false positive rate"""
+        self.target_false_positive_rate = false_positive_rate
+        self._lock = threading.Lock()
+        self._filter = None
+        self._changes = None   # writes seen during a rebuild, or None
+        self.rebuilt_at = None
+        self.rebuild_seconds = None
+        self.checks = 0
+        self.skipped_reads = 0
+        self.false_positives = 0
+
+    @property
+    def ready(self):
+        """True once a rebuild has loaded the filter"""
+        return self._filter is not None
+
+    def apply(self, before, after):
+        """Apply a vehicle write; before is None for a create, after is None for a delete
+
+        Only creates and deletes change the set of plates.
+        """
+        if before and after:
+            return
+        with self._lock:
+            self._record(before, after)
+            if self._filter is not None:
+                self._apply(self._filter, before, after)
+
+    @staticmethod
+    def _apply(bloom, before, after):
+        """Remove before's plate or add after's"""
+        if before:
+            # A plate another process registered since the last rebuild was
+            # never added here, and uncounting it would hide other plates
+            if before['plate_number'] in bloom:
+                bloom.remove(before['plate_number'])
+        if after:
+            bloom.add(after['plate_number'])
+
+    def _build(self, vehicles):
+        """A new Bloom filter sized for and holding the plates of an iterable of vehicles"""
+        plates = {vehicle['plate_number'] for vehicle in vehicles if vehicle.get('plate_number')}
+        fresh = CountingBloomFilter(
+            max(MIN_CAPACITY, len(plates) * CAPACITY_HEADROOM),
+            self.target_false_positive_rate
+        )
+        for plate_number in plates:
+            fresh.add(plate_number)
+        return fresh
+
+    def _install(self, fresh, changes):
+        """Replay changes onto fresh and make it the filter (lock held)"""
+        for before, after in changes:
+            self._apply(fresh, before, after)
+        self._filter = fresh
+
+    def definitely_missing(self, plate_number):
+        """True if plate_number is certainly not registered, so its read can be skipped"""
+        with self._lock:
+            if self._filter is None:
+                return False
+            self.checks += 1
+            if plate_number in self._filter:
+                return False
+            self.skipped_reads += 1
+            return True
+
+    def record_false_positive(self):
+        """Count a plate the filter let through that the database did not know"""
+        with self._lock:
+            if self._filter is not None:
+                self.false_positives += 1
+
+    def stats(self):
+        """Return filter counters"""
+        with self._lock:
+            bloom = self._filter
+            unregistered = self.skipped_reads + self.false_positives
+            return {
+                'ready': bloom is not None,
+                'plates': bloom.items if bloom else 0,
+                'capacity': bloom.capacity if bloom else 0,
+                'size_bytes': bloom.size if bloom else 0,
+                'hashes': bloom.hashes if bloom else 0,
+                'estimated_false_positive_rate': round(bloom.false_positive_rate(), 6) if bloom else 0.0,
+                'checks': self.checks,
+                'skipped_reads': self.skipped_reads,
+                'false_positives': self.false_positives,
+                # Share of unregistered plates the filter let through to the database
+                'observed_false_positive_rate': (
+                    round(self.false_positives / unregistered, 6) if unregistered else 0.0
+                ),
+                'rebuilt_at': self.rebuilt_at,
+                'rebuild_seconds': self.rebuild_seconds
+            }
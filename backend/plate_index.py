@@ -0,0 +1,135 @@
+"""
+Registered plate index for Vehicle Pass Registration System
+
+Gate cameras misread characters that look alike (O and 0, I and 1, B and 8,
+S and 5), and a misread plate is answered "Vehicle not registered" until the
+driver backs up for another read. PlateIndex maps every registered plate to
+a misread key, its characters with each look-alike pair folded together, so
+a plate the database does not know can be matched to the registered plate
+it was misread from with one dictionary lookup.
+"""
+import re
+import threading
+import logging
+
+from backend.rebuild import ScanRebuilt
+
+logger = logging.getLogger(__name__)
+
+# Characters OCR confuses, each folded into the character it is read as
+MISREAD_FOLDS = str.maketrans({'O': '0', 'I': '1', 'B': '8', 'S': '5'})
+
+# Cameras drop everything but letters and digits; registered plates may keep dashes
+_NOT_PLATE_CHARACTER = re.compile(r'[^A-Z0-9]')
+
+# Attributes a rebuild scan needs to read
+PLATE_INDEX_ATTRIBUTES = ['plate_number']
+
+
+def misread_key(plate_number):
+    """The key a plate shares with every plate it can be misread as"""
+    return _NOT_PLATE_CHARACTER.sub('', (plate_number or '').upper()).translate(MISREAD_FOLDS)
+
+
+class PlateIndex(ScanRebuilt):
+    """Every registered plate, grouped by misread key
+
+    apply() adds and removes plates on every create and delete; rebuild()
+    replaces them from a full scan, replaying writes applied while the scan
+    ran.
+    """
+
+    def __init__(self):
+        """Initialize an empty index; ready is False until the first rebuild"""
+        self._lock = threading.Lock()
+        self._by_key = {}      # misread key -> set of plates
+        self._plates = 0
+        self._changes = None   # writes seen during a rebuild, or None
+        self.ready = False
+        self.rebuilt_at = None
+        self.rebuild_seconds = None
+        self.corrected = 0
+        self.ambiguous = 0
+
+    def apply(self, before, after):
+        """Apply a vehicle write; before is None for a create, after is None for a delete
+
+        Only creates and deletes change the set of plates.
+        """
+        if before and after:
+            return
+        with self._lock:
+            self._record(before, after)
+            self._apply(before, after)
+
+    def _apply(self, before, after):
+        """Remove before's plate or add after's (lock held)"""
+        if before:
+            self._discard(before['plate_number'])
+        if after:
+            self._add(after['plate_number'])
+
+    def _add(self, plate_number):
+        """Add one plate (lock held)"""
+        plates = self._by_key.setdefault(misread_key(plate_number), set())
+        if plate_number not in plates:
+            plates.add(plate_number)
+            self._plates += 1
+
+    def _discard(self, plate_number):
+        """Remove one plate if present (lock held)"""
+        key = misread_key(plate_number)
+        plates = self._by_key.get(key)
+        if plates and plate_number in plates:
+            plates.discard(plate_number)
+            self._plates -= 1
+            if not plates:
+                del self._by_key[key]
+
+    def _build(self, vehicles):
+        """A new index holding the plates of an iterable of vehicles"""
+        fresh = PlateIndex()
+        for vehicle in vehicles:
+            if vehicle.get('plate_number'):
+                fresh._add(vehicle['plate_number'])
+        return fresh
+
+    def _install(self, fresh, changes):
+        """Replay changes onto fresh and take its plates (lock held)"""
+        for before, after in changes:
+            fresh._apply(before, after)
+        self._by_key, self._plates = fresh._by_key, fresh._plates
+        self.ready = True
+
+    def correct(self, plate_number):
+        """Return the registered plate an unregistered read was misread from, or None
+
+        Call it only after the database has answered that plate_number is
+        not registered. None when no registered plate matches, or when
+        several do: a read that could be more than one vehicle is rejected
+        rather than charged to either.
+        """
+        key = misread_key(plate_number)
+        with self._lock:
+            matches = [plate for plate in self._by_key.get(key, ()) if plate != plate_number]
+            if len(matches) == 1:
+                self.corrected += 1
+                return matches[0]
+            if matches:
+                self.ambiguous += 1
+        if matches:
+            logger.warning(f"Plate read {plate_number} matches {len(matches)} registered plates; rejected")
+        return None
+
+    def stats(self):
+        """Return index counters"""
+        with self._lock:
+            return {
+                'ready': self.ready,
+                'plates': self._plates,
+                'keys': len(self._by_key),
+                'corrected': self.corrected,
+                'ambiguous': self.ambiguous,
+                'rebuilt_at': self.rebuilt_at,
+                'rebuild_seconds': self.rebuild_seconds
+            }
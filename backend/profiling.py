@@ -0,0 +1,243 @@
+"""
+On-demand request profiling for Vehicle Pass Registration System
+
+A request sent with PROFILING_TOKEN in the X-Profile header (when
+PROFILING_ENABLED is set) is run under a sampling profiler. The result is
+written as folded stacks, the text format read by flamegraph.pl, speedscope
+and inferno, and the request's wall-clock time is split into phases in a
+Server-Timing header:
+
+    dispatch    Flask routing, view code and everything not listed below
+    validation  validate_registration_data
+    json        JSON encoding of responses and change feed events
+    dynamodb.*  each boto3 call, by operation name
+
+Requests without the header only pay a thread-local lookup per phase.
+"""
+from collections import Counter
+from datetime import datetime
+import contextlib
+import functools
+import hmac
+import os
+import re
+import sys
+import threading
+import time
+
+PROFILE_HEADER = 'X-Profile'
+
+_local = threading.local()
+
+
+def active_session():
+    """The profile session running on this thread, if any"""
+    return getattr(_local, 'session', None)
+
+
+@contextlib.contextmanager
+def phase(name):
+    """Attribute the enclosed time to a named phase of the profiled request"""
+    session = active_session()
+    if session is None:
+        yield
+        return
+    session.enter(name)
+    try:
+        yield
+    finally:
+        session.exit()
+
+
+def profiled_phase(name):
+    """Decorator form of phase()"""
+    def decorator(function):
+        @functools.wraps(function)
+        def wrapper(*args, **kwargs):
+            if active_session() is None:
+                return function(*args, **kwargs)
+            with phase(name):
+                return function(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def _frame_name(frame):
+    """Render one stack frame as module:function"""
+    module = frame.f_globals.get('__name__', '?')
+    return f'{module}:{frame.f_code.co_name}'
+
+
+class ProfileSession:
+    """Phase timings and stack samples for one request on one thread"""
+
+    def __init__(self, label, interval=0.001):
+        """Initialize a session; call start() on the request thread"""
+        self.label = label
+        self.interval = interval
+        self.thread_id = threading.get_ident()
+        self.samples = Counter()
+        self.phase_totals = Counter()
+        self._phases = []
+        self._stop = threading.Event()
+        self._sampler = None
+        self.start_time = None
+        self.duration = 0.0
+
+    def start(self):
+        """Bind to the current thread and start sampling its stack"""
+        _local.session = self
+        self.start_time = time.perf_counter()
+        self._sampler = threading.Thread(target=self._sample_loop, name='request-profiler', daemon=True)
+        self._sampler.start()
+
+    def stop(self):
+        """Stop sampling and unbind from the current thread"""
+        self.duration = time.perf_counter() - self.start_time
+        self._stop.set()
+        self._sampler.join()
+        if active_session() is self:
+            _local.session = None
+
+    def enter(self, name):
+        """Start a phase; nested phases pause the enclosing one"""
+        now = time.perf_counter()
+        if self._phases:
+            outer_name, outer_start = self._phases[-1]
+            self.phase_totals[outer_name] += now - outer_start
+        self._phases.append((name, now))
+
+    def exit(self):
+        """End the innermost phase and resume the enclosing one"""
+        now = time.perf_counter()
+        name, started = self._phases.pop()
+        self.phase_totals[name] += now - started
+        if self._phases:
+            outer_name, _ = self._phases[-1]
+            self._phases[-1] = (outer_name, now)
+
+    def _sample_loop(self):
+        """Record the request thread's stack every interval"""
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            if frame is None:
+                continue
+            stack = []
+            while frame is not None:
+                stack.append(_frame_name(frame))
+                frame = frame.f_back
+            current_phase = self._phases[-1][0] if self._phases else 'dispatch'
+            stack.extend((current_phase, self.label))
+            self.samples[';'.join(reversed(stack))] += 1
+
+    def timings(self):
+        """Seconds per phase, with unattributed time reported as dispatch"""
+        timings = dict(self.phase_totals)
+        timings['dispatch'] = max(self.duration - sum(timings.values()), 0.0)
+        return timings
+
+    def server_timing(self):
+        """Render the Server-Timing header value"""
+        entries = [f'total;dur={self.duration * 1000:.3f}']
+        for name, seconds in sorted(self.timings().items()):
+            entries.append(f'{name};dur={seconds * 1000:.3f}')
+        return ', '.join(entries)
+
+    def folded(self):
+        """Render the samples as folded stacks"""
+        return ''.join(f'{stack} {count}\n' for stack, count in sorted(self.samples.items()))
+
+    def save(self, directory):
+        """Write the folded stacks and return the file name"""
+        os.makedirs(directory, exist_ok=True)
+        slug = re.sub(r'[^A-Za-z0-9]+', '_', self.label).strip('_')
+        filename = f"{datetime.utcnow().strftime('%Y%m%dT%H%M%S%f')}-{slug}.folded"
+        with open(os.path.join(directory, filename), 'w') as handle:
+            handle.write(self.folded())
+        return filename
+
+
+def _before_boto_call(model=None, **kwargs):
+    """botocore before-parameter-build hook: open a phase for this DynamoDB operation"""
+    session = active_session()
+    if session is not None:
+        session.enter(f'dynamodb.{model.name}')
+
+
+def _after_boto_call(**kwargs):
+    """botocore after-call(-error) hook: close the DynamoDB operation phase"""
+    session = active_session()
+    if session is not None and session._phases and session._phases[-1][0].startswith('dynamodb.'):
+        session.exit()
+
+
+def instrument_boto_client(client):
+    """Time every call made through a boto3 client as a dynamodb.* phase"""
+    client.meta.events.register('before-parameter-build.dynamodb', _before_boto_call)
+    client.meta.events.register('after-call.dynamodb', _after_boto_call)
+    client.meta.events.register('after-call-error.dynamodb', _after_boto_call)
+
+
+def instrument_json(app):
+    """Time the app's JSON encoding as the json phase"""
+    provider = app.json
+    dumps = provider.dumps
+
+    @functools.wraps(dumps)
+    def timed_dumps(obj, **kwargs):
+        if active_session() is None:
+            return dumps(obj, **kwargs)
+        with phase('json'):
+            return dumps(obj, **kwargs)
+    provider.dumps = timed_dumps
+
+
+def init_app(app):
+    """Enable X-Profile handling on a Flask app
+
+    Only called when PROFILING_ENABLED is set, so a default deployment
+    registers no hooks at all. The header must carry PROFILING_TOKEN; with
+    no token set profiling stays off, since any client could otherwise make
+    the server sample its stacks and write files. Returns True if enabled.
+    boto3 clients are timed only once passed to instrument_boto_client.
+    """
+    from flask import g, request
+
+    token = app.config['PROFILING_TOKEN']
+    if not token:
+        app.logger.warning("PROFILING_ENABLED is set without PROFILING_TOKEN; profiling stays off")
+        return False
+    output_dir = app.config['PROFILING_OUTPUT_DIR']
+    interval = app.config['PROFILING_SAMPLE_INTERVAL_MS'] / 1000.0
+
+    instrument_json(app)
+
+    @app.before_request
+    def _start_profile():
+        value = request.headers.get(PROFILE_HEADER)
+        if not value or not hmac.compare_digest(value.encode(), token.encode()):
+            return
+        route = request.url_rule.rule if request.url_rule else request.path
+        g.profile = ProfileSession(f'{request.method} {route}', interval=interval)
+        g.profile.start()
+
+    @app.after_request
+    def _finish_profile(response):
+        session = g.pop('profile', None)
+        if session is None:
+            return response
+        session.stop()
+        response.headers['Server-Timing'] = session.server_timing()
+        try:
+            response.headers['X-Profile-File'] = session.save(output_dir)
+        except OSError as e:
+            app.logger.error(f"Could not save profile: {str(e)}")
+        return response
+
+    @app.teardown_request
+    def _abandon_profile(error=None):
+        session = g.pop('profile', None)
+        if session is not None:
+            session.stop()
+
+    return True
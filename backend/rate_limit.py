@@ -0,0 +1,146 @@
+"""
+Per-gate admission control for Vehicle Pass Registration System
+
+Each client (gate id + IP address) gets two token buckets, one for read
+routes and one for write routes. The gate id is whatever the caller sends,
+so every IP address also gets one bucket shared by all of its gates; a
+client rotating X-Gate-ID values cannot go past it. A request that finds
+a bucket empty is answered with 429 before the view runs, so it never
+reaches DynamoDB.
+"""
+from collections import OrderedDict
+import math
+import threading
+import time
+
+BUDGET_READ = 'read'
+BUDGET_WRITE = 'write'
+BUDGET_IP = 'ip'
+
+GATE_HEADER = 'X-Gate-ID'
+
+# POST routes that only read the table
+READ_ONLY_POST_ROUTES = {'/api/verify'}
+
+# Routes never throttled: probes, scrapes and long-lived streams
+EXEMPT_ROUTES = {'/health', '/metrics', '/api/events'}
+
+
+def budget_for(method, route):
+    """Classify a request as read, write, or None when it is not limited"""
+    if method == 'OPTIONS' or route in EXEMPT_ROUTES:
+        return None
+    if method in ('GET', 'HEAD') or route in READ_ONLY_POST_ROUTES:
+        return BUDGET_READ
+    return BUDGET_WRITE
+
+
+def client_key(gate_id, remote_addr):
+    """Bucket key for a client; gates without an id share one per IP"""
+    return f"{gate_id or '-'}@{remote_addr or '-'}"
+
+
+def ip_key(remote_addr):
+    """Bucket key shared by every gate behind one IP address"""
+    return remote_addr or '-'
+
+
+def throttled_result(retry_after):
+    """Response body, status and headers for a throttled request"""
+    seconds = max(1, math.ceil(retry_after))
+    return (
+        {'error': 'Too many requests', 'retry_after': seconds},
+        429,
+        {'Retry-After': str(seconds)}
+    )
+
+
+class TokenBucketLimiter:
+    """Token buckets for many keys, refilled at a fixed rate
+
+    Buckets for idle keys are dropped least recently used first once more
+    than max_keys are tracked; a dropped key starts again with a full burst.
+    """
+
+    def __init__(self, rate_per_second, burst, max_keys=10000):
+        """Initialize an empty set of buckets"""
+        self.rate = rate_per_second
+        self.burst = burst
+        self.max_keys = max_keys
+        self._buckets = OrderedDict()  # key -> [tokens, updated_at]
+        self._lock = threading.Lock()
+
+        self.allowed = 0
+        self.throttled = 0
+
+    def acquire(self, key):
+        """Take one token for key; return 0 or the seconds until one is available"""
+        now = time.monotonic()
+        with self._lock:
+            bucket = self._buckets.get(key)
+            if bucket is None:
+                bucket = self._buckets[key] = [float(self.burst), now]
+                while len(self._buckets) > self.max_keys:
+                    self._buckets.popitem(last=False)
+            else:
+                self._buckets.move_to_end(key)
+                bucket[0] = min(self.burst, bucket[0] + (now - bucket[1]) * self.rate)
+                bucket[1] = now
+
+            if bucket[0] >= 1:
+                bucket[0] -= 1
+                self.allowed += 1
+                return 0.0
+            self.throttled += 1
+            return (1 - bucket[0]) / self.rate
+
+    def stats(self):
+        """Return limiter counters"""
+        with self._lock:
+            return {
+                'rate_per_second': self.rate,
+                'burst': self.burst,
+                'clients': len(self._buckets),
+                'allowed': self.allowed,
+                'throttled': self.throttled
+            }
+
+
+class GateRateLimiter:
+    """Separate read and write budgets per client, under one budget per IP address
+
+    The IP budget covers every limited route and is checked first, so a
+    gate bucket is only created once the IP has a token to spend; rotating
+    gate ids neither earns fresh bursts nor evicts other gates' buckets
+    faster than the IP rate. A budget with a rate of 0 is not limited.
+    """
+
+    def __init__(self, read_per_minute, read_burst, write_per_minute, write_burst,
+                 ip_per_minute=0, ip_burst=0, max_clients=10000):
+        """Initialize the read, write and per-IP limiters"""
+        self.limiters = {}
+        if read_per_minute > 0:
+            self.limiters[BUDGET_READ] = TokenBucketLimiter(read_per_minute / 60.0, read_burst, max_clients)
+        if write_per_minute > 0:
+            self.limiters[BUDGET_WRITE] = TokenBucketLimiter(write_per_minute / 60.0, write_burst, max_clients)
+        if ip_per_minute > 0:
+            self.limiters[BUDGET_IP] = TokenBucketLimiter(ip_per_minute / 60.0, ip_burst, max_clients)
+
+    def check(self, method, route, gate_id, remote_addr):
+        """Admit a request; return 0 or the seconds the client should wait"""
+        budget = budget_for(method, route)
+        if budget is None:
+            return 0.0
+        per_ip = self.limiters.get(BUDGET_IP)
+        if per_ip is not None:
+            retry_after = per_ip.acquire(ip_key(remote_addr))
+            if retry_after:
+                return retry_after
+        limiter = self.limiters.get(budget)
+        if limiter is None:
+            return 0.0
+        return limiter.acquire(client_key(gate_id, remote_addr))
+
+    def stats(self):
+        """Return counters for each budget"""
+        return {budget: limiter.stats() for budget, limiter in self.limiters.items()}
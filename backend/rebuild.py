@@ -0,0 +1,149 @@
+"""
+Shared vehicle scan for Vehicle Pass Registration System
+
+The search index, plate index, plate filter and stats reconcile each need
+every vehicle now and then. One background thread scans the table once for
+all of them that are due, reading the union of the attributes they need,
+and hands each the same vehicles, so a process never runs more than one
+full scan at a time.
+"""
+import threading
+import time
+import logging
+
+from botocore.exceptions import ClientError
+
+logger = logging.getLogger(__name__)
+
+
+class ScanRebuilt:
+    """Rebuild from a scan for an in-memory index that apply() keeps current
+
+    Writes applied between scan_started() and the swap are replayed onto
+    the new index, so none are lost. Subclasses hold self._lock and
+    self._changes, call self._record(before, after) with the lock held from
+    apply(), and implement _build(vehicles), returning a fresh index, and
+    _install(fresh, changes), which replays changes onto it and swaps it in
+    (lock held).
+    """
+
+    def _record(self, before, after):
+        """Keep a write for replay while a scan runs (lock held)"""
+        if self._changes is not None:
+            self._changes.append((before, after))
+
+    def scan_started(self):
+        """Start keeping writes to replay; call before the scan reads anything"""
+        with self._lock:
+            self._changes = []
+        self._scan_started_at = time.perf_counter()
+
+    def scan_finished(self, vehicles):
+        """Replace the index with one built from the scanned vehicles"""
+        try:
+            fresh = self._build(vehicles)
+        except BaseException:
+            self.scan_failed()
+            raise
+
+        with self._lock:
+            self._install(fresh, self._changes)
+            self._changes = None
+            self.rebuilt_at = time.time()
+            self.rebuild_seconds = time.perf_counter() - self._scan_started_at
+
+    def scan_failed(self):
+        """Stop keeping writes after a scan that did not finish"""
+        with self._lock:
+            self._changes = None
+
+    def rebuild(self, vehicles):
+        """Replace the index with one built from an iterable of vehicles"""
+        self.scan_started()
+        self.scan_finished(vehicles)
+
+
+class ScanJob:
+    """One consumer of the shared scan and how often it needs one
+
+    target has scan_started(), scan_finished(vehicles) and scan_failed().
+    An interval of 0 or less runs the job once, at startup.
+    """
+
+    def __init__(self, name, target, attributes, interval_seconds):
+        """Initialize a job that has not run yet"""
+        self.name = name
+        self.target = target
+        self.attributes = attributes
+        self.interval_seconds = interval_seconds
+        self.last_run = None
+
+    def next_run(self):
+        """time.monotonic() value the job is next due at, or None once a run-once job has run"""
+        if self.last_run is None:
+            return 0.0
+        if self.interval_seconds <= 0:
+            return None
+        return self.last_run + self.interval_seconds
+
+
+def scan_for(jobs, db):
+    """Scan the table once and feed the vehicles to every job"""
+    started = []
+    for job in jobs:
+        try:
+            job.target.scan_started()
+            started.append(job)
+        except Exception as e:
+            logger.error(f"Could not start the {job.name} rebuild: {str(e)}")
+    if not started:
+        return
+
+    scan_started = time.perf_counter()
+    attributes = sorted({attribute for job in started for attribute in job.attributes})
+    try:
+        # Every job walks the vehicles on its own, so they are read into memory once
+        vehicles = list(db.iter_vehicles(attributes=attributes))
+    except BaseException:
+        for job in started:
+            job.target.scan_failed()
+        raise
+    logger.info(
+        f"Scanned {len(vehicles)} vehicles for {', '.join(job.name for job in started)} "
+        f"in {time.perf_counter() - scan_started:.2f}s"
+    )
+
+    for job in started:
+        try:
+            job.target.scan_finished(vehicles)
+        except ClientError as e:
+            logger.error(f"{job.name} rebuild error: {str(e)}")
+        except Exception as e:
+            logger.error(f"Unexpected {job.name} rebuild error: {str(e)}")
+
+
+def start_rebuilder(jobs, db):
+    """Run every job now, then rescan whenever one of them is due"""
+
+    def run():
+        while True:
+            now = time.monotonic()
+            due = [job for job in jobs if job.next_run() is not None and job.next_run() <= now]
+            try:
+                scan_for(due, db)
+            except ClientError as e:
+                logger.error(f"Vehicle scan error: {str(e)}")
+            except Exception as e:
+                logger.error(f"Unexpected vehicle scan error: {str(e)}")
+            # A failed scan is retried at each job's next interval, as a successful one would be
+            for job in due:
+                job.last_run = now
+
+            upcoming = [job.next_run() for job in jobs if job.next_run() is not None]
+            if not upcoming:
+                return
+            time.sleep(max(0.0, min(upcoming) - time.monotonic()))
+
+    thread = threading.Thread(target=run, name='vehicle-scanner', daemon=True)
+    thread.start()
+    return thread
@@ -0,0 +1,105 @@
+"""
+Response bodies shared by the Flask and ASGI servers
+
+Each helper returns a (body, status_code) tuple so both servers answer the
+gate-facing routes with exactly the same shapes.
+"""
+from backend.database import ACCESS_GRANTED, ACCESS_NOT_REGISTERED, ACCESS_NO_PASSES, ACCESS_KEY_REUSED
+
+PLATE_REQUIRED = ({'error': 'Plate number is required'}, 400)
+VEHICLE_NOT_FOUND = ({'error': 'Vehicle not found'}, 404)
+INTERNAL_ERROR = ({'error': 'Internal server error'}, 500)
+DEDUCT_FAILED = ({'error': 'Failed to deduct pass'}, 500)
+INVALID_IDEMPOTENCY_KEY = ({'error': 'Idempotency-Key must be 1-128 printable ASCII characters'}, 400)
+IDEMPOTENCY_KEY_REUSED = ({'error': 'Idempotency-Key was already used for another vehicle'}, 422)
+
+IDEMPOTENCY_HEADER = 'Idempotency-Key'
+REPLAYED_HEADER = 'Idempotent-Replayed'
+
+
+def normalize_plate(plate_number):
+    """Normalize a plate number the way it is stored"""
+    return (plate_number or '').upper().replace(' ', '')
+
+
+def not_registered_result():
+    """Response for a plate with no registration"""
+    return {
+        'authorized': False,
+        'message': 'Vehicle not registered'
+    }, 200
+
+
+def no_passes_result(vehicle):
+    """Response for a registered vehicle with no passes left"""
+    return {
+        'authorized': False,
+        'message': 'No remaining passes',
+        'name': vehicle.get('name'),
+        'remaining_passes': 0
+    }, 200
+
+
+def granted_result(vehicle):
+    """Response for an authorized vehicle"""
+    return {
+        'authorized': True,
+        'message': 'Access granted',
+        'name': vehicle.get('name'),
+        'remaining_passes': vehicle.get('remaining_passes'),
+        'car_type': vehicle.get('car_type')
+    }, 200
+
+
+def verify_result(vehicle):
+    """Response for /api/verify given the vehicle read from the database"""
+    if not vehicle:
+        return not_registered_result()
+    if vehicle.get('remaining_passes', 0) <= 0:
+        return no_passes_result(vehicle)
+    return granted_result(vehicle)
+
+
+def access_result(outcome, vehicle):
+    """Response for /api/access given the outcome of the conditional write"""
+    if outcome == ACCESS_KEY_REUSED:
+        return IDEMPOTENCY_KEY_REUSED
+    if outcome == ACCESS_NOT_REGISTERED:
+        return not_registered_result()
+    if outcome == ACCESS_NO_PASSES:
+        return no_passes_result(vehicle)
+    if outcome != ACCESS_GRANTED:
+        return {'error': 'Failed to process access'}, 500
+    # remaining_passes already reflects this entry
+    return granted_result(vehicle)
+
+
+def deduct_result(updated_vehicle):
+    """Response for a successful /api/deduct-pass"""
+    return {
+        'message': 'Pass deducted successfully',
+        'remaining_passes': updated_vehicle.get('remaining_passes')
+    }, 200
+
+
+def deduct_once_result(outcome, vehicle):
+    """Response for an idempotent /api/deduct-pass given the access outcome"""
+    if outcome == ACCESS_KEY_REUSED:
+        return IDEMPOTENCY_KEY_REUSED
+    if outcome == ACCESS_NOT_REGISTERED:
+        return VEHICLE_NOT_FOUND
+    if outcome != ACCESS_GRANTED:
+        return DEDUCT_FAILED
+    return deduct_result(vehicle)
+
+
+def replay_headers(replayed):
+    """Headers marking a response as the stored answer to an earlier request"""
+    return {REPLAYED_HEADER: 'true'} if replayed else None
+
+
+def vehicle_result(vehicle):
+    """Response for /api/vehicle/<plate_number>"""
+    if not vehicle:
+        return VEHICLE_NOT_FOUND
+    return {'data': vehicle}, 200
@@ -0,0 +1,227 @@
+"""
+Throughput and utilization rollups for Vehicle Pass Registration System
+
+Gate decisions are counted into hourly and daily buckets per gate, for all
+gates together, and per vehicle (passes used per day). Counts are summed in
+memory and flushed every few seconds as one atomic ADD per touched bucket,
+so DynamoDB sees a handful of writes per flush however busy the gates are,
+and several backend processes can flush into the same buckets safely.
+Reading a range costs one Query over its buckets, never a scan of events.
+"""
+from collections import Counter
+from datetime import datetime, timedelta
+import atexit
+import logging
+import threading
+
+from backend.access_log import ACTION_VERIFY, ACTION_DEDUCT, ACTION_ACCESS
+from backend.database import ACCESS_GRANTED, ACCESS_NO_PASSES, ACCESS_NOT_REGISTERED
+
+logger = logging.getLogger(__name__)
+
+GRANULARITY_HOUR = 'hour'
+GRANULARITY_DAY = 'day'
+
+# Bucket formats; both sort lexically in time order
+BUCKET_FORMATS = {
+    GRANULARITY_HOUR: '%Y-%m-%dT%H',
+    GRANULARITY_DAY: '%Y-%m-%d'
+}
+BUCKET_STEPS = {
+    GRANULARITY_HOUR: timedelta(hours=1),
+    GRANULARITY_DAY: timedelta(days=1)
+}
+
+# Largest range one analytics request may cover, in buckets
+MAX_BUCKETS = {
+    GRANULARITY_HOUR: 24 * 31,
+    GRANULARITY_DAY: 366
+}
+
+ALL_GATES = 'all'
+
+# Counted fields
+FIELD_ENTRIES = 'entries'
+FIELD_DENIED = 'denied'
+FIELD_PASSES_USED = 'passes_used'
+
+
+def gate_series(gate_id, granularity):
+    """Series key for one gate (or ALL_GATES) at a granularity"""
+    return f'gate#{gate_id}#{granularity}'
+
+
+def vehicle_series(plate_number):
+    """Series key for a vehicle's daily pass usage"""
+    return f'vehicle#{plate_number}#{GRANULARITY_DAY}'
+
+
+def bucket_for(moment, granularity):
+    """Bucket key holding a datetime"""
+    return moment.strftime(BUCKET_FORMATS[granularity])
+
+
+def bucket_range(granularity, start, end):
+    """Every bucket key from start to end inclusive"""
+    step = BUCKET_STEPS[granularity]
+    moment = datetime.strptime(bucket_for(start, granularity), BUCKET_FORMATS[granularity])
+    buckets = []
+    while moment <= end:
+        buckets.append(bucket_for(moment, granularity))
+        moment += step
+    return buckets
+
+
+def event_counts(event):
+    """Map an access event to the fields it increments"""
+    if event.get('replayed'):
+        return {}
+    action, outcome = event['action'], event['outcome']
+    if outcome == ACCESS_GRANTED and action in (ACTION_DEDUCT, ACTION_ACCESS):
+        return {FIELD_ENTRIES: 1}
+    # Legacy gates verify first and only call deduct when authorized, so
+    # their refusals show up on verify
+    if outcome in (ACCESS_NO_PASSES, ACCESS_NOT_REGISTERED) and action in (ACTION_VERIFY, ACTION_ACCESS):
+        return {FIELD_DENIED: 1}
+    return {}
+
+
+class RollupAggregator:
+    """Coalesces rollup increments in memory and flushes them periodically"""
+
+    def __init__(self, db, flush_seconds=5.0):
+        """Initialize with no pending counts; call start() to begin flushing"""
+        self.db = db
+        self.flush_seconds = flush_seconds
+        self._pending = Counter()  # (series, bucket, field) -> count
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+
+        self.flushes = 0
+        self.bucket_writes = 0
+        self.failed_writes = 0
+
+    def record(self, event):
+        """Count an access event into its hour and day buckets"""
+        counts = event_counts(event)
+        if not counts:
+            return
+        moment = datetime.fromisoformat(event['occurred_at'])
+        hour = bucket_for(moment, GRANULARITY_HOUR)
+        day = bucket_for(moment, GRANULARITY_DAY)
+        with self._lock:
+            for field, amount in counts.items():
+                for gate_id in (event['gate_id'], ALL_GATES):
+                    self._pending[(gate_series(gate_id, GRANULARITY_HOUR), hour, field)] += amount
+                    self._pending[(gate_series(gate_id, GRANULARITY_DAY), day, field)] += amount
+            if FIELD_ENTRIES in counts:
+                self._pending[(vehicle_series(event['plate_number']), day, FIELD_PASSES_USED)] += counts[FIELD_ENTRIES]
+
+    def start(self):
+        """Start the flush thread and flush what is left at interpreter exit"""
+        # A thread inherited across a fork is not running; start a new one
+        if self.flush_seconds <= 0 or (self._thread is not None and self._thread.is_alive()):
+            return
+        self._thread = threading.Thread(target=self._run, name='rollup-flusher', daemon=True)
+        self._thread.start()
+        atexit.register(self.flush)
+
+    def flush(self):
+        """Write pending counts, one atomic ADD per (series, bucket)"""
+        with self._lock:
+            pending, self._pending = self._pending, Counter()
+        if not pending:
+            return
+
+        by_bucket = {}
+        for (series, bucket, field), amount in pending.items():
+            by_bucket.setdefault((series, bucket), {})[field] = amount
+
+        # Counts not yet written go back to pending for the next flush, even
+        # if the loop is cut short, rather than being lost
+        failed = Counter(pending)
+        try:
+            for (series, bucket), counts in by_bucket.items():
+                try:
+                    written = self.db.add_rollup_counts(series, bucket, counts)
+                except Exception as e:
+                    logger.error(f"Rollup write error for {series} {bucket}: {str(e)}")
+                    written = False
+                if written:
+                    self.bucket_writes += 1
+                    for field in counts:
+                        del failed[(series, bucket, field)]
+                else:
+                    self.failed_writes += 1
+        finally:
+            with self._lock:
+                self._pending.update(failed)
+                self.flushes += 1
+
+    def stats(self):
+        """Return aggregator counters"""
+        with self._lock:
+            return {
+                'pending': len(self._pending),
+                'flushes': self.flushes,
+                'bucket_writes': self.bucket_writes,
+                'failed_writes': self.failed_writes
+            }
+
+    def _run(self):
+        """Flush every flush_seconds"""
+        while not self._stop.wait(self.flush_seconds):
+            try:
+                self.flush()
+            except Exception as e:
+                logger.error(f"Rollup flush error: {str(e)}")
+
+
+def fill_series(items, buckets, fields):
+    """One row per bucket, with zeros for buckets that have no item"""
+    by_bucket = {item['bucket']: item for item in items}
+    rows = []
+    for bucket in buckets:
+        item = by_bucket.get(bucket, {})
+        row = {'bucket': bucket}
+        for field in fields:
+            row[field] = int(item.get(field, 0))
+        rows.append(row)
+    return rows
+
+
+def peak_hours(rows, top=5):
+    """Busiest hours and the average entries for each hour of the day"""
+    by_hour_of_day = Counter()
+    days_by_hour = Counter()
+    for row in rows:
+        hour_of_day = int(row['bucket'][11:13])
+        by_hour_of_day[hour_of_day] += row[FIELD_ENTRIES]
+        days_by_hour[hour_of_day] += 1
+    busiest = sorted(rows, key=lambda row: row[FIELD_ENTRIES], reverse=True)[:top]
+    return {
+        'busiest': [row for row in busiest if row[FIELD_ENTRIES] > 0],
+        'hour_of_day_average': [
+            {
+                'hour': hour,
+                'entries': round(by_hour_of_day[hour] / days_by_hour[hour], 2) if days_by_hour[hour] else 0
+            }
+            for hour in range(24)
+        ]
+    }
+
+
+def burn_down(rows, remaining_passes):
+    """Daily pass usage with the days left at the average rate over the range"""
+    used = sum(row[FIELD_PASSES_USED] for row in rows)
+    daily_average = used / len(rows) if rows else 0
+    if remaining_passes is not None:
+        remaining_passes = int(remaining_passes)
+    return {
+        'daily': rows,
+        'passes_used': used,
+        'daily_average': round(daily_average, 3),
+        'remaining_passes': remaining_passes,
+        'days_left': round(remaining_passes / daily_average, 1) if daily_average and remaining_passes is not None else None
+    }
@@ -0,0 +1,259 @@
+"""
+Vehicle search index for Vehicle Pass Registration System
+
+Finds vehicles from part of a plate, name or email without touching the
+database. Prefixes and word prefixes are ranges of sorted lists; other
+substrings of 3 or more characters go through a trigram index. Matches
+common enough that ranking them all would cost milliseconds are instead
+taken from a list kept in rank order, so a search costs microseconds
+either way at fleet sizes the admin UI deals with.
+"""
+import bisect
+import heapq
+import re
+import threading
+
+from backend.rebuild import ScanRebuilt
+from backend.responses import normalize_plate
+
+# Indexed fields, best first when ranking equally good matches
+SEARCH_FIELDS = ('plate_number', 'name', 'email')
+
+# Attributes a rebuild scan needs to read
+SEARCH_ATTRIBUTES = list(SEARCH_FIELDS)
+
+# Length of the substrings in the trigram index
+GRAM_SIZE = 3
+
+# Match kinds, best first
+MATCH_EXACT = 0
+MATCH_PREFIX = 1
+MATCH_WORD_PREFIX = 2
+MATCH_SUBSTRING = 3
+
+_WORD_SPLIT = re.compile(r'[^A-Za-z0-9]+')
+
+
+def normalize_field(field, value):
+    """The form a field is indexed and matched in"""
+    if field == 'plate_number':
+        return normalize_plate(value)
+    return (value or '').strip().lower()
+
+
+def grams(text):
+    """Every GRAM_SIZE-character substring of text"""
+    return {text[i:i + GRAM_SIZE] for i in range(len(text) - GRAM_SIZE + 1)}
+
+
+class SearchIndex(ScanRebuilt):
+    """In-memory index over plate_number, name and email
+
+    apply() updates it on every vehicle write, so it answers without a
+    database call. rebuild() replaces it from a full scan; writes applied
+    while the scan runs are replayed onto the new index, so none are lost.
+    """
+
+    def __init__(self):
+        """Initialize an empty index; ready is False until the first rebuild"""
+        self._lock = threading.Lock()
+        self._docs = {}                                          # plate_number -> {field: normalized}
+        self._display = {}                                       # plate_number -> stored field values
+        self._values = {field: {} for field in SEARCH_FIELDS}    # field -> plate_number -> normalized
+        self._words = {field: {} for field in SEARCH_FIELDS}     # field -> plate_number -> ' word word'
+        self._grams = {field: {} for field in SEARCH_FIELDS}     # field -> gram -> set of plates
+        self._sorted = {field: [] for field in SEARCH_FIELDS}    # field -> sorted (normalized, plate)
+        self._ranked = {field: [] for field in SEARCH_FIELDS}    # field -> sorted (len(normalized), plate)
+        self._word_sorted = {field: [] for field in SEARCH_FIELDS}  # field -> sorted (word, plate)
+        self._changes = None                                     # writes seen during a rebuild, or None
+        self.ready = False
+        self.rebuilt_at = None
+        self.rebuild_seconds = None
+        self.searches = 0
+
+    def apply(self, before, after):
+        """Apply a vehicle write; before is None for a create, after is None for a delete
+
+        Writes that leave every indexed field unchanged (pass deductions,
+        status changes) return without taking the lock.
+        """
+        if before and after and all(before.get(f) == after.get(f) for f in SEARCH_FIELDS):
+            return
+        with self._lock:
+            self._record(before, after)
+            self._apply(before, after)
+
+    def _apply(self, before, after):
+        """Remove before and add after (lock held)"""
+        if before:
+            self._remove(before['plate_number'])
+        if after:
+            self._add(after)
+
+    def _add(self, vehicle, keep_sorted=True):
+        """Index one vehicle, replacing any entry for its plate (lock held)
+
+        keep_sorted=False appends to the prefix lists; the caller sorts them.
+        """
+        plate_number = vehicle['plate_number']
+        if plate_number in self._docs:
+            self._remove(plate_number)
+        doc = {field: normalize_field(field, vehicle.get(field)) for field in SEARCH_FIELDS}
+        self._docs[plate_number] = doc
+        self._display[plate_number] = {field: vehicle.get(field) for field in SEARCH_FIELDS}
+        for field, value in doc.items():
+            self._values[field][plate_number] = value
+            # A leading space before every word: ' ' + q in it means q starts a word
+            self._words[field][plate_number] = ' ' + _WORD_SPLIT.sub(' ', value)
+            postings = self._grams[field]
+            for gram in grams(value):
+                postings.setdefault(gram, set()).add(plate_number)
+            for entries, entry in self._entries(field, value, plate_number):
+                if keep_sorted:
+                    bisect.insort(entries, entry)
+                else:
+                    entries.append(entry)
+
+    def _remove(self, plate_number):
+        """Drop one plate from every structure (lock held)"""
+        doc = self._docs.pop(plate_number, None)
+        if doc is None:
+            return
+        del self._display[plate_number]
+        for field, value in doc.items():
+            del self._values[field][plate_number]
+            del self._words[field][plate_number]
+            postings = self._grams[field]
+            for gram in grams(value):
+                plates = postings.get(gram)
+                if plates is not None:
+                    plates.discard(plate_number)
+                    if not plates:
+                        del postings[gram]
+            for entries, entry in self._entries(field, value, plate_number):
+                index = bisect.bisect_left(entries, entry)
+                if index < len(entries) and entries[index] == entry:
+                    del entries[index]
+
+    def _entries(self, field, value, plate_number):
+        """(sorted list, entry) pairs that index one field value"""
+        yield self._sorted[field], (value, plate_number)
+        yield self._ranked[field], (len(value), plate_number)
+        for word in set(_WORD_SPLIT.split(value)):
+            if word:
+                yield self._word_sorted[field], (word, plate_number)
+
+    def _build(self, vehicles):
+        """A new index holding an iterable of vehicles"""
+        fresh = SearchIndex()
+        for vehicle in vehicles:
+            if vehicle.get('plate_number') and vehicle['plate_number'] not in fresh._docs:
+                fresh._add(vehicle, keep_sorted=False)
+        for entries in (*fresh._sorted.values(), *fresh._ranked.values(), *fresh._word_sorted.values()):
+            entries.sort()
+        return fresh
+
+    def _install(self, fresh, changes):
+        """Replay changes onto fresh and take its structures (lock held)"""
+        for before, after in changes:
+            fresh._apply(before, after)
+        self._docs, self._display = fresh._docs, fresh._display
+        self._values, self._words = fresh._values, fresh._words
+        self._grams, self._sorted, self._ranked = fresh._grams, fresh._sorted, fresh._ranked
+        self._word_sorted = fresh._word_sorted
+        self.ready = True
+
+    def search(self, query, limit=20):
+        """Return up to limit ranked matches for query
+
+        Each match has the vehicle's plate_number, name and email, and the
+        field that matched best. Exact matches rank before prefixes, then
+        word prefixes, then other substrings; within each, plate beats name
+        beats email, and shorter values come first. Tiers are collected in
+        that order and the search stops at the first one that fills the
+        limit. Queries shorter than GRAM_SIZE match prefixes only.
+        """
+        queries = {field: normalize_field(field, query) for field in SEARCH_FIELDS}
+        matches, seen = [], set()
+        with self._lock:
+            self.searches += 1
+            for kind in (MATCH_EXACT, MATCH_PREFIX, MATCH_WORD_PREFIX, MATCH_SUBSTRING):
+                for field in SEARCH_FIELDS:
+                    q = queries[field]
+                    if not q or (kind >= MATCH_WORD_PREFIX and len(q) < GRAM_SIZE):
+                        continue
+                    tier = self._best(field, q, kind, limit - len(matches), seen)
+                    seen.update(tier)
+                    matches.extend((plate_number, field) for plate_number in tier)
+                    if len(matches) >= limit:
+                        return self._results(matches)
+            return self._results(matches)
+
+    def _results(self, matches):
+        """Display values for (plate_number, field) matches (lock held)"""
+        return [dict(self._display[plate_number], match=field) for plate_number, field in matches]
+
+    def _best(self, field, q, kind, count, seen):
+        """The count best unseen plates whose field matches q as kind (lock held)
+
+        A narrow match ranks its candidates. A broad one ("smith", "gmail")
+        would rank thousands, so it walks the field in rank order instead
+        and stops after count hits, which come quickly when most match.
+        """
+        values, words = self._values[field], self._words[field]
+        if kind == MATCH_EXACT:
+            entries, span = self._sorted[field], self._span(self._sorted[field], q, exact=True)
+            test = lambda plate_number: values[plate_number] == q
+        elif kind == MATCH_PREFIX:
+            entries, span = self._sorted[field], self._span(self._sorted[field], q)
+            test = lambda plate_number: values[plate_number].startswith(q)
+        elif kind == MATCH_WORD_PREFIX:
+            entries, span = self._word_sorted[field], self._span(self._word_sorted[field], q)
+            needle = ' ' + q
+            test = lambda plate_number: needle in words[plate_number]
+        else:
+            # Every plate containing q has its rarest trigram, but not the reverse
+            postings = self._grams[field]
+            entries, span = None, min((postings.get(gram, ()) for gram in grams(q)), key=len)
+            test = lambda plate_number: q in values[plate_number]
+        size = len(span) if entries is None else span[1] - span[0]
+
+        if size ** 2 > count * len(values):
+            found = []
+            for _, plate_number in self._ranked[field]:
+                if plate_number not in seen and test(plate_number):
+                    found.append(plate_number)
+                    if len(found) == count:
+                        break
+            return found
+
+        if entries is None:
+            candidates = [plate_number for plate_number in span if test(plate_number)]
+        else:
+            # A value with two words starting with q has two word entries
+            candidates = {plate_number for _, plate_number in entries[span[0]:span[1]]}
+        return heapq.nsmallest(
+            count,
+            (plate_number for plate_number in candidates if plate_number not in seen),
+            key=lambda plate_number: (len(values[plate_number]), plate_number)
+        )
+
+    @staticmethod
+    def _span(entries, q, exact=False):
+        """(start, end) of the sorted (value, plate) entries whose value starts with q, or equals it"""
+        start = bisect.bisect_left(entries, (q, ''))
+        # Appending a character sorts after every value equal to q, or starting with it
+        end = bisect.bisect_left(entries, (q + ('\x00' if exact else '\uffff'), ''), start)
+        return start, end
+
+    def stats(self):
+        """Return index counters"""
+        with self._lock:
+            return {
+                'ready': self.ready,
+                'vehicles': len(self._docs),
+                'grams': sum(len(postings) for postings in self._grams.values()),
+                'searches': self.searches,
+                'rebuilt_at': self.rebuilt_at,
+                'rebuild_seconds': self.rebuild_seconds
+            }
@@ -0,0 +1,620 @@
+"""
+SQLite storage for Vehicle Pass Registration System
+
+Keeps every table in one local database file so an on-prem site runs with
+no network dependency at all. The semantics match DynamoDBManager: the same
+return values, the same conditional decrement, the same cursor format.
+
+Each thread gets its own connection, opened in WAL mode so readers never
+wait for the writer. Every statement is a fixed SQL string with bound
+parameters, so sqlite3 compiles it once per connection and reuses the
+prepared statement from its statement cache afterwards.
+"""
+from contextlib import contextmanager
+from decimal import Decimal
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+
+from backend.database import (
+    ACCESS_GRANTED, ACCESS_NOT_REGISTERED, ACCESS_NO_PASSES, ACCESS_ERROR, ACCESS_KEY_REUSED,
+    IDEMPOTENT_RESULT_FIELDS, encode_cursor, decode_cursor
+)
+from backend.metrics import timed_operation
+from backend.storage import VehicleStorage
+
+logger = logging.getLogger(__name__)
+
+# Vehicle fields stored in their own columns; everything else is JSON
+VEHICLE_COLUMNS = ('plate_number', 'status', 'car_type', 'remaining_passes', 'total_passes')
+
+# Seconds a connection waits for the write lock before failing
+BUSY_TIMEOUT_SECONDS = 5.0
+
+# Prepared statements kept per connection
+STATEMENT_CACHE_SIZE = 128
+
+# How often expired idempotency keys and access events are deleted
+PURGE_INTERVAL_SECONDS = 3600
+
+# Upper bound for an open-ended remaining_passes range (SQLite's largest integer)
+MAX_PASSES_BOUND = 2 ** 63 - 1
+
+# Host parameters per IN (...) lookup
+EXISTING_PLATES_CHUNK = 500
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS vehicles (
+    plate_number TEXT PRIMARY KEY,
+    status TEXT,
+    car_type TEXT,
+    remaining_passes INTEGER NOT NULL DEFAULT 0,
+    total_passes INTEGER NOT NULL DEFAULT 0,
+    attributes TEXT NOT NULL
+) WITHOUT ROWID;
+-- The same lookups as the DynamoDB status-passes-index and email-index
+CREATE INDEX IF NOT EXISTS vehicles_status_passes ON vehicles (status, remaining_passes, plate_number);
+CREATE INDEX IF NOT EXISTS vehicles_email ON vehicles (json_extract(attributes, '$.email'));
+
+CREATE TABLE IF NOT EXISTS idempotency_keys (
+    idempotency_key TEXT PRIMARY KEY,
+    plate_number TEXT NOT NULL,
+    outcome TEXT NOT NULL,
+    vehicle TEXT NOT NULL,
+    created_at INTEGER NOT NULL,
+    expires_at INTEGER NOT NULL
+) WITHOUT ROWID;
+
+CREATE TABLE IF NOT EXISTS access_events (
+    plate_number TEXT NOT NULL,
+    event_id TEXT NOT NULL,
+    day TEXT NOT NULL,
+    expires_at INTEGER,
+    event TEXT NOT NULL,
+    PRIMARY KEY (plate_number, event_id)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS access_events_day ON access_events (day, event_id, plate_number);
+CREATE INDEX IF NOT EXISTS access_events_expiry ON access_events (expires_at);
+
+CREATE TABLE IF NOT EXISTS rollups (
+    series TEXT NOT NULL,
+    bucket TEXT NOT NULL,
+    field TEXT NOT NULL,
+    value INTEGER NOT NULL,
+    PRIMARY KEY (series, bucket, field)
+) WITHOUT ROWID;
+"""
+
+SELECT_VEHICLES = 'SELECT plate_number, status, car_type, remaining_passes, total_passes, attributes FROM vehicles'
+SELECT_VEHICLE = SELECT_VEHICLES + ' WHERE plate_number = ?'
+INSERT_VEHICLE = (
+    'INSERT INTO vehicles (plate_number, status, car_type, remaining_passes, total_passes, attributes) '
+    'VALUES (?, ?, ?, ?, ?, ?)'
+)
+INSERT_NEW_VEHICLE = (
+    'INSERT OR IGNORE INTO vehicles (plate_number, status, car_type, remaining_passes, total_passes, attributes) '
+    'VALUES (?, ?, ?, ?, ?, ?)'
+)
+DEDUCT_PASS = (
+    'UPDATE vehicles SET remaining_passes = remaining_passes - 1 '
+    'WHERE plate_number = ? AND remaining_passes > 0'
+)
+ADD_PASSES = (
+    'UPDATE vehicles SET remaining_passes = remaining_passes + ?, total_passes = total_passes + ? '
+    'WHERE plate_number = ?'
+)
+UPDATE_STATUS = 'UPDATE vehicles SET status = ? WHERE plate_number = ?'
+DELETE_VEHICLE = 'DELETE FROM vehicles WHERE plate_number = ?'
+# Seeks vehicles_status_passes straight to the first row after (remaining_passes, plate_number)
+SELECT_VEHICLES_BY_STATUS = SELECT_VEHICLES + (
+    ' WHERE status = ? AND (remaining_passes, plate_number) > (?, ?) AND remaining_passes <= ?'
+    ' ORDER BY remaining_passes, plate_number LIMIT ?'
+)
+# Must repeat the vehicles_email expression exactly for the index to be used
+SELECT_VEHICLES_BY_EMAIL = SELECT_VEHICLES + " WHERE json_extract(attributes, '$.email') = ? ORDER BY plate_number"
+
+SELECT_IDEMPOTENCY_KEY = (
+    'SELECT plate_number, outcome, vehicle FROM idempotency_keys '
+    'WHERE idempotency_key = ? AND expires_at > ?'
+)
+REPLACE_IDEMPOTENCY_KEY = (
+    'INSERT OR REPLACE INTO idempotency_keys '
+    '(idempotency_key, plate_number, outcome, vehicle, created_at, expires_at) VALUES (?, ?, ?, ?, ?, ?)'
+)
+
+REPLACE_ACCESS_EVENT = (
+    'INSERT OR REPLACE INTO access_events (plate_number, event_id, day, expires_at, event) '
+    'VALUES (?, ?, ?, ?, ?)'
+)
+
+ADD_ROLLUP = (
+    'INSERT INTO rollups (series, bucket, field, value) VALUES (?, ?, ?, ?) '
+    'ON CONFLICT (series, bucket, field) DO UPDATE SET value = value + excluded.value'
+)
+SELECT_ROLLUP_FIELD = 'SELECT value FROM rollups WHERE series = ? AND bucket = ? AND field = ?'
+SELECT_ROLLUPS = (
+    'SELECT bucket, field, value FROM rollups '
+    'WHERE series = ? AND bucket BETWEEN ? AND ? ORDER BY bucket'
+)
+
+PURGE_IDEMPOTENCY_KEYS = 'DELETE FROM idempotency_keys WHERE expires_at <= ?'
+PURGE_ACCESS_EVENTS = 'DELETE FROM access_events WHERE expires_at IS NOT NULL AND expires_at <= ?'
+
+
+def _json_default(value):
+    """Encode the Decimals DynamoDB-shaped items carry"""
+    if isinstance(value, Decimal):
+        return int(value) if value == value.to_integral_value() else float(value)
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
+def _dumps(value):
+    """Compact JSON for a stored column"""
+    return json.dumps(value, separators=(',', ':'), default=_json_default)
+
+
+def vehicle_row(vehicle):
+    """Split a vehicle item into column values plus a JSON document of the rest"""
+    attributes = {k: v for k, v in vehicle.items() if k not in VEHICLE_COLUMNS}
+    return (
+        vehicle['plate_number'],
+        vehicle.get('status'),
+        vehicle.get('car_type'),
+        int(vehicle.get('remaining_passes') or 0),
+        int(vehicle.get('total_passes') or 0),
+        _dumps(attributes)
+    )
+
+
+def row_vehicle(row):
+    """Rebuild the vehicle item from a vehicles row"""
+    vehicle = json.loads(row['attributes'])
+    for column in VEHICLE_COLUMNS:
+        if row[column] is not None:
+            vehicle[column] = row[column]
+    return vehicle
+
+
+def build_filter_clause(filters):
+    """SQL conditions and parameters for status, car_type and pass range filters"""
+    conditions, params = [], []
+    filters = filters or {}
+    if filters.get('status'):
+        conditions.append('status = ?')
+        params.append(filters['status'])
+    if filters.get('car_type'):
+        conditions.append('car_type = ?')
+        params.append(filters['car_type'])
+    if filters.get('min_passes') is not None:
+        conditions.append('remaining_passes >= ?')
+        params.append(int(filters['min_passes']))
+    if filters.get('max_passes') is not None:
+        conditions.append('remaining_passes <= ?')
+        params.append(int(filters['max_passes']))
+    return conditions, params
+
+
+class SQLiteManager(VehicleStorage):
+    """Manages SQLite operations for vehicle registration
+
+    path must be a file; every thread opens its own connection to it, so an
+    in-memory database would not be shared between threads.
+    """
+
+    def __init__(self, path, idempotency_ttl_seconds=86400):
+        """Initialize for a database file; connections are opened on first use"""
+        self.path = path
+        self.idempotency_ttl_seconds = idempotency_ttl_seconds
+        self._local = threading.local()
+        self._last_purge = 0.0
+
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+
+    def _connection(self):
+        """This thread's connection, opened in WAL mode on first use"""
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            # isolation_level=None: autocommit, with explicit BEGIN for transactions
+            conn = sqlite3.connect(
+                self.path,
+                timeout=BUSY_TIMEOUT_SECONDS,
+                isolation_level=None,
+                cached_statements=STATEMENT_CACHE_SIZE
+            )
+            conn.row_factory = sqlite3.Row
+            conn.execute('PRAGMA journal_mode=WAL')
+            # WAL keeps the database consistent on power loss; NORMAL only risks
+            # the last few commits, and saves an fsync per write
+            conn.execute('PRAGMA synchronous=NORMAL')
+            self._local.conn = conn
+        return conn
+
+    def reconnect(self):
+        """Forget the connections of the parent process; each thread opens a new one
+
+        A SQLite connection must not be used across a fork, so the inherited
+        ones are dropped without being closed.
+        """
+        self._local = threading.local()
+
+    @contextmanager
+    def _transaction(self):
+        """Run statements under the write lock, committing only if all succeed"""
+        conn = self._connection()
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            yield conn
+        except BaseException:
+            conn.execute('ROLLBACK')
+            raise
+        conn.execute('COMMIT')
+
+    @timed_operation
+    def create_tables(self):
+        """Create the schema if it doesn't exist"""
+        try:
+            self._connection().executescript(SCHEMA)
+            self.purge_expired()
+            logger.info(f"SQLite database {self.path} ready")
+            return True
+        except sqlite3.Error as e:
+            logger.error(f"Error creating tables: {str(e)}")
+            return False
+
+    def purge_expired(self):
+        """Delete idempotency keys and access events past their expires_at"""
+        now = int(time.time())
+        self._last_purge = time.monotonic()
+        with self._transaction() as conn:
+            keys = conn.execute(PURGE_IDEMPOTENCY_KEYS, (now,)).rowcount
+            events = conn.execute(PURGE_ACCESS_EVENTS, (now,)).rowcount
+        if keys or events:
+            logger.info(f"Purged {keys} expired idempotency keys and {events} access events")
+
+    @timed_operation
+    def create_vehicle(self, vehicle_data):
+        """Create a new vehicle registration"""
+        try:
+            self._connection().execute(INSERT_VEHICLE, vehicle_row(vehicle_data))
+            logger.info(f"Vehicle {vehicle_data['plate_number']} created successfully")
+            return True
+        except sqlite3.IntegrityError:
+            logger.warning(f"Vehicle {vehicle_data['plate_number']} already exists")
+            return False
+        except sqlite3.Error as e:
+            logger.error(f"Error creating vehicle: {str(e)}")
+            return False
+
+    @timed_operation
+    def get_vehicle(self, plate_number):
+        """Get vehicle by plate number"""
+        try:
+            row = self._connection().execute(SELECT_VEHICLE, (plate_number,)).fetchone()
+            return row_vehicle(row) if row else None
+        except sqlite3.Error as e:
+            logger.error(f"Error getting vehicle: {str(e)}")
+            return None
+
+    @timed_operation
+    def deduct_pass(self, plate_number):
+        """Deduct one pass from vehicle"""
+        try:
+            if self._connection().execute(DEDUCT_PASS, (plate_number,)).rowcount:
+                logger.info(f"Pass deducted for vehicle {plate_number}")
+                return True
+            logger.warning(f"No remaining passes for vehicle {plate_number}")
+            return False
+        except sqlite3.Error as e:
+            logger.error(f"Error deducting pass: {str(e)}")
+            return False
+
+    @timed_operation
+    def access_vehicle(self, plate_number):
+        """Authorize an entry and deduct one pass in a single transaction
+
+        Returns a tuple of (outcome, vehicle) like DynamoDBManager.access_vehicle.
+        """
+        try:
+            with self._transaction() as conn:
+                granted = conn.execute(DEDUCT_PASS, (plate_number,)).rowcount
+                row = conn.execute(SELECT_VEHICLE, (plate_number,)).fetchone()
+        except sqlite3.Error as e:
+            logger.error(f"Error processing access: {str(e)}")
+            return ACCESS_ERROR, None
+
+        if granted:
+            logger.info(f"Access granted and pass deducted for vehicle {plate_number}")
+            return ACCESS_GRANTED, row_vehicle(row)
+        if row is None:
+            return ACCESS_NOT_REGISTERED, None
+        logger.warning(f"No remaining passes for vehicle {plate_number}")
+        return ACCESS_NO_PASSES, row_vehicle(row)
+
+    @timed_operation
+    def access_vehicle_once(self, plate_number, idempotency_key, vehicle=None):
+        """Authorize an entry and deduct one pass at most once per idempotency key
+
+        The key lookup, the decrement and the key write share one transaction,
+        so vehicle (a pre-read item, used by DynamoDBManager to skip a read)
+        is not needed and is ignored. Returns a tuple of (outcome, vehicle,
+        replayed).
+        """
+        now = int(time.time())
+        try:
+            with self._transaction() as conn:
+                record = conn.execute(SELECT_IDEMPOTENCY_KEY, (idempotency_key, now)).fetchone()
+                if record is not None:
+                    if record['plate_number'] != plate_number:
+                        logger.warning(f"Idempotency key reused for vehicle {plate_number}")
+                        return ACCESS_KEY_REUSED, None, True
+                    logger.info(f"Replayed idempotent access for vehicle {plate_number}")
+                    return record['outcome'], json.loads(record['vehicle']), True
+
+                row = conn.execute(SELECT_VEHICLE, (plate_number,)).fetchone()
+                if row is None:
+                    return ACCESS_NOT_REGISTERED, None, False
+                current = row_vehicle(row)
+                if current['remaining_passes'] <= 0:
+                    logger.warning(f"No remaining passes for vehicle {plate_number}")
+                    return ACCESS_NO_PASSES, current, False
+
+                conn.execute(DEDUCT_PASS, (plate_number,))
+                updated = dict(current, remaining_passes=current['remaining_passes'] - 1)
+                # An expired key is replaced, as DynamoDB's TTL would have deleted it
+                conn.execute(REPLACE_IDEMPOTENCY_KEY, (
+                    idempotency_key, plate_number, ACCESS_GRANTED,
+                    _dumps({k: updated.get(k) for k in IDEMPOTENT_RESULT_FIELDS}),
+                    now, now + self.idempotency_ttl_seconds
+                ))
+        except sqlite3.Error as e:
+            logger.error(f"Error processing access: {str(e)}")
+            return ACCESS_ERROR, None, False
+
+        logger.info(f"Access granted and pass deducted for vehicle {plate_number}")
+        return ACCESS_GRANTED, updated, False
+
+    @timed_operation
+    def add_passes(self, plate_number, passes_to_add):
+        """Add passes to vehicle"""
+        try:
+            amount = int(passes_to_add)
+            if self._connection().execute(ADD_PASSES, (amount, amount, plate_number)).rowcount:
+                logger.info(f"Added {passes_to_add} passes to vehicle {plate_number}")
+                return True
+            logger.error(f"Error adding passes: vehicle {plate_number} does not exist")
+            return False
+        except sqlite3.Error as e:
+            logger.error(f"Error adding passes: {str(e)}")
+            return False
+
+    @timed_operation
+    def update_vehicle_status(self, plate_number, status):
+        """Update vehicle status (active, suspended, etc.)"""
+        try:
+            self._connection().execute(UPDATE_STATUS, (status, plate_number))
+            logger.info(f"Status updated for vehicle {plate_number}")
+            return True
+        except sqlite3.Error as e:
+            logger.error(f"Error updating status: {str(e)}")
+            return False
+
+    @timed_operation
+    def delete_vehicle(self, plate_number):
+        """Delete a vehicle registration"""
+        try:
+            self._connection().execute(DELETE_VEHICLE, (plate_number,))
+            logger.info(f"Vehicle {plate_number} deleted successfully")
+            return True
+        except sqlite3.Error as e:
+            logger.error(f"Error deleting vehicle: {str(e)}")
+            return False
+
+    @timed_operation
+    def list_all_vehicles(self):
+        """List all vehicles"""
+        try:
+            return list(self.iter_vehicles())
+        except sqlite3.Error as e:
+            logger.error(f"Error listing vehicles: {str(e)}")
+            return []
+
+    def iter_vehicles(self, filters=None, attributes=None):
+        """Yield every vehicle in plate order, fetching rows in chunks
+
+        attributes limits the item fields returned. Errors are raised to the
+        caller.
+        """
+        conditions, params = build_filter_clause(filters)
+        sql = SELECT_VEHICLES
+        if conditions:
+            sql += ' WHERE ' + ' AND '.join(conditions)
+        cursor = self._connection().execute(sql + ' ORDER BY plate_number', params)
+        while True:
+            rows = cursor.fetchmany(500)
+            if not rows:
+                return
+            for row in rows:
+                vehicle = row_vehicle(row)
+                if attributes:
+                    vehicle = {k: vehicle[k] for k in attributes if k in vehicle}
+                yield vehicle
+
+    @timed_operation
+    def list_vehicles_page(self, limit=100, cursor=None, filters=None):
+        """List one page of vehicles in plate order, optionally filtered
+
+        Returns a tuple of (vehicles, next_cursor); next_cursor is None on the
+        last page. Raises ValueError for a cursor that was not produced here.
+        """
+        conditions, params = build_filter_clause(filters)
+        if cursor:
+            start_key = decode_cursor(cursor)
+            if not isinstance(start_key.get('plate_number'), str):
+                raise ValueError("Invalid cursor")
+            conditions.insert(0, 'plate_number > ?')
+            params.insert(0, start_key['plate_number'])
+
+        sql = SELECT_VEHICLES
+        if conditions:
+            sql += ' WHERE ' + ' AND '.join(conditions)
+        # One extra row tells whether another page exists
+        rows = self._connection().execute(sql + ' ORDER BY plate_number LIMIT ?', params + [limit + 1]).fetchall()
+        vehicles = [row_vehicle(row) for row in rows[:limit]]
+        next_cursor = encode_cursor({'plate_number': vehicles[-1]['plate_number']}) if len(rows) > limit else None
+        return vehicles, next_cursor
+
+    @timed_operation
+    def query_vehicles_by_status(self, status, min_passes=None, max_passes=None, limit=100, cursor=None):
+        """List vehicles with one status, fewest remaining passes first, then by plate
+
+        Reads only the rows it returns through the vehicles_status_passes
+        index. Returns a tuple of (vehicles, next_cursor). Raises ValueError
+        for a cursor that was not produced for this status.
+        """
+        # Every plate sorts after '', so (min_passes, '') starts at the first match
+        after = (min_passes if min_passes is not None else 0, '')
+        if cursor:
+            start_key = decode_cursor(cursor)
+            if (start_key.get('status') != status or not isinstance(start_key.get('plate_number'), str)
+                    or not isinstance(start_key.get('remaining_passes'), Decimal)):
+                raise ValueError("Invalid cursor")
+            after = max(after, (int(start_key['remaining_passes']), start_key['plate_number']))
+
+        high = max_passes if max_passes is not None else MAX_PASSES_BOUND
+        rows = self._connection().execute(
+            SELECT_VEHICLES_BY_STATUS, (status, after[0], after[1], high, limit + 1)
+        ).fetchall()
+        vehicles = [row_vehicle(row) for row in rows[:limit]]
+        next_cursor = None
+        if len(rows) > limit:
+            last = vehicles[-1]
+            next_cursor = encode_cursor({
+                'status': status, 'remaining_passes': last['remaining_passes'], 'plate_number': last['plate_number']
+            })
+        return vehicles, next_cursor
+
+    @timed_operation
+    def query_vehicles_by_email(self, email):
+        """List every vehicle registered with an email (exact match), in plate order"""
+        return [row_vehicle(row) for row in self._connection().execute(SELECT_VEHICLES_BY_EMAIL, (email,))]
+
+    @timed_operation
+    def get_existing_plates(self, plate_numbers):
+        """Return the subset of plate numbers that are already registered"""
+        existing = set()
+        plate_numbers = list(plate_numbers)
+        conn = self._connection()
+        for start in range(0, len(plate_numbers), EXISTING_PLATES_CHUNK):
+            chunk = plate_numbers[start:start + EXISTING_PLATES_CHUNK]
+            placeholders = ', '.join('?' * len(chunk))
+            rows = conn.execute(f'SELECT plate_number FROM vehicles WHERE plate_number IN ({placeholders})', chunk)
+            existing.update(row['plate_number'] for row in rows)
+        return existing
+
+    @timed_operation
+    def batch_create_vehicles(self, vehicles):
+        """Write many new vehicles in one transaction, skipping plates already registered
+
+        Returns the set of plate numbers that were skipped.
+        """
+        existing = set()
+        with self._transaction() as conn:
+            for vehicle in vehicles:
+                if conn.execute(INSERT_NEW_VEHICLE, vehicle_row(vehicle)).rowcount == 0:
+                    existing.add(vehicle['plate_number'])
+        logger.info(f"Batch created {len(vehicles) - len(existing)} vehicles")
+        return existing
+
+    @timed_operation
+    def batch_write_access_events(self, events):
+        """Write access events in one transaction"""
+        with self._transaction() as conn:
+            conn.executemany(REPLACE_ACCESS_EVENT, (
+                (event['plate_number'], event['event_id'], event['day'], event.get('expires_at'), _dumps(event))
+                for event in events
+            ))
+        if time.monotonic() - self._last_purge > PURGE_INTERVAL_SECONDS:
+            self.purge_expired()
+        return True
+
+    @timed_operation
+    def query_access_events(self, plate_number=None, day=None, limit=50, cursor=None, since=None, until=None):
+        """Query access events for one vehicle or one day, newest first
+
+        Exactly one of plate_number and day must be given. Returns a tuple of
+        (events, next_cursor). Raises ValueError for a cursor that was not
+        produced here.
+        """
+        if day is not None:
+            conditions, params = ['day = ?'], [day]
+        else:
+            conditions, params = ['plate_number = ?'], [plate_number]
+        # event_id starts with the timestamp; '~' sorts after the '#suffix'
+        if since:
+            conditions.append('event_id >= ?')
+            params.append(since)
+        if until:
+            conditions.append('event_id <= ?')
+            params.append(until + '~')
+        conditions.append('(expires_at IS NULL OR expires_at > ?)')
+        params.append(int(time.time()))
+        if cursor:
+            start_key = decode_cursor(cursor)
+            if not isinstance(start_key.get('event_id'), str) or not isinstance(start_key.get('plate_number'), str):
+                raise ValueError("Invalid cursor")
+            conditions.append('(event_id, plate_number) < (?, ?)')
+            params.extend([start_key['event_id'], start_key['plate_number']])
+
+        sql = (
+            'SELECT event FROM access_events WHERE ' + ' AND '.join(conditions)
+            + ' ORDER BY event_id DESC, plate_number DESC LIMIT ?'
+        )
+        try:
+            rows = self._connection().execute(sql, params + [limit + 1]).fetchall()
+        except sqlite3.Error as e:
+            logger.error(f"Error querying access events: {str(e)}")
+            raise
+        events = [json.loads(row['event']) for row in rows[:limit]]
+        next_cursor = None
+        if len(rows) > limit:
+            last = events[-1]
+            next_cursor = encode_cursor({'plate_number': last['plate_number'], 'event_id': last['event_id']})
+        return events, next_cursor
+
+    @timed_operation
+    def add_rollup_counts(self, series, bucket, counts, expected=None):
+        """Atomically add counts ({field: amount}) to one rollup bucket
+
+        With expected ({field: value}) the add only happens while the bucket
+        holds those values. Returns the bucket after the add, or None if the
+        condition failed or the write failed.
+        """
+        try:
+            with self._transaction() as conn:
+                for field, value in (expected or {}).items():
+                    row = conn.execute(SELECT_ROLLUP_FIELD, (series, bucket, field)).fetchone()
+                    if row is None or row['value'] != value:
+                        return None
+                conn.executemany(ADD_ROLLUP, (
+                    (series, bucket, field, int(amount)) for field, amount in counts.items()
+                ))
+                rows = conn.execute(SELECT_ROLLUPS, (series, bucket, bucket)).fetchall()
+            item = {'series': series, 'bucket': bucket}
+            item.update((row['field'], row['value']) for row in rows)
+            return item
+        except sqlite3.Error as e:
+            logger.error(f"Error updating rollup {series} {bucket}: {str(e)}")
+            return None
+
+    @timed_operation
+    def query_rollups(self, series, first_bucket, last_bucket):
+        """Return every stored bucket of a series between two bucket keys, oldest first"""
+        items = {}
+        for row in self._connection().execute(SELECT_ROLLUPS, (series, first_bucket, last_bucket)):
+            item = items.setdefault(row['bucket'], {'series': series, 'bucket': row['bucket']})
+            item[row['field']] = row['value']
+        return list(items.values())
@@ -0,0 +1,168 @@
+"""
+Fleet statistics for Vehicle Pass Registration System
+"""
+from collections import Counter
+from datetime import datetime
+import time
+import logging
+
+from backend.versioning import VERSION_SERIES, VERSION_BUCKET, VERSION_FIELD
+
+logger = logging.getLogger(__name__)
+
+# Vehicles at or below this many remaining passes count as "low"
+LOW_PASSES_THRESHOLD = 2
+
+# Attributes a reconcile scan needs to read
+STATS_ATTRIBUTES = ['plate_number', 'remaining_passes', 'car_type', 'status']
+
+PASS_BUCKETS = ('active', 'low', 'empty')
+
+# Fields of the fleet bucket (shared with the change version)
+FIELD_TOTAL = 'total'
+PASSES_PREFIX = 'passes:'
+CAR_TYPE_PREFIX = 'car_type:'
+STATUS_PREFIX = 'status:'
+FIELD_RECONCILES = 'reconciles'
+FIELD_RECONCILED_AT = 'reconciled_at'
+FIELD_LAST_DRIFT = 'last_drift'
+
+
+def pass_bucket(remaining_passes):
+    """Classify a pass balance the same way the admin dashboard does"""
+    remaining_passes = remaining_passes or 0
+    if remaining_passes <= 0:
+        return 'empty'
+    if remaining_passes <= LOW_PASSES_THRESHOLD:
+        return 'low'
+    return 'active'
+
+
+def count_changes(changes):
+    """Counter deltas for (before, after) vehicle writes
+
+    before is None for a create and after is None for a delete.
+    """
+    counts = Counter()
+    for before, after in changes:
+        for vehicle, delta in ((before, -1), (after, 1)):
+            if vehicle:
+                counts[FIELD_TOTAL] += delta
+                counts[PASSES_PREFIX + pass_bucket(vehicle.get('remaining_passes'))] += delta
+                if vehicle.get('car_type'):
+                    counts[CAR_TYPE_PREFIX + vehicle['car_type']] += delta
+                if vehicle.get('status'):
+                    counts[STATUS_PREFIX + vehicle['status']] += delta
+    return {field: amount for field, amount in counts.items() if amount}
+
+
+def _is_count_field(field):
+    """True for the bucket fields count_changes maintains"""
+    return field == FIELD_TOTAL or field.startswith((PASSES_PREFIX, CAR_TYPE_PREFIX, STATUS_PREFIX))
+
+
+class FleetStats:
+    """Dashboard counters kept in storage and moved by the write paths
+
+    The counters live in the rollups bucket that holds the change version,
+    and add() moves them in the same atomic ADD that bumps it, so every
+    worker, host and the bulk import command update one shared set of
+    counts and reading them is a single GetItem. reconcile() replaces them
+    with counts from a full scan to correct drift from writes whose counter
+    update failed or that bypassed the backend.
+    """
+
+    def __init__(self, db):
+        """Initialize around the storage holding the counters"""
+        self.db = db
+        self._scan_base = None   # the bucket as read when the running scan started
+
+    def apply(self, before, after):
+        """Count one vehicle write; before is None for a create, after is None for a delete"""
+        return self.add(count_changes([(before, after)]))
+
+    def add(self, counts):
+        """Add count_changes() deltas and bump the change version in one write
+
+        Returns the bucket after the add, or None if it could not be stored.
+        """
+        return self.db.add_rollup_counts(VERSION_SERIES, VERSION_BUCKET, dict(counts, **{VERSION_FIELD: 1}))
+
+    def reconcile(self, vehicles):
+        """Set the counters to counts of an iterable of vehicles and return the drift found
+
+        The correction is an ADD of the difference, conditional on the
+        version read before the scan, so it is dropped (and None returned)
+        when any write, or another process's reconcile, landed meanwhile;
+        the next interval tries again.
+        """
+        self.scan_started()
+        return self._correct(self._scan_base, vehicles)
+
+    def scan_started(self):
+        """Read the counters and version a shared scan will be compared with"""
+        stored = self.db.get_rollup(VERSION_SERIES, VERSION_BUCKET)
+        if not stored or VERSION_FIELD not in stored:
+            stored = self.db.add_rollup_counts(VERSION_SERIES, VERSION_BUCKET, {VERSION_FIELD: 0})
+        self._scan_base = stored
+
+    def scan_finished(self, vehicles):
+        """Reconcile from the vehicles of a shared scan"""
+        drift = self._correct(self._scan_base, vehicles)
+        if drift is None:
+            logger.info("Stats reconcile skipped: the counters changed during the scan or could not be read")
+        elif drift:
+            logger.warning(f"Stats reconcile corrected drift of {drift}")
+
+    def scan_failed(self):
+        """Forget the counters read for a scan that did not finish"""
+        self._scan_base = None
+
+    def _correct(self, stored, vehicles):
+        """Bring the counters from stored to the counts of vehicles; see reconcile()"""
+        if stored is None:
+            return None
+        scanned = count_changes((None, vehicle) for vehicle in vehicles)
+
+        fields = set(scanned) | {field for field in stored if _is_count_field(field)}
+        deltas = {field: scanned.get(field, 0) - int(stored.get(field, 0)) for field in fields}
+        # The first reconcile seeds the counters, so it has no drift to report
+        drift = 0
+        if int(stored.get(FIELD_RECONCILES, 0)):
+            drift = sum(
+                abs(deltas.get(field, 0))
+                for field in (FIELD_TOTAL, *(PASSES_PREFIX + bucket for bucket in PASS_BUCKETS))
+            )
+        # Under the version condition these ADDs set the fields to exact values
+        deltas = {field: amount for field, amount in deltas.items() if amount}
+        deltas.update({
+            VERSION_FIELD: 1,
+            FIELD_RECONCILES: 1,
+            FIELD_RECONCILED_AT: int(time.time()) - int(stored.get(FIELD_RECONCILED_AT, 0)),
+            FIELD_LAST_DRIFT: drift - int(stored.get(FIELD_LAST_DRIFT, 0))
+        })
+        expected = {VERSION_FIELD: stored[VERSION_FIELD]}
+        if self.db.add_rollup_counts(VERSION_SERIES, VERSION_BUCKET, deltas, expected=expected) is None:
+            return None
+        return drift
+
+    def snapshot(self, item=None):
+        """Return the current counts, from a bucket add() returned or read from storage"""
+        if item is None:
+            item = self.db.get_rollup(VERSION_SERIES, VERSION_BUCKET) or {}
+        by_car_type = {}
+        by_status = {}
+        for field, value in item.items():
+            if field.startswith(CAR_TYPE_PREFIX) and int(value) > 0:
+                by_car_type[field[len(CAR_TYPE_PREFIX):]] = int(value)
+            elif field.startswith(STATUS_PREFIX) and int(value) > 0:
+                by_status[field[len(STATUS_PREFIX):]] = int(value)
+        reconciled_at = int(item.get(FIELD_RECONCILED_AT, 0))
+        return {
+            'total': int(item.get(FIELD_TOTAL, 0)),
+            **{bucket: int(item.get(PASSES_PREFIX + bucket, 0)) for bucket in PASS_BUCKETS},
+            'by_car_type': by_car_type,
+            'by_status': by_status,
+            'reconciled_at': datetime.utcfromtimestamp(reconciled_at).isoformat() if reconciled_at else None,
+            'last_drift': int(item.get(FIELD_LAST_DRIFT, 0))
+        }
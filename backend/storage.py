@@ -0,0 +1,162 @@
+"""
+Storage interface for Vehicle Pass Registration System
+
+VehicleStorage is the set of operations the app, cache, bulk import, access
+log and rollups call on a database manager. DynamoDBManager implements it
+against AWS; SQLiteManager implements it against a local file for sites
+that must keep working without an uplink; MemoryManager keeps everything in
+process for tests and load tests. create_storage picks one from the
+STORAGE_BACKEND setting.
+"""
+from abc import ABC, abstractmethod
+
+STORAGE_DYNAMODB = 'dynamodb'
+STORAGE_SQLITE = 'sqlite'
+STORAGE_MEMORY = 'memory'
+
+STORAGE_BACKENDS = (STORAGE_DYNAMODB, STORAGE_SQLITE, STORAGE_MEMORY)
+
+
+class VehicleStorage(ABC):
+    """Operations every storage backend provides, with DynamoDB's semantics
+
+    Write methods return False instead of raising when the write is refused
+    (duplicate plate, no passes left, missing vehicle) or fails. Outcome
+    constants (ACCESS_GRANTED and friends) live in backend.database.
+    """
+
+    @abstractmethod
+    def create_tables(self):
+        """Create every table or schema object the backend needs; return success"""
+
+    @abstractmethod
+    def create_vehicle(self, vehicle_data):
+        """Store a new vehicle; False if the plate is already registered"""
+
+    @abstractmethod
+    def get_vehicle(self, plate_number):
+        """Return the vehicle item, or None"""
+
+    @abstractmethod
+    def deduct_pass(self, plate_number):
+        """Take one pass only if remaining_passes > 0; False otherwise"""
+
+    @abstractmethod
+    def access_vehicle(self, plate_number):
+        """Check and deduct in one atomic step; return (outcome, vehicle)"""
+
+    @abstractmethod
+    def access_vehicle_once(self, plate_number, idempotency_key, vehicle=None):
+        """access_vehicle at most once per key; return (outcome, vehicle, replayed)"""
+
+    @abstractmethod
+    def add_passes(self, plate_number, passes_to_add):
+        """Add to remaining_passes and total_passes of an existing vehicle"""
+
+    @abstractmethod
+    def update_vehicle_status(self, plate_number, status):
+        """Set a vehicle's status"""
+
+    @abstractmethod
+    def delete_vehicle(self, plate_number):
+        """Delete a vehicle; deleting an unknown plate is not an error"""
+
+    @abstractmethod
+    def iter_vehicles(self, filters=None, attributes=None):
+        """Yield every vehicle matching filters, limited to attributes if given"""
+
+    @abstractmethod
+    def list_vehicles_page(self, limit=100, cursor=None, filters=None):
+        """Return (vehicles, next_cursor); ValueError for a foreign cursor"""
+
+    @abstractmethod
+    def query_vehicles_by_status(self, status, min_passes=None, max_passes=None, limit=100, cursor=None):
+        """Return (vehicles, next_cursor) with one status, fewest passes first"""
+
+    @abstractmethod
+    def query_vehicles_by_email(self, email):
+        """Return every vehicle registered with exactly this email"""
+
+    @abstractmethod
+    def get_existing_plates(self, plate_numbers):
+        """Return the subset of plate_numbers already registered"""
+
+    @abstractmethod
+    def batch_create_vehicles(self, vehicles):
+        """Store many new vehicles, returning the set of plates skipped as already registered"""
+
+    @abstractmethod
+    def batch_write_access_events(self, events):
+        """Store a batch of access events"""
+
+    @abstractmethod
+    def query_access_events(self, plate_number=None, day=None, limit=50, cursor=None, since=None, until=None):
+        """Return (events, next_cursor) for one vehicle or one day, newest first"""
+
+    @abstractmethod
+    def add_rollup_counts(self, series, bucket, counts, expected=None):
+        """Atomically add {field: amount} to one rollup bucket; return the bucket after the add, or None
+
+        With expected ({field: value}), the add only happens while the
+        bucket holds exactly those values; None is returned when it does not.
+        """
+
+    @abstractmethod
+    def query_rollups(self, series, first_bucket, last_bucket):
+        """Return the stored buckets of a series in a key range, oldest first"""
+
+    def get_rollup(self, series, bucket):
+        """Return one rollup bucket as of the latest write, or None"""
+        items = self.query_rollups(series, bucket, bucket)
+        return items[0] if items else None
+
+    def list_all_vehicles(self):
+        """List all vehicles"""
+        return list(self.iter_vehicles())
+
+    def warm_up(self, connections=4):
+        """Open connections before traffic arrives; local backends have none to open"""
+        return 0
+
+    def reconnect(self):
+        """Drop connections inherited from a parent process; call after a fork"""
+
+
+def create_storage(config):
+    """Build the storage backend named by config['STORAGE_BACKEND']
+
+    Raises ValueError for an unknown backend name.
+    """
+    backend = config['STORAGE_BACKEND']
+    if backend == STORAGE_DYNAMODB:
+        from backend.database import DynamoDBManager
+        return DynamoDBManager(
+            region=config['AWS_REGION'],
+            table_name=config['DYNAMODB_TABLE_NAME'],
+            aws_access_key_id=config['AWS_ACCESS_KEY_ID'],
+            aws_secret_access_key=config['AWS_SECRET_ACCESS_KEY'],
+            idempotency_table_name=config['IDEMPOTENCY_TABLE_NAME'],
+            idempotency_ttl_seconds=int(config['IDEMPOTENCY_TTL_HOURS'] * 3600),
+            access_events_table_name=config['ACCESS_EVENTS_TABLE_NAME'],
+            rollups_table_name=config['ROLLUPS_TABLE_NAME'],
+            endpoint_url=config['DYNAMODB_ENDPOINT_URL'],
+            # One connection per thread that can call DynamoDB at once
+            max_pool_connections=config['DYNAMODB_MAX_POOL_CONNECTIONS'] or config['ASYNC_DB_MAX_CONCURRENCY'],
+            retry_mode=config['DYNAMODB_RETRY_MODE'],
+            max_attempts=config['DYNAMODB_MAX_ATTEMPTS'],
+            connect_timeout=config['DYNAMODB_CONNECT_TIMEOUT_SECONDS'],
+            read_timeout=config['DYNAMODB_READ_TIMEOUT_SECONDS'],
+            gate_max_attempts=config['DYNAMODB_GATE_MAX_ATTEMPTS'],
+            gate_connect_timeout=config['DYNAMODB_GATE_CONNECT_TIMEOUT_SECONDS'],
+            gate_read_timeout=config['DYNAMODB_GATE_READ_TIMEOUT_SECONDS']
+        )
+    if backend == STORAGE_SQLITE:
+        from backend.sqlite_database import SQLiteManager
+        return SQLiteManager(
+            config['SQLITE_PATH'],
+            idempotency_ttl_seconds=int(config['IDEMPOTENCY_TTL_HOURS'] * 3600)
+        )
+    if backend == STORAGE_MEMORY:
+        from backend.memory_database import MemoryManager
+        return MemoryManager(idempotency_ttl_seconds=int(config['IDEMPOTENCY_TTL_HOURS'] * 3600))
+    raise ValueError(f"Unknown STORAGE_BACKEND {backend!r}; use one of {', '.join(STORAGE_BACKENDS)}")
@@ -1,8 +1,14 @@
 """
 Input validation for Vehicle Pass Registration System
 """
+from datetime import date, datetime, time, timezone
 import re
 
+from backend.profiling import profiled_phase
+
+VALID_CAR_TYPES = ['Sedan', 'SUV', 'Hatchback', 'Truck', 'Electric']
+VALID_STATUSES = ['active', 'suspended', 'inactive']
+
 
 def validate_email(email):
     """Validate email format"""
@@ -26,6 +32,7 @@ def validate_plate_number(plate_number):
     return len(cleaned) >= 3 and any(c.isalpha() for c in cleaned) and any(c.isdigit() for c in cleaned)
 
 
+@profiled_phase('validation')
 def validate_registration_data(data):
     """Validate complete registration data"""
     required_fields = ['name', 'plate_number', 'car_type', 'email', 'phone_number', 'passes']
@@ -44,9 +51,8 @@ def validate_registration_data(data):
         return False, "Invalid plate number format"
 
     # Validate car type
-    valid_car_types = ['Sedan', 'SUV', 'Hatchback', 'Truck', 'Electric']
-    if data['car_type'] not in valid_car_types:
-        return False, f"Invalid car type. Must be one of: {', '.join(valid_car_types)}"
+    if data['car_type'] not in VALID_CAR_TYPES:
+        return False, f"Invalid car type. Must be one of: {', '.join(VALID_CAR_TYPES)}"
 
     # Validate email
     if not validate_email(data['email']):
@@ -65,3 +71,105 @@ def validate_registration_data(data):
         return False, "Invalid number of passes"
 
     return True, None
+
+
+def parse_vehicle_filters(args):
+    """Parse status, car_type and remaining-pass range filters from query args"""
+    filters = {}
+
+    status = args.get('status')
+    if status:
+        if status not in VALID_STATUSES:
+            return None, f"Invalid status. Must be one of: {', '.join(VALID_STATUSES)}"
+        filters['status'] = status
+
+    car_type = args.get('car_type')
+    if car_type:
+        if car_type not in VALID_CAR_TYPES:
+            return None, f"Invalid car type. Must be one of: {', '.join(VALID_CAR_TYPES)}"
+        filters['car_type'] = car_type
+
+    pass_range, error_message = parse_pass_range(args)
+    if error_message:
+        return None, error_message
+    filters.update(pass_range)
+
+    return filters, None
+
+
+def parse_pass_range(args):
+    """Parse min_passes and max_passes query args into a dict of the ones given"""
+    pass_range = {}
+    for field in ('min_passes', 'max_passes'):
+        value = args.get(field)
+        if value not in (None, ''):
+            try:
+                pass_range[field] = int(value)
+            except ValueError:
+                return None, f"Invalid {field}"
+            if pass_range[field] < 0:
+                return None, f"Invalid {field}"
+
+    if pass_range.get('min_passes', 0) > pass_range.get('max_passes', float('inf')):
+        return None, "min_passes cannot be greater than max_passes"
+
+    return pass_range, None
+
+
+def parse_page_limit(value, default, maximum):
+    """Parse a page size query argument"""
+    if value in (None, ''):
+        return default, None
+    try:
+        limit = int(value)
+    except ValueError:
+        return None, "Invalid limit"
+    if limit < 1 or limit > maximum:
+        return None, f"limit must be between 1 and {maximum}"
+    return limit, None
+
+
+def _is_date_only(value):
+    """True if an ISO value names a whole day rather than a moment"""
+    try:
+        date.fromisoformat(value)
+    except ValueError:
+        return False
+    return True
+
+
+def parse_time_range(args):
+    """Parse since/until ISO date or datetime query arguments
+
+    Returns (since, until, error) with both bounds as naive UTC isoformat()
+    strings, the form stored timestamps take, so they compare correctly
+    against them whatever ISO form the caller used. A value with a UTC
+    offset is converted to UTC, and a date-only until covers that whole day.
+    """
+    bounds = []
+    for field in ('since', 'until'):
+        value = (args.get(field) or '').strip()
+        parsed = None
+        if value:
+            try:
+                parsed = datetime.fromisoformat(value)
+            except ValueError:
+                return None, None, f"Invalid {field}; use an ISO date or time such as 2025-01-15T08:00"
+            if parsed.tzinfo is not None:
+                parsed = parsed.astimezone(timezone.utc).replace(tzinfo=None)
+            elif field == 'until' and _is_date_only(value):
+                parsed = datetime.combine(parsed.date(), time.max)
+        bounds.append(parsed)
+    since, until = bounds
+    if since and until and since > until:
+        return None, None, "since cannot be after until"
+    return (
+        since.isoformat() if since else None,
+        until.isoformat() if until else None,
+        None
+    )
+
+
+def validate_idempotency_key(key):
+    """Validate an Idempotency-Key header value"""
+    return 0 < len(key) <= 128 and all(33 <= ord(c) <= 126 for c in key)
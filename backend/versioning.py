@@ -0,0 +1,40 @@
+"""
+Table-wide change version for Vehicle Pass Registration System
+"""
+import hashlib
+
+# Rollup bucket holding the version and the fleet counters, shared by
+# every process on the same storage
+VERSION_SERIES = 'fleet'
+VERSION_BUCKET = 'current'
+VERSION_FIELD = 'version'
+
+
+def version_of(item):
+    """The change version held by a fleet bucket, or None for a failed write"""
+    return int(item.get(VERSION_FIELD, 0)) if item is not None else None
+
+
+class ChangeVersion:
+    """Version of the vehicle table, bumped by every write path
+
+    The version is an atomic counter in storage (one bucket of the rollups
+    table), bumped by FleetStats in the same write that moves the dashboard
+    counters, so a write through any worker, host or the bulk import command
+    changes it. Read endpoints derive their ETag from it, so an unchanged
+    poll is answered with 304 after one key read instead of the full query.
+    """
+
+    def __init__(self, db):
+        """Initialize around the storage holding the counter"""
+        self.db = db
+
+    @property
+    def value(self):
+        """Current version number, read from storage"""
+        return version_of(self.db.get_rollup(VERSION_SERIES, VERSION_BUCKET) or {})
+
+    def etag(self, *parts):
+        """Build a strong ETag for the current version and a request-specific key"""
+        key = '|'.join([str(self.value)] + [str(part) for part in parts])
+        return hashlib.sha1(key.encode('utf-8')).hexdigest()
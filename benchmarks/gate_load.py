@@ -0,0 +1,423 @@
+#!/usr/bin/env python3
+"""
+Gate-fleet load generator for the backend API
+
+Simulates N gates, each running the Raspberry Pi's call pattern for every
+vehicle: POST /api/verify, then POST /api/deduct-pass (with an
+Idempotency-Key) when authorized. --pattern access uses the single
+/api/access call instead. Plates are drawn from registered, depleted and
+unknown pools. Reports throughput, p50/p95/p99 latency and error rates per
+route, and saves everything as JSON so runs can be compared.
+
+By default the Flask app is started in this process on the in-memory
+storage backend, so no AWS access is needed. --storage sqlite or dynamodb
+(set DYNAMODB_ENDPOINT_URL for DynamoDB Local) switches the backend; --url
+targets a server that is already running. The in-process server shares
+this interpreter (and its GIL) with the simulated gates, so its absolute
+latencies are pessimistic; use --url against a production-style server
+for capacity numbers, and the in-process mode to compare changes.
+
+Usage:
+    python benchmarks/gate_load.py [--gates 10 50 100] [--duration 30] [--storage memory]
+    python benchmarks/gate_load.py --url http://localhost:5000 --gates 20
+    python benchmarks/gate_load.py --gates 50 --compare benchmarks/results/previous.json
+"""
+from datetime import datetime
+import argparse
+import json
+import os
+import platform
+import random
+import string
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import uuid
+
+import requests
+
+# Add parent directory to path
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(ROOT)
+
+ROUTE_VERIFY = '/api/verify'
+ROUTE_DEDUCT = '/api/deduct-pass'
+ROUTE_ACCESS = '/api/access'
+
+POOL_REGISTERED = 'registered'
+POOL_DEPLETED = 'depleted'
+POOL_UNKNOWN = 'unknown'
+
+# Passes given to registered plates so they never run out during a run
+PLENTY_OF_PASSES = 1000000
+
+
+def random_plate(prefix):
+    """A plate that is vanishingly unlikely to be registered"""
+    return prefix + ''.join(random.choices(string.ascii_uppercase + string.digits, k=6))
+
+
+def percentile(sorted_values, fraction):
+    """Nearest-rank percentile of an already sorted list"""
+    if not sorted_values:
+        return None
+    index = min(len(sorted_values) - 1, max(0, int(round(fraction * len(sorted_values))) - 1))
+    return sorted_values[index]
+
+
+def seed_vehicle(plate_number, passes):
+    """A vehicle item in the shape build_vehicle_record produces"""
+    return {
+        'plate_number': plate_number,
+        'name': 'Load Test',
+        'car_type': 'Sedan',
+        'email': 'load@example.com',
+        'phone_number': '+15550000000',
+        'total_passes': passes,
+        'remaining_passes': passes,
+        'registered_at': datetime.utcnow().isoformat(),
+        'status': 'active'
+    }
+
+
+def start_local_server(storage, workdir, rate_limit=True):
+    """Start the Flask app on an ephemeral port; return (base_url, storage, server)
+
+    Configuration comes from the environment (.env), with STORAGE_BACKEND
+    overridden, so rate limits and caches are whatever a real deployment
+    would use unless rate_limit is False.
+    """
+    os.environ['STORAGE_BACKEND'] = storage
+    if not rate_limit:
+        os.environ['RATE_LIMIT_READ_PER_MINUTE'] = '0'
+        os.environ['RATE_LIMIT_WRITE_PER_MINUTE'] = '0'
+        os.environ['RATE_LIMIT_IP_PER_MINUTE'] = '0'
+    if storage == 'sqlite':
+        os.environ['SQLITE_PATH'] = os.path.join(workdir, 'load.db')
+
+    from werkzeug.serving import make_server
+    from backend.app import create_app, db
+
+    db.create_tables()
+    server = make_server('127.0.0.1', 0, create_app(), threaded=True)
+    threading.Thread(target=server.serve_forever, name='load-server', daemon=True).start()
+    return f'http://127.0.0.1:{server.server_port}', db, server
+
+
+def seed_local(db, prefix, vehicles, depleted):
+    """Write the plate pools straight to storage"""
+    registered = [f'{prefix}R{i:05d}' for i in range(vehicles)]
+    empty = [f'{prefix}D{i:05d}' for i in range(depleted)]
+    db.batch_create_vehicles(
+        [seed_vehicle(p, PLENTY_OF_PASSES) for p in registered] + [seed_vehicle(p, 0) for p in empty]
+    )
+    return registered, empty
+
+
+def seed_remote(base_url, prefix, vehicles, depleted):
+    """Register the plate pools through the public API
+
+    Registration allows 5-10 passes, so registered plates are topped up with
+    add-passes and depleted ones are driven to zero with deduct-pass.
+    Throttled calls wait for Retry-After.
+    """
+    session = requests.Session()
+    session.headers['X-Gate-ID'] = 'loadgen-seed'
+
+    def post(path, body):
+        while True:
+            response = session.post(base_url + path, json=body, timeout=30)
+            if response.status_code != 429:
+                return response
+            time.sleep(float(response.headers.get('Retry-After', 1)))
+
+    registered = [f'{prefix}R{i:05d}' for i in range(vehicles)]
+    empty = [f'{prefix}D{i:05d}' for i in range(depleted)]
+    for plate in registered + empty:
+        response = post('/api/register', {
+            'plate_number': plate, 'name': 'Load Test', 'car_type': 'Sedan',
+            'email': 'load@example.com', 'phone_number': '+15550000000', 'passes': 5
+        })
+        if response.status_code != 201:
+            raise RuntimeError(f"Could not register {plate}: {response.status_code} {response.text}")
+    for plate in registered:
+        post('/api/add-passes', {'plate_number': plate, 'passes': PLENTY_OF_PASSES})
+    for plate in empty:
+        for _ in range(5):
+            post('/api/deduct-pass', {'plate_number': plate})
+    return registered, empty
+
+
+class RouteStats:
+    """Latencies and outcomes of one route, recorded by a single gate"""
+
+    def __init__(self):
+        """Initialize empty"""
+        self.latencies = []
+        self.statuses = {}
+        self.exceptions = 0
+
+    def record(self, seconds, status):
+        """Record one call; status None means no response arrived"""
+        self.latencies.append(seconds)
+        if status is None:
+            self.exceptions += 1
+        else:
+            self.statuses[status] = self.statuses.get(status, 0) + 1
+
+    def merge(self, other):
+        """Fold another gate's stats into this one"""
+        self.latencies.extend(other.latencies)
+        self.exceptions += other.exceptions
+        for status, count in other.statuses.items():
+            self.statuses[status] = self.statuses.get(status, 0) + count
+
+    def summary(self, elapsed):
+        """Throughput, latency percentiles (ms) and error rates"""
+        latencies = sorted(self.latencies)
+        total = len(latencies)
+        server_errors = sum(count for status, count in self.statuses.items() if status >= 500)
+        throttled = self.statuses.get(429, 0)
+        return {
+            'requests': total,
+            'throughput_rps': round(total / elapsed, 2) if elapsed else 0,
+            'p50_ms': round(percentile(latencies, 0.50) * 1000, 2) if total else None,
+            'p95_ms': round(percentile(latencies, 0.95) * 1000, 2) if total else None,
+            'p99_ms': round(percentile(latencies, 0.99) * 1000, 2) if total else None,
+            'max_ms': round(latencies[-1] * 1000, 2) if total else None,
+            'statuses': {str(status): count for status, count in sorted(self.statuses.items())},
+            'exceptions': self.exceptions,
+            'error_rate': round((server_errors + self.exceptions) / total, 4) if total else 0,
+            'throttle_rate': round(throttled / total, 4) if total else 0
+        }
+
+
+class Gate(threading.Thread):
+    """One simulated gate processing vehicles until the run ends"""
+
+    def __init__(self, gate_id, base_url, pools, mix, pattern, interval, timeout, measure_from, stop):
+        """Initialize with the shared plate pools and run timing"""
+        super().__init__(name=gate_id, daemon=True)
+        self.base_url = base_url
+        self.pools = pools
+        self.mix = mix
+        self.pattern = pattern
+        self.interval = interval
+        self.timeout = timeout
+        self.measure_from = measure_from
+        self.stop = stop
+        self.session = requests.Session()
+        self.session.headers['X-Gate-ID'] = gate_id
+        self.routes = {}
+        self.vehicles = 0
+        self.decisions = {}
+
+    def run(self):
+        """Process vehicles, arriving every interval seconds on average"""
+        while not self.stop.is_set():
+            pool = random.choices((POOL_REGISTERED, POOL_DEPLETED, POOL_UNKNOWN), weights=self.mix)[0]
+            plate = random.choice(self.pools[pool]) if self.pools[pool] else random_plate('LGX')
+            decision = self.process_vehicle(plate)
+            if time.monotonic() >= self.measure_from:
+                self.vehicles += 1
+                key = f'{pool}:{decision}'
+                self.decisions[key] = self.decisions.get(key, 0) + 1
+            if self.interval:
+                self.stop.wait(random.expovariate(1.0 / self.interval))
+
+    def process_vehicle(self, plate):
+        """Run the gate's call pattern for one plate; return the decision"""
+        if self.pattern == 'access':
+            body = self.call(ROUTE_ACCESS, plate, {'Idempotency-Key': str(uuid.uuid4())})
+            return 'error' if body is None else ('granted' if body.get('authorized') else 'denied')
+
+        body = self.call(ROUTE_VERIFY, plate)
+        if body is None:
+            return 'error'
+        if not body.get('authorized'):
+            return 'denied'
+        deducted = self.call(ROUTE_DEDUCT, plate, {'Idempotency-Key': str(uuid.uuid4())})
+        return 'granted' if deducted is not None else 'error'
+
+    def call(self, route, plate, headers=None):
+        """POST one request and record it; return the JSON body of a 200, else None"""
+        start = time.perf_counter()
+        try:
+            response = self.session.post(
+                self.base_url + route, json={'plate_number': plate}, headers=headers, timeout=self.timeout
+            )
+            status = response.status_code
+        except requests.exceptions.RequestException:
+            response, status = None, None
+        elapsed = time.perf_counter() - start
+
+        if time.monotonic() >= self.measure_from:
+            self.routes.setdefault(route, RouteStats()).record(elapsed, status)
+        # Denials are 200s with authorized: false
+        return response.json() if status == 200 else None
+
+
+def run_fleet(base_url, gates, duration, warmup, pools, mix, pattern, interval, timeout):
+    """Run gates for warmup + duration seconds and summarize the measured part"""
+    stop = threading.Event()
+    measure_from = time.monotonic() + warmup
+    fleet = [
+        Gate(f'loadgen-{i:03d}', base_url, pools, mix, pattern, interval, timeout, measure_from, stop)
+        for i in range(gates)
+    ]
+    for gate in fleet:
+        gate.start()
+    time.sleep(warmup + duration)
+    stop.set()
+    for gate in fleet:
+        gate.join(timeout + 5)
+
+    routes, decisions, vehicles = {}, {}, 0
+    for gate in fleet:
+        vehicles += gate.vehicles
+        for route, stats in gate.routes.items():
+            routes.setdefault(route, RouteStats()).merge(stats)
+        for key, count in gate.decisions.items():
+            decisions[key] = decisions.get(key, 0) + count
+    return {
+        'gates': gates,
+        'duration_seconds': duration,
+        'vehicles': vehicles,
+        'vehicles_per_second': round(vehicles / duration, 2),
+        'decisions': dict(sorted(decisions.items())),
+        'routes': {route: stats.summary(duration) for route, stats in sorted(routes.items())}
+    }
+
+
+def git_commit():
+    """Current commit hash, or None outside a git checkout"""
+    try:
+        return subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'], cwd=ROOT, capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def print_run(run, budget_ms):
+    """Print one run's per-route table"""
+    print(f"\n{run['gates']} gates: {run['vehicles_per_second']} vehicles/s")
+    print(f"{'route':<18}{'rps':>9}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}{'errors':>9}{'429s':>8}")
+    for route, summary in run['routes'].items():
+        flag = '  over budget' if summary['p99_ms'] is not None and summary['p99_ms'] > budget_ms else ''
+        print(f"{route:<18}{summary['throughput_rps']:>9}{summary['p50_ms']:>9}{summary['p95_ms']:>9}"
+              f"{summary['p99_ms']:>9}{summary['error_rate']:>9.2%}{summary['throttle_rate']:>8.2%}{flag}")
+
+
+def print_comparison(results, previous_path):
+    """Print p99 changes against a previous results file, matched by gate count"""
+    with open(previous_path) as f:
+        previous = {run['gates']: run for run in json.load(f)['runs']}
+    print(f"\nCompared with {previous_path}:")
+    matched = False
+    for run in results['runs']:
+        before = previous.get(run['gates'])
+        if not before:
+            continue
+        for route, summary in run['routes'].items():
+            old = before['routes'].get(route, {}).get('p99_ms')
+            if old and summary['p99_ms'] is not None:
+                matched = True
+                change = (summary['p99_ms'] - old) / old
+                print(f"  {run['gates']:>4} gates {route:<18} p99 {old:>8} -> {summary['p99_ms']:>8} ms ({change:+.1%})")
+    if not matched:
+        print("  no runs with the same gate count and route")
+
+
+def main():
+    """Run the load test for each gate count and save the results"""
+    parser = argparse.ArgumentParser(description='Simulate a fleet of gates against the backend API')
+    parser.add_argument('--gates', type=int, nargs='+', default=[10, 50, 100], help='gate counts to run, in order')
+    parser.add_argument('--duration', type=float, default=30, help='measured seconds per gate count')
+    parser.add_argument('--warmup', type=float, default=3, help='unmeasured seconds before each run')
+    parser.add_argument('--interval', type=float, default=1.0,
+                        help='mean seconds between vehicles at one gate (0: back to back)')
+    parser.add_argument('--pattern', choices=['verify-deduct', 'access'], default='verify-deduct',
+                        help='verify then deduct (legacy gates), or one /api/access call')
+    parser.add_argument('--mix', default='0.8,0.1,0.1', help='registered,depleted,unknown plate weights')
+    parser.add_argument('--vehicles', type=int, default=1000, help='registered plates to seed')
+    parser.add_argument('--storage', choices=['memory', 'sqlite', 'dynamodb'], default='memory',
+                        help='storage backend for the in-process server')
+    parser.add_argument('--url', help='benchmark a running server instead of starting one')
+    parser.add_argument('--no-rate-limit', action='store_true',
+                        help='disable per-gate rate limits on the in-process server')
+    parser.add_argument('--timeout', type=float, default=5.0, help='per-request timeout in seconds')
+    parser.add_argument('--budget-ms', type=float, default=200.0, help='p99 latency budget for /api/verify')
+    parser.add_argument('--output', help='results file (default: benchmarks/results/gate_load_<time>.json)')
+    parser.add_argument('--compare', help='previous results file to compare p99s against')
+    args = parser.parse_args()
+
+    mix = [float(w) for w in args.mix.split(',')]
+    if len(mix) != 3 or sum(mix) <= 0:
+        parser.error('--mix needs three non-negative weights')
+
+    prefix = 'LG' + uuid.uuid4().hex[:4].upper()
+    depleted = max(1, args.vehicles // 10)
+    with tempfile.TemporaryDirectory(prefix='gate-load-') as workdir:
+        if args.url:
+            base_url = args.url.rstrip('/')
+            print(f"Seeding {args.vehicles + depleted} vehicles through {base_url}...")
+            registered, empty = seed_remote(base_url, prefix, args.vehicles, depleted)
+        else:
+            import logging
+            logging.disable(logging.WARNING)
+            base_url, db, server = start_local_server(args.storage, workdir, rate_limit=not args.no_rate_limit)
+            registered, empty = seed_local(db, prefix, args.vehicles, depleted)
+        pools = {POOL_REGISTERED: registered, POOL_DEPLETED: empty, POOL_UNKNOWN: []}
+
+        results = {
+            'tool': 'gate_load',
+            'started_at': datetime.utcnow().isoformat(),
+            'commit': git_commit(),
+            'python': platform.python_version(),
+            'target': args.url or f'in-process ({args.storage})',
+            'settings': {
+                'pattern': args.pattern, 'duration': args.duration, 'warmup': args.warmup,
+                'interval': args.interval, 'mix': mix, 'vehicles': args.vehicles, 'depleted': depleted,
+                'timeout': args.timeout, 'budget_ms': args.budget_ms,
+                'rate_limit': None if args.url else not args.no_rate_limit
+            },
+            'runs': []
+        }
+        print(f"Target: {results['target']}, pattern {args.pattern}, {args.duration:g}s per run")
+
+        for gates in args.gates:
+            run = run_fleet(base_url, gates, args.duration, args.warmup, pools, mix,
+                            args.pattern, args.interval, args.timeout)
+            results['runs'].append(run)
+            print_run(run, args.budget_ms)
+
+        if not args.url:
+            server.shutdown()
+
+    budget_route = ROUTE_ACCESS if args.pattern == 'access' else ROUTE_VERIFY
+    within = [
+        run['gates'] for run in results['runs']
+        if (run['routes'].get(budget_route) or {}).get('p99_ms') is not None
+        and run['routes'][budget_route]['p99_ms'] <= args.budget_ms
+    ]
+    results['max_gates_within_budget'] = max(within) if within else None
+    print(f"\nLargest gate count with {budget_route} p99 <= {args.budget_ms:g} ms: "
+          f"{results['max_gates_within_budget'] or 'none'}")
+
+    output = args.output or os.path.join(
+        ROOT, 'benchmarks', 'results', f"gate_load_{datetime.utcnow().strftime('%Y%m%dT%H%M%S')}.json"
+    )
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, 'w') as f:
+        json.dump(results, f, indent=2)
+    print(f"Results saved to {output}")
+
+    if args.compare:
+        print_comparison(results, args.compare)
+
+
+if __name__ == '__main__':
+    main()
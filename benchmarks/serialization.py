@@ -0,0 +1,104 @@
+#!/usr/bin/env python3
+"""
+Serialization benchmark for large vehicle list responses
+
+Encodes a /api/vehicles body of N DynamoDB-shaped vehicles (numbers as
+Decimal) with Flask's default provider and with FastJSONProvider, then
+compresses it the way the backend would. No AWS access is needed.
+
+Usage:
+    python benchmarks/serialization.py [--vehicles 10000] [--repeat 20]
+"""
+from datetime import datetime, timedelta
+from decimal import Decimal
+import argparse
+import os
+import sys
+import time
+
+# Add parent directory to path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from flask import Flask
+from flask.json.provider import DefaultJSONProvider
+
+from backend.compression import BROTLI_AVAILABLE, compress
+from backend.json_provider import FastJSONProvider, ORJSON_AVAILABLE
+
+CAR_TYPES = ['Sedan', 'SUV', 'Hatchback', 'Truck', 'Electric']
+
+
+def make_vehicles(count):
+    """Build vehicles the way boto3 returns them from a scan"""
+    registered = datetime(2024, 1, 1)
+    vehicles = []
+    for i in range(count):
+        passes = Decimal(10)
+        remaining = Decimal(i % 11)
+        vehicles.append({
+            'plate_number': f'ABC{i:05d}',
+            'name': f'Driver {i}',
+            'car_type': CAR_TYPES[i % len(CAR_TYPES)],
+            'email': f'driver{i}@example.com',
+            'phone_number': f'+1555{i:07d}',
+            'total_passes': passes,
+            'remaining_passes': remaining,
+            'registered_at': (registered + timedelta(minutes=i)).isoformat(),
+            'last_used': None,
+            'status': 'active'
+        })
+    return vehicles
+
+
+def time_encode(provider, body, repeat):
+    """Best-of-repeat seconds to encode body, and the encoded bytes"""
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        encoded = provider.dumps(body)
+        best = min(best, time.perf_counter() - start)
+    return best, encoded.encode('utf-8')
+
+
+def time_compress(data, encoding, repeat):
+    """Best-of-repeat seconds to compress data, and the compressed size"""
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        compressed = compress(data, encoding)
+        best = min(best, time.perf_counter() - start)
+    return best, len(compressed)
+
+
+def main():
+    """Run the benchmark and print a results table"""
+    parser = argparse.ArgumentParser(description='Benchmark vehicle list serialization')
+    parser.add_argument('--vehicles', type=int, default=10000, help='vehicles in the payload')
+    parser.add_argument('--repeat', type=int, default=20, help='runs per measurement (best is reported)')
+    args = parser.parse_args()
+
+    app = Flask(__name__)
+    body = {'data': make_vehicles(args.vehicles), 'count': args.vehicles, 'next_cursor': None}
+
+    print(f"Payload: {args.vehicles} vehicles, best of {args.repeat} runs")
+    print(f"orjson: {'yes' if ORJSON_AVAILABLE else 'no'}, brotli: {'yes' if BROTLI_AVAILABLE else 'no'}")
+    print()
+    print(f"{'provider':<22}{'encode ms':>12}{'bytes':>12}")
+    results = {}
+    for name, provider in (('flask default', DefaultJSONProvider(app)), ('FastJSONProvider', FastJSONProvider(app))):
+        seconds, data = time_encode(provider, body, args.repeat)
+        results[name] = data
+        print(f"{name:<22}{seconds * 1000:>12.2f}{len(data):>12,}")
+
+    print()
+    print(f"{'encoding':<22}{'compress ms':>12}{'bytes':>12}{'ratio':>8}")
+    data = results['FastJSONProvider']
+    print(f"{'identity':<22}{0:>12.2f}{len(data):>12,}{1:>8.2f}")
+    encodings = ['gzip', 'br'] if BROTLI_AVAILABLE else ['gzip']
+    for encoding in encodings:
+        seconds, size = time_compress(data, encoding, args.repeat)
+        print(f"{encoding:<22}{seconds * 1000:>12.2f}{size:>12,}{len(data) / size:>8.2f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,363 @@
+#!/usr/bin/env python3
+"""
+Storage Backend Contract Check
+Runs the same scenarios against each storage backend and reports any
+difference from the expected semantics (DynamoDBManager's)
+
+Usage:
+    python check_storage_backends.py                      # memory and sqlite
+    python check_storage_backends.py --backend dynamodb   # uses the tables in .env
+
+memory and sqlite need no outside services, so CI can run this as is. The
+dynamodb run writes vehicles with random CHK* plates to the configured
+tables and deletes them afterwards; access events and rollup counters it
+writes are left to expire. Exits with status 1 if any scenario fails.
+"""
+from concurrent.futures import ThreadPoolExecutor
+import argparse
+import logging
+import os
+import shutil
+import sys
+import tempfile
+import time
+import traceback
+import uuid
+
+from backend.database import ACCESS_GRANTED, ACCESS_NOT_REGISTERED, ACCESS_NO_PASSES, ACCESS_KEY_REUSED
+from backend.storage import create_storage, STORAGE_DYNAMODB, STORAGE_SQLITE, STORAGE_MEMORY, STORAGE_BACKENDS
+
+SCENARIOS = []
+
+
+def scenario(check):
+    """Register a check(storage, prefix) function"""
+    SCENARIOS.append(check)
+    return check
+
+
+def expect(condition, message):
+    """Fail the running scenario unless condition holds"""
+    if not condition:
+        raise AssertionError(message)
+
+
+def eventually(read, done, timeout=5.0):
+    """Repeat read until done(result) holds or timeout passes; DynamoDB indexes lag writes"""
+    deadline = time.monotonic() + timeout
+    result = read()
+    while not done(result) and time.monotonic() < deadline:
+        time.sleep(0.25)
+        result = read()
+    return result
+
+
+def make_vehicle(plate_number, passes=5, **fields):
+    """A vehicle item as build_vehicle_record would produce it"""
+    vehicle = {
+        'plate_number': plate_number,
+        'name': 'Contract Check',
+        'car_type': 'Sedan',
+        'email': 'check@example.com',
+        'phone_number': '+15550000000',
+        'total_passes': passes,
+        'remaining_passes': passes,
+        'registered_at': '2025-01-01T00:00:00',
+        'status': 'active'
+    }
+    vehicle.update(fields)
+    return vehicle
+
+
+def make_event(plate_number, occurred_at, action='access', outcome=ACCESS_GRANTED):
+    """An access event as access_log.build_event would produce it"""
+    return {
+        'plate_number': plate_number,
+        'event_id': f'{occurred_at}#{uuid.uuid4().hex[:8]}',
+        'occurred_at': occurred_at,
+        'day': occurred_at[:10],
+        'gate_id': 'check',
+        'action': action,
+        'outcome': outcome
+    }
+
+
+@scenario
+def create_and_get(storage, prefix):
+    """create_vehicle refuses duplicates; get_vehicle returns a copy"""
+    plate = f'{prefix}A'
+    expect(storage.create_vehicle(make_vehicle(plate)), "first create should succeed")
+    expect(not storage.create_vehicle(make_vehicle(plate, passes=9)), "duplicate create should fail")
+    vehicle = storage.get_vehicle(plate)
+    expect(vehicle['remaining_passes'] == 5, f"duplicate create changed the item: {vehicle}")
+    expect(vehicle['email'] == 'check@example.com', "non-key fields should round-trip")
+    vehicle['remaining_passes'] = 0
+    expect(storage.get_vehicle(plate)['remaining_passes'] == 5, "mutating a returned item changed storage")
+    expect(storage.get_vehicle(f'{prefix}MISSING') is None, "unknown plate should return None")
+
+
+@scenario
+def deduct_stops_at_zero(storage, prefix):
+    """deduct_pass is conditional on remaining_passes > 0"""
+    plate = f'{prefix}D'
+    storage.create_vehicle(make_vehicle(plate, passes=2))
+    results = [storage.deduct_pass(plate) for _ in range(4)]
+    expect(results == [True, True, False, False], f"unexpected deduct results {results}")
+    expect(storage.get_vehicle(plate)['remaining_passes'] == 0, "balance should stop at 0")
+    expect(not storage.deduct_pass(f'{prefix}MISSING'), "deducting an unknown plate should fail")
+
+
+@scenario
+def access_outcomes(storage, prefix):
+    """access_vehicle returns the updated item, or the unchanged one on refusal"""
+    plate = f'{prefix}X'
+    storage.create_vehicle(make_vehicle(plate, passes=1))
+    outcome, vehicle = storage.access_vehicle(plate)
+    expect(outcome == ACCESS_GRANTED and vehicle['remaining_passes'] == 0, f"got {outcome} {vehicle}")
+    outcome, vehicle = storage.access_vehicle(plate)
+    expect(outcome == ACCESS_NO_PASSES and vehicle['plate_number'] == plate, f"got {outcome} {vehicle}")
+    outcome, vehicle = storage.access_vehicle(f'{prefix}MISSING')
+    expect(outcome == ACCESS_NOT_REGISTERED and vehicle is None, f"got {outcome} {vehicle}")
+
+
+@scenario
+def idempotent_access(storage, prefix):
+    """A key deducts once, replays its result, and cannot move to another plate"""
+    plate = f'{prefix}I'
+    key = f'{prefix}-key'
+    storage.create_vehicle(make_vehicle(plate, passes=1))
+    expect(storage.access_vehicle_once(plate, key)[::2] == (ACCESS_GRANTED, False), "first use should deduct")
+    outcome, vehicle, replayed = storage.access_vehicle_once(plate, key)
+    expect(outcome == ACCESS_GRANTED and replayed, "retry should replay, even with no passes left")
+    expect(vehicle['remaining_passes'] == 0, f"replay should carry the original result: {vehicle}")
+    expect(storage.get_vehicle(plate)['remaining_passes'] == 0, "replay must not deduct again")
+    outcome, _, _ = storage.access_vehicle_once(f'{prefix}OTHER', key)
+    expect(outcome == ACCESS_KEY_REUSED, f"key on another plate should be refused, got {outcome}")
+    outcome, _, replayed = storage.access_vehicle_once(plate, f'{prefix}-key2')
+    expect(outcome == ACCESS_NO_PASSES and not replayed, f"new key with no passes got {outcome}")
+
+
+@scenario
+def add_passes_status_and_delete(storage, prefix):
+    """add_passes needs an existing vehicle; delete is idempotent"""
+    plate = f'{prefix}P'
+    storage.create_vehicle(make_vehicle(plate, passes=5))
+    expect(storage.add_passes(plate, 3), "add_passes should succeed")
+    vehicle = storage.get_vehicle(plate)
+    expect((vehicle['remaining_passes'], vehicle['total_passes']) == (8, 8), f"got {vehicle}")
+    expect(not storage.add_passes(f'{prefix}MISSING', 3), "adding to an unknown plate should fail")
+    expect(storage.update_vehicle_status(plate, 'suspended'), "status update should succeed")
+    expect(storage.get_vehicle(plate)['status'] == 'suspended', "status should be stored")
+    expect(storage.delete_vehicle(plate), "delete should succeed")
+    expect(storage.get_vehicle(plate) is None, "deleted vehicle should be gone")
+    expect(storage.delete_vehicle(plate), "deleting again should still succeed")
+
+
+@scenario
+def pagination_and_filters(storage, prefix):
+    """Following next_cursor visits every vehicle exactly once"""
+    plates = [f'{prefix}L{i:02d}' for i in range(23)]
+    storage.batch_create_vehicles([
+        make_vehicle(p, passes=5 + i % 4, car_type='SUV' if i % 2 else 'Sedan') for i, p in enumerate(plates)
+    ])
+    expect(storage.get_existing_plates(plates + [f'{prefix}MISSING']) == set(plates), "get_existing_plates mismatch")
+
+    def collect(filters=None):
+        seen, cursor = [], None
+        while True:
+            vehicles, cursor = storage.list_vehicles_page(limit=5, cursor=cursor, filters=filters)
+            expect(len(vehicles) <= 5, "page exceeded limit")
+            seen.extend(v['plate_number'] for v in vehicles if v['plate_number'].startswith(prefix))
+            if cursor is None:
+                return seen
+
+    seen = collect()
+    expect(sorted(seen) == plates and len(set(seen)) == len(seen), "pages should cover every vehicle once")
+    suvs = collect({'car_type': 'SUV', 'min_passes': 6})
+    expected = [p for i, p in enumerate(plates) if i % 2 and 5 + i % 4 >= 6]
+    expect(sorted(suvs) == expected, f"filtered pages mismatch: {suvs}")
+    projected = [v for v in storage.iter_vehicles(attributes=['plate_number', 'status'])
+                 if v['plate_number'].startswith(prefix)]
+    expect(len(projected) == 23 and all(set(v) == {'plate_number', 'status'} for v in projected),
+           "iter_vehicles projection mismatch")
+    try:
+        storage.list_vehicles_page(limit=5, cursor='not-a-cursor')
+        expect(False, "a foreign cursor should raise ValueError")
+    except ValueError:
+        pass
+
+
+@scenario
+def index_queries(storage, prefix):
+    """Status and email queries return exactly the matching vehicles, fewest passes first"""
+    # Pass counts no real vehicle has, so a shared DynamoDB table cannot interfere
+    passes = [90003, 90001, 90002, 90001, 90009, 90002]
+    plates = [f'{prefix}S{i}' for i in range(len(passes))]
+    email = f'{prefix.lower()}@example.com'
+    storage.batch_create_vehicles([
+        make_vehicle(p, passes=n, status='inactive', email=email if i < 4 else 'check@example.com')
+        for i, (p, n) in enumerate(zip(plates, passes))
+    ])
+    storage.update_vehicle_status(plates[0], 'suspended')
+
+    def collect():
+        seen, cursor = [], None
+        while True:
+            vehicles, cursor = storage.query_vehicles_by_status(
+                'inactive', min_passes=90001, max_passes=90003, limit=2, cursor=cursor
+            )
+            expect(len(vehicles) <= 2, "page exceeded limit")
+            seen.extend((int(v['remaining_passes']), v['plate_number']) for v in vehicles)
+            if cursor is None:
+                return seen
+
+    expected = [(90001, plates[1]), (90001, plates[3]), (90002, plates[2]), (90002, plates[5])]
+    seen = eventually(collect, lambda seen: sorted(seen) == expected)
+    expect(sorted(seen) == expected, f"status query mismatch: {seen}")
+    expect([n for n, _ in seen] == sorted(n for n, _ in seen), "status query should be in pass order")
+
+    by_email = eventually(lambda: storage.query_vehicles_by_email(email), lambda found: len(found) == 4)
+    expect([v['plate_number'] for v in by_email] == plates[:4], f"email query mismatch: {by_email}")
+    expect(storage.query_vehicles_by_email(f'{prefix}@example.com') == [], "email match should be exact")
+    # A listing cursor, and a status cursor used for another status, are both foreign
+    _, status_cursor = storage.query_vehicles_by_status('inactive', min_passes=90001, limit=1)
+    for status, cursor in (('inactive', storage.list_vehicles_page(limit=1)[1]), ('active', status_cursor)):
+        try:
+            storage.query_vehicles_by_status(status, cursor=cursor)
+            expect(False, "a foreign cursor should raise ValueError")
+        except ValueError:
+            pass
+
+
+@scenario
+def access_event_queries(storage, prefix):
+    """Events come back newest first, paginated and bounded by since/until"""
+    plate = f'{prefix}E'
+    day = '2001-02-03'
+    events = [make_event(plate, f'{day}T{hour:02d}:00:00') for hour in range(7)]
+    storage.batch_write_access_events(events)
+
+    seen, cursor = [], None
+    while True:
+        page, cursor = storage.query_access_events(plate_number=plate, limit=3, cursor=cursor)
+        seen.extend(e['occurred_at'] for e in page)
+        if cursor is None:
+            break
+    expect(seen == sorted((e['occurred_at'] for e in events), reverse=True), f"history order mismatch: {seen}")
+
+    bounded, _ = storage.query_access_events(plate_number=plate, since=f'{day}T02:00', until=f'{day}T04:00:00')
+    expect([e['occurred_at'][11:13] for e in bounded] == ['04', '03', '02'], "since/until bounds mismatch")
+    by_day, _ = storage.query_access_events(day=day, limit=100)
+    expect(sum(1 for e in by_day if e['plate_number'] == plate) == 7, "day query missed events")
+
+
+@scenario
+def rollup_counters(storage, prefix):
+    """add_rollup_counts accumulates and returns the bucket; query_rollups returns a bucket range in order"""
+    series = f'check#{prefix}#hour'
+    for bucket in ('2001-02-03T01', '2001-02-03T02', '2001-02-03T02', '2001-02-03T05'):
+        expect(storage.add_rollup_counts(series, bucket, {'entries': 2, 'denied': 1}), "rollup add failed")
+    items = storage.query_rollups(series, '2001-02-03T02', '2001-02-03T05')
+    expect([(i['bucket'], int(i['entries']), int(i['denied'])) for i in items]
+           == [('2001-02-03T02', 4, 2), ('2001-02-03T05', 2, 1)], f"rollups mismatch: {items}")
+    added = storage.add_rollup_counts(series, '2001-02-03T05', {'entries': 1})
+    expect(int(added['entries']) == 3 and int(added['denied']) == 1, f"add should return the new bucket: {added}")
+    expect(int(storage.get_rollup(series, '2001-02-03T05')['entries']) == 3, "get_rollup mismatch")
+    expect(storage.get_rollup(series, '2001-02-03T09') is None, "a missing bucket should be None")
+    expect(storage.add_rollup_counts(series, '2001-02-03T05', {'entries': 1}, expected={'entries': 2}) is None,
+           "an add whose expected values do not match should be dropped")
+    added = storage.add_rollup_counts(series, '2001-02-03T05', {'entries': 1}, expected={'entries': 3})
+    expect(added and int(added['entries']) == 4, f"an add whose expected values match should apply: {added}")
+
+
+@scenario
+def concurrent_deducts_never_go_negative(storage, prefix):
+    """Racing deduct_pass calls grant exactly the passes available"""
+    plate = f'{prefix}C'
+    storage.create_vehicle(make_vehicle(plate, passes=25))
+    with ThreadPoolExecutor(max_workers=16) as pool:
+        results = list(pool.map(lambda _: storage.deduct_pass(plate), range(100)))
+    expect(results.count(True) == 25, f"{results.count(True)} deducts succeeded, expected 25")
+    expect(storage.get_vehicle(plate)['remaining_passes'] == 0, "balance should end at exactly 0")
+
+
+@scenario
+def concurrent_idempotent_access(storage, prefix):
+    """Racing retries of the same keys deduct once per key"""
+    plate = f'{prefix}K'
+    storage.create_vehicle(make_vehicle(plate, passes=10))
+    keys = [f'{prefix}-k{i % 8}' for i in range(64)]
+    with ThreadPoolExecutor(max_workers=16) as pool:
+        results = list(pool.map(lambda key: storage.access_vehicle_once(plate, key), keys))
+    expect(all(outcome == ACCESS_GRANTED for outcome, _, _ in results), "every retry should be granted")
+    expect(sum(1 for _, _, replayed in results if not replayed) == 8, "each key should deduct exactly once")
+    expect(storage.get_vehicle(plate)['remaining_passes'] == 2, "8 keys should use 8 passes")
+
+
+def storage_factory(backend, workdir):
+    """Return a function giving the storage each scenario runs against"""
+    if backend == STORAGE_DYNAMODB:
+        from config import Config
+        storage = create_storage({key: getattr(Config, key) for key in dir(Config) if key.isupper()})
+        storage.create_tables()
+        return lambda name: storage
+    config = {'STORAGE_BACKEND': backend, 'IDEMPOTENCY_TTL_HOURS': 24}
+    if backend == STORAGE_SQLITE:
+        return lambda name: _created(create_storage(dict(config, SQLITE_PATH=os.path.join(workdir, f'{name}.db'))))
+    return lambda name: create_storage(config)
+
+
+def _created(storage):
+    """Create a fresh backend's tables and return it"""
+    storage.create_tables()
+    return storage
+
+
+def cleanup(storage, prefix):
+    """Delete the vehicles a scenario created on a shared backend"""
+    for vehicle in list(storage.iter_vehicles(attributes=['plate_number'])):
+        if vehicle['plate_number'].startswith(prefix):
+            storage.delete_vehicle(vehicle['plate_number'])
+
+
+def main():
+    """Run every scenario against the chosen backends"""
+    parser = argparse.ArgumentParser(description='Check storage backends against the shared contract')
+    parser.add_argument('--backend', nargs='+', choices=STORAGE_BACKENDS,
+                        default=[STORAGE_MEMORY, STORAGE_SQLITE], help='backends to check')
+    args = parser.parse_args()
+    logging.disable(logging.ERROR)
+
+    failures = 0
+    workdir = tempfile.mkdtemp(prefix='storage-check-')
+    try:
+        for backend in args.backend:
+            print("=" * 60)
+            print(f"Backend: {backend}")
+            print("=" * 60)
+            storage_for = storage_factory(backend, workdir)
+            for check in SCENARIOS:
+                prefix = f'CHK{uuid.uuid4().hex[:6].upper()}'
+                storage = storage_for(check.__name__)
+                try:
+                    check(storage, prefix)
+                    print(f"  ✅ {check.__name__}")
+                except Exception as e:
+                    failures += 1
+                    print(f"  ❌ {check.__name__}: {e}")
+                    if not isinstance(e, AssertionError):
+                        traceback.print_exc()
+                finally:
+                    if backend == STORAGE_DYNAMODB:
+                        cleanup(storage, prefix)
+            print()
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    total = len(SCENARIOS) * len(args.backend)
+    print(f"{total - failures}/{total} checks passed")
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == '__main__':
+    main()
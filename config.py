@@ -19,8 +19,109 @@ class Config:
     AWS_ACCESS_KEY_ID = os.getenv('AWS_ACCESS_KEY_ID')
     AWS_SECRET_ACCESS_KEY = os.getenv('AWS_SECRET_ACCESS_KEY')
 
+    # Storage Backend: 'dynamodb', 'sqlite' for sites that must run without an uplink,
+    # or 'memory' for tests and load tests (data is lost on exit)
+    STORAGE_BACKEND = os.getenv('STORAGE_BACKEND', 'dynamodb').lower()
+    SQLITE_PATH = os.getenv('SQLITE_PATH', 'data/vehicles.db')
+
     # DynamoDB Configuration
     DYNAMODB_TABLE_NAME = os.getenv('DYNAMODB_TABLE_NAME', 'VehiclePassRegistrations')
+    # e.g. http://localhost:8000 for DynamoDB Local; unset uses AWS
+    DYNAMODB_ENDPOINT_URL = os.getenv('DYNAMODB_ENDPOINT_URL') or None
+
+    # DynamoDB Client Tuning
+    # Connections per client; 0 matches ASYNC_DB_MAX_CONCURRENCY
+    DYNAMODB_MAX_POOL_CONNECTIONS = int(os.getenv('DYNAMODB_MAX_POOL_CONNECTIONS', 0))
+    DYNAMODB_RETRY_MODE = os.getenv('DYNAMODB_RETRY_MODE', 'adaptive')
+    DYNAMODB_MAX_ATTEMPTS = int(os.getenv('DYNAMODB_MAX_ATTEMPTS', 5))
+    DYNAMODB_CONNECT_TIMEOUT_SECONDS = float(os.getenv('DYNAMODB_CONNECT_TIMEOUT_SECONDS', 2))
+    DYNAMODB_READ_TIMEOUT_SECONDS = float(os.getenv('DYNAMODB_READ_TIMEOUT_SECONDS', 10))
+    # Gate-facing calls (verify, deduct, access) fail fast so the gate can retry
+    DYNAMODB_GATE_MAX_ATTEMPTS = int(os.getenv('DYNAMODB_GATE_MAX_ATTEMPTS', 2))
+    DYNAMODB_GATE_CONNECT_TIMEOUT_SECONDS = float(os.getenv('DYNAMODB_GATE_CONNECT_TIMEOUT_SECONDS', 0.25))
+    DYNAMODB_GATE_READ_TIMEOUT_SECONDS = float(os.getenv('DYNAMODB_GATE_READ_TIMEOUT_SECONDS', 0.5))
+    # Connections per client opened at startup (0 disables the warm-up)
+    DYNAMODB_WARM_CONNECTIONS = int(os.getenv('DYNAMODB_WARM_CONNECTIONS', 4))
+    IDEMPOTENCY_TABLE_NAME = os.getenv('IDEMPOTENCY_TABLE_NAME', 'VehiclePassIdempotencyKeys')
+    IDEMPOTENCY_TTL_HOURS = float(os.getenv('IDEMPOTENCY_TTL_HOURS', 24))
+    ACCESS_EVENTS_TABLE_NAME = os.getenv('ACCESS_EVENTS_TABLE_NAME', 'VehicleAccessEvents')
+    ROLLUPS_TABLE_NAME = os.getenv('ROLLUPS_TABLE_NAME', 'VehicleAccessRollups')
+
+    # Access Event Log (buffered, written in BatchWriteItem chunks; 0 disables)
+    ACCESS_LOG_BUFFER_SIZE = int(os.getenv('ACCESS_LOG_BUFFER_SIZE', 10000))
+    ACCESS_LOG_FLUSH_SECONDS = float(os.getenv('ACCESS_LOG_FLUSH_SECONDS', 1))
+    ACCESS_EVENTS_RETENTION_DAYS = float(os.getenv('ACCESS_EVENTS_RETENTION_DAYS', 365))
+    ACCESS_EVENTS_PAGE_SIZE = int(os.getenv('ACCESS_EVENTS_PAGE_SIZE', 50))
+
+    # Analytics Rollups (seconds between counter flushes; 0 disables)
+    ROLLUP_FLUSH_SECONDS = float(os.getenv('ROLLUP_FLUSH_SECONDS', 5))
+
+    # Vehicle Cache Configuration
+    VEHICLE_CACHE_MAX_SIZE = int(os.getenv('VEHICLE_CACHE_MAX_SIZE', 1000))
+    VEHICLE_CACHE_TTL_SECONDS = float(os.getenv('VEHICLE_CACHE_TTL_SECONDS', 30))
+
+    # Vehicle Listing Configuration
+    VEHICLES_PAGE_SIZE = int(os.getenv('VEHICLES_PAGE_SIZE', 100))
+    VEHICLES_MAX_PAGE_SIZE = int(os.getenv('VEHICLES_MAX_PAGE_SIZE', 1000))
+
+    # Dashboard Statistics Configuration (0 disables the reconcile job)
+    STATS_RECONCILE_INTERVAL_SECONDS = float(os.getenv('STATS_RECONCILE_INTERVAL_SECONDS', 300))
+
+    # Search Index (rebuilt from a table scan at startup, then every interval; 0 builds it once)
+    SEARCH_REBUILD_INTERVAL_SECONDS = float(os.getenv('SEARCH_REBUILD_INTERVAL_SECONDS', 600))
+    SEARCH_RESULTS_LIMIT = int(os.getenv('SEARCH_RESULTS_LIMIT', 20))
+    SEARCH_MAX_RESULTS_LIMIT = int(os.getenv('SEARCH_MAX_RESULTS_LIMIT', 100))
+
+    # Plate Misread Correction at the gates (O/0, I/1, B/8, S/5); the plate index is
+    # rebuilt from a table scan at startup, then every interval (0 builds it once)
+    PLATE_MISREAD_CORRECTION = os.getenv('PLATE_MISREAD_CORRECTION', 'True') == 'True'
+    PLATE_INDEX_REBUILD_INTERVAL_SECONDS = float(os.getenv('PLATE_INDEX_REBUILD_INTERVAL_SECONDS', 600))
+
+    # Plate Filter: gate reads of plates a Bloom filter rules out skip the database.
+    # Only turn it on when this single-worker server makes every registration;
+    # it stays off with more than one worker. The periodic rebuild resizes the
+    # filter as the fleet grows; it does not make outside registrations safe
+    PLATE_FILTER_ENABLED = os.getenv('PLATE_FILTER_ENABLED', 'False') == 'True'
+    PLATE_FILTER_FALSE_POSITIVE_RATE = float(os.getenv('PLATE_FILTER_FALSE_POSITIVE_RATE', 0.01))
+    PLATE_FILTER_REBUILD_INTERVAL_SECONDS = float(os.getenv('PLATE_FILTER_REBUILD_INTERVAL_SECONDS', 600))
+
+    # Change Feed (Server-Sent Events) Configuration
+    SSE_MAX_CLIENTS = int(os.getenv('SSE_MAX_CLIENTS', 500))
+    SSE_HEARTBEAT_SECONDS = float(os.getenv('SSE_HEARTBEAT_SECONDS', 15))
+
+    # Async (ASGI) Serving Configuration: DynamoDB calls kept in flight at once
+    ASYNC_DB_MAX_CONCURRENCY = int(os.getenv('ASYNC_DB_MAX_CONCURRENCY', 64))
+
+    # Production Serving (gunicorn -c gunicorn.conf.py): worker processes
+    # (0 = one per CPU core) and threads per worker. Stats and the ETag
+    # version are shared through storage; the caches, indexes, rate limits
+    # and metrics stay per worker, and the plate filter needs exactly 1
+    SERVER_WORKERS = int(os.getenv('SERVER_WORKERS', 0))
+    SERVER_THREADS = int(os.getenv('SERVER_THREADS', 8))
+
+    # Bulk Import Configuration
+    BULK_IMPORT_MAX_ROWS = int(os.getenv('BULK_IMPORT_MAX_ROWS', 10000))
+    BULK_IMPORT_WORKERS = int(os.getenv('BULK_IMPORT_WORKERS', 4))
+
+    # Rate Limiting per gate (X-Gate-ID) and client IP; 0 disables a budget
+    RATE_LIMIT_READ_PER_MINUTE = float(os.getenv('RATE_LIMIT_READ_PER_MINUTE', 120))
+    RATE_LIMIT_READ_BURST = int(os.getenv('RATE_LIMIT_READ_BURST', 30))
+    RATE_LIMIT_WRITE_PER_MINUTE = float(os.getenv('RATE_LIMIT_WRITE_PER_MINUTE', 30))
+    RATE_LIMIT_WRITE_BURST = int(os.getenv('RATE_LIMIT_WRITE_BURST', 10))
+    # Shared by every gate id behind one IP, so rotating X-Gate-ID gains nothing
+    RATE_LIMIT_IP_PER_MINUTE = float(os.getenv('RATE_LIMIT_IP_PER_MINUTE', 600))
+    RATE_LIMIT_IP_BURST = int(os.getenv('RATE_LIMIT_IP_BURST', 120))
+
+    # Response Compression (gzip, or brotli when installed; 0 disables)
+    COMPRESSION_MIN_BYTES = int(os.getenv('COMPRESSION_MIN_BYTES', 1024))
+    COMPRESSION_GZIP_LEVEL = int(os.getenv('COMPRESSION_GZIP_LEVEL', 6))
+    COMPRESSION_BROTLI_QUALITY = int(os.getenv('COMPRESSION_BROTLI_QUALITY', 4))
+
+    # Request Profiling Configuration (requests opt in with the X-Profile header)
+    PROFILING_ENABLED = os.getenv('PROFILING_ENABLED', 'False') == 'True'
+    PROFILING_TOKEN = os.getenv('PROFILING_TOKEN')
+    PROFILING_OUTPUT_DIR = os.getenv('PROFILING_OUTPUT_DIR', 'profiles')
+    PROFILING_SAMPLE_INTERVAL_MS = float(os.getenv('PROFILING_SAMPLE_INTERVAL_MS', 1))
 
     # S3 Configuration (for storing vehicle images)
     S3_BUCKET_NAME = os.getenv('S3_BUCKET_NAME', 'vehicle-pass-images')
@@ -0,0 +1,57 @@
+"""
+Gunicorn settings for the production serving mode
+
+Usage:
+    flask --app backend.app init-db     # once per deploy
+    gunicorn -c gunicorn.conf.py
+
+The app is imported once in the master (preload_app), so config, the boto3
+session and its loaded service model are shared by every worker. Each
+worker then replaces the inherited connections and starts its own
+background threads in post_fork. SERVER_WORKERS and SERVER_THREADS come
+from .env like every other setting.
+
+One worker per CPU core is the default. Dashboard counters and the ETag
+version are kept in storage and shared; the vehicle cache, search and
+plate indexes, rate limit budgets and metrics are per worker.
+"""
+import multiprocessing
+import os
+
+os.environ.setdefault('FLASK_ENV', 'production')
+
+from config import Config
+
+wsgi_app = 'backend.app:app'
+bind = f'{Config.HOST}:{Config.PORT}'
+
+# Threads cover the time each request waits on the database
+workers = Config.SERVER_WORKERS or multiprocessing.cpu_count()
+worker_class = 'gthread'
+threads = Config.SERVER_THREADS
+
+# In-memory storage lives inside one process, so more workers would each see different data
+if Config.STORAGE_BACKEND == 'memory':
+    workers = 1
+
+preload_app = True
+# Gates keep their connection open between polls
+keepalive = 5
+timeout = 30
+graceful_timeout = 30
+
+
+def when_ready(server):
+    """Say what running more than one worker gives up"""
+    if server.cfg.workers > 1:
+        server.log.warning(
+            f"Running {server.cfg.workers} workers: the plate filter is off, and the vehicle cache, "
+            "search index, rate limits and metrics are per worker"
+        )
+
+
+def post_fork(server, worker):
+    """Give the new worker its own connections and background threads"""
+    from backend.app import start_worker
+
+    start_worker(forked=True)
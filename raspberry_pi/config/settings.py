@@ -5,6 +5,9 @@ Raspberry Pi Configuration Settings
 RPI_CONFIG = {
     # Backend API
     'API_URL': 'http://YOUR_BACKEND_SERVER_IP:5000',
+    'GATE_ID': 'gate-1',  # Unique per gate; the backend rate-limits each gate separately
+    'API_TIMEOUT_SECONDS': 1.5,  # Per attempt; entries are retried safely
+    'API_ATTEMPTS': 3,
 
     # GPIO Pin Configuration (BCM numbering)
     # Ultrasonic Sensor (HC-SR04)
@@ -3,6 +3,7 @@ Raspberry Pi Main Controller for Vehicle Pass Registration System
 Handles hardware integration and communication with backend API
 """
 import time
+import uuid
 import requests
 import logging
 from datetime import datetime
@@ -57,6 +58,9 @@ class VehicleAccessController:
 
         # Backend API URL
         self.api_url = RPI_CONFIG['API_URL']
+        self.api_headers = {'X-Gate-ID': RPI_CONFIG['GATE_ID']}
+        self.api_timeout = RPI_CONFIG['API_TIMEOUT_SECONDS']
+        self.api_attempts = RPI_CONFIG['API_ATTEMPTS']
 
         # Detection parameters
         self.detection_threshold = RPI_CONFIG['DETECTION_THRESHOLD_CM']
@@ -71,11 +75,15 @@ class VehicleAccessController:
             response = requests.post(
                 f"{self.api_url}/api/verify",
                 json={'plate_number': plate_number},
+                headers=self.api_headers,
                 timeout=5
             )
 
             if response.status_code == 200:
                 return response.json()
+            elif response.status_code == 429:
+                logger.warning(f"Rate limited by backend, retry after {response.headers.get('Retry-After')}s")
+                return None
             else:
                 logger.error(f"Backend verification failed: {response.status_code}")
                 return None
@@ -84,25 +92,62 @@ class VehicleAccessController:
             logger.error(f"API request error: {str(e)}")
             return None
 
+    def post_idempotent(self, path, plate_number):
+        """POST a pass-deducting request, retrying quickly with one Idempotency-Key
+
+        The backend records the key together with the deduction, so a retry
+        after a timeout returns the original answer instead of deducting again.
+        Returns the last response, or None if no attempt got one.
+        """
+        headers = dict(self.api_headers, **{'Idempotency-Key': str(uuid.uuid4())})
+        response = None
+        for attempt in range(1, self.api_attempts + 1):
+            try:
+                response = requests.post(
+                    f"{self.api_url}{path}",
+                    json={'plate_number': plate_number},
+                    headers=headers,
+                    timeout=self.api_timeout
+                )
+                if response.status_code < 500:
+                    return response
+                logger.warning(f"Backend error {response.status_code} on {path} (attempt {attempt})")
+            except requests.exceptions.RequestException as e:
+                logger.warning(f"API request error on {path} (attempt {attempt}): {str(e)}")
+            if attempt < self.api_attempts:
+                time.sleep(0.2 * attempt)
+        return response
+
     def deduct_pass_from_backend(self, plate_number):
         """Deduct pass from backend"""
-        try:
-            response = requests.post(
-                f"{self.api_url}/api/deduct-pass",
-                json={'plate_number': plate_number},
-                timeout=5
-            )
+        response = self.post_idempotent('/api/deduct-pass', plate_number)
 
-            if response.status_code == 200:
-                return True
-            else:
-                logger.error(f"Pass deduction failed: {response.status_code}")
-                return False
-
-        except requests.exceptions.RequestException as e:
-            logger.error(f"API request error: {str(e)}")
+        if response is None:
+            return False
+        if response.status_code == 200:
+            return True
+        elif response.status_code == 429:
+            logger.warning(f"Rate limited by backend, retry after {response.headers.get('Retry-After')}s")
+            return False
+        else:
+            logger.error(f"Pass deduction failed: {response.status_code}")
             return False
 
+    def access_vehicle_with_backend(self, plate_number):
+        """Verify vehicle and deduct a pass with a single backend call"""
+        response = self.post_idempotent('/api/access', plate_number)
+
+        if response is None:
+            return None
+        if response.status_code == 200:
+            return response.json()
+        elif response.status_code == 429:
+            logger.warning(f"Rate limited by backend, retry after {response.headers.get('Retry-After')}s")
+            return None
+        else:
+            logger.error(f"Backend access check failed: {response.status_code}")
+            return None
+
     def grant_access(self, name, remaining_passes):
         """Grant access to vehicle"""
         logger.info(f"Granting access to {name}")
@@ -178,8 +223,8 @@ class VehicleAccessController:
 
         logger.info(f"Plate recognized: {plate_number}")
 
-        # Verify with backend
-        verification_result = self.verify_vehicle_with_backend(plate_number)
+        # Verify and deduct with backend in one call
+        verification_result = self.access_vehicle_with_backend(plate_number)
 
         if not verification_result:
             self.deny_access("System Error")
@@ -187,14 +232,11 @@ class VehicleAccessController:
 
         if verification_result.get('authorized'):
             name = verification_result.get('name', 'Guest')
+            # Pass already deducted, this is the balance after entry
             remaining_passes = verification_result.get('remaining_passes', 0)
 
-            # Deduct pass from backend
-            if self.deduct_pass_from_backend(plate_number):
-                # Access granted
-                self.grant_access(name, remaining_passes - 1)
-            else:
-                self.deny_access("System Error")
+            # Access granted
+            self.grant_access(name, remaining_passes)
         else:
             # Access denied
             message = verification_result.get('message', 'Not Registered')
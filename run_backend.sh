@@ -26,6 +26,13 @@ if [ ! -f ".env" ]; then
     exit 1
 fi
 
-# Run backend
+# Run backend: ./run_backend.sh production for Gunicorn workers
+if [ "$1" = "production" ]; then
+    echo "Checking tables..."
+    flask --app backend.app init-db || exit 1
+    echo "Starting Gunicorn workers (see gunicorn.conf.py)"
+    exec gunicorn -c gunicorn.conf.py
+fi
+
 echo "Starting Flask backend on http://0.0.0.0:5000"
 python backend/app.py